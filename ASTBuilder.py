@@ -0,0 +1,361 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from CompilationEngine import enum, UNARY_OP, BINARY_OP, KEYWORD_CONSTANTS, \
+    EXPRESSION_END, OUTER, PARENTHESES, INDEX, ARGUMENTS
+from JackAST import JackAST, CLASS, STATIC_VAR, FIELD_VAR, ARGUMENT_VAR, \
+    LOCAL_VAR, SUBROUTINE, BLOCK, LET, IF, WHILE, DO, RETURN, EXPRESSION, \
+    OPERATOR, INT, STRING, THIS, VARIABLE, ARRAY, CALL, UNARY, NO_NAME
+from JackTokenizer import JackTokenizer, KEYWORD, SYMBOL, IDENTIFIER, \
+    INT_CONST
+
+
+class ASTBuilder:
+    """Parses the tokens of a Jack class into a JackAST, without generating
+    any code. Follows the same grammar as CompilationEngine.
+    """
+
+    def __init__(self, jack_tokenizer: JackTokenizer) -> None:
+        """Creates a builder reading from a tokenizer.
+
+        Args:
+            jack_tokenizer (JackTokenizer): the tokens of the class.
+        """
+        self.jt = jack_tokenizer
+        self.ast = JackAST()
+        self.dict_build_func = {"let": self.build_let,
+                                "if": self.build_if,
+                                "while": self.build_while,
+                                "do": self.build_do,
+                                "return": self.build_return}
+
+    def add(self, kind: int, value: int = 0, extra: int = 0) -> int:
+        """Adds a node starting at the current token."""
+        return self.ast.add(kind, value, extra, self.jt.line())
+
+    def unexpected(self) -> SyntaxError:
+        """
+        Returns:
+            SyntaxError: an error about the current token.
+        """
+        line, column = self.jt.position()
+        return SyntaxError(f"Unexpected token {self.jt.get_cur_token()!r} "
+                           f"in line {line}, column {column}")
+
+    def build(self) -> JackAST:
+        """
+        Returns:
+            JackAST: the tree of the class, rooted at node 0.
+        """
+        jt = self.jt
+        # 'class' keyword
+        jt.advance()
+        node = self.add(CLASS, self.ast.intern(jt.get_cur_token()))
+        jt.advance()
+        # '{'
+        jt.advance()
+        children = []
+        while jt.has_more_tokens() and jt.get_cur_token() != "}":
+            keyword = jt.get_cur_token()
+            if keyword == "static" or keyword == "field":
+                jt.advance()
+                self.build_variables(children, FIELD_VAR
+                                     if keyword == "field" else STATIC_VAR)
+            elif keyword in enum:
+                children.append(self.build_subroutine())
+            else:
+                raise self.unexpected()
+        self.ast.set_children(node, children)
+        # '}'
+        jt.advance()
+        return self.ast
+
+    def build_variables(self, children: typing.List[int], kind: int) -> None:
+        """Adds the variables declared up to the next ";", the current token
+        being their type.
+
+        Args:
+            children (list): the children to add the variables to.
+            kind (int): STATIC_VAR, FIELD_VAR or LOCAL_VAR.
+        """
+        jt = self.jt
+        ast = self.ast
+        var_type = ast.intern(jt.get_cur_token())
+        jt.advance()
+        while jt.get_cur_token() != ";":
+            if jt.get_cur_token() != ",":
+                children.append(self.add(
+                    kind, ast.intern(jt.get_cur_token()), var_type))
+            jt.advance()
+        # ';'
+        jt.advance()
+
+    def build_subroutine(self) -> int:
+        """
+        Returns:
+            int: the node of the method, function or constructor.
+        """
+        jt = self.jt
+        ast = self.ast
+        kind = enum[jt.get_cur_token()]
+        jt.advance()
+        # return type
+        jt.advance()
+        node = self.add(SUBROUTINE, ast.intern(jt.get_cur_token()), kind)
+        jt.advance()
+        # '('
+        jt.advance()
+        children = []
+        while jt.get_cur_token() != ")":
+            if jt.get_cur_token() != ",":
+                arg_type = ast.intern(jt.get_cur_token())
+                jt.advance()
+                children.append(self.add(
+                    ARGUMENT_VAR, ast.intern(jt.get_cur_token()), arg_type))
+            jt.advance()
+        # ')' and '{'
+        jt.advance()
+        jt.advance()
+        while jt.get_cur_token() == "var":
+            jt.advance()
+            self.build_variables(children, LOCAL_VAR)
+        self.build_statements(children)
+        ast.set_children(node, children)
+        # '}'
+        jt.advance()
+        return node
+
+    def build_statements(self, children: typing.List[int]) -> None:
+        """Adds the statements up to the next "}".
+
+        Args:
+            children (list): the children to add the statements to.
+        """
+        jt = self.jt
+        while jt.has_more_tokens() and jt.get_cur_token() != "}":
+            build = self.dict_build_func.get(jt.get_cur_token())
+            if build is None or jt.token_type() != KEYWORD:
+                raise self.unexpected()
+            children.append(build())
+
+    def build_block(self) -> int:
+        """
+        Returns:
+            int: a BLOCK node of the statements between "{" and "}".
+        """
+        # '{'
+        self.jt.advance()
+        node = self.add(BLOCK)
+        children = []
+        self.build_statements(children)
+        self.ast.set_children(node, children)
+        # '}'
+        self.jt.advance()
+        return node
+
+    def build_let(self) -> int:
+        jt = self.jt
+        ast = self.ast
+        jt.advance()
+        node = self.add(LET, ast.intern(jt.get_cur_token()))
+        jt.advance()
+        children = []
+        if jt.get_cur_token() == "[":
+            jt.advance()
+            ast.extras[node] = 1
+            children.append(self.build_expression())
+            # ']'
+            jt.advance()
+        # '='
+        jt.advance()
+        children.append(self.build_expression())
+        ast.set_children(node, children)
+        # ';'
+        jt.advance()
+        return node
+
+    def build_if(self) -> int:
+        jt = self.jt
+        node = self.add(IF)
+        # 'if' and '('
+        jt.advance()
+        jt.advance()
+        children = [self.build_expression()]
+        # ')'
+        jt.advance()
+        children.append(self.build_block())
+        if jt.get_cur_token() == "else":
+            jt.advance()
+            children.append(self.build_block())
+        self.ast.set_children(node, children)
+        return node
+
+    def build_while(self) -> int:
+        jt = self.jt
+        node = self.add(WHILE)
+        # 'while' and '('
+        jt.advance()
+        jt.advance()
+        condition = self.build_expression()
+        # ')'
+        jt.advance()
+        self.ast.set_children(node, [condition, self.build_block()])
+        return node
+
+    def build_do(self) -> int:
+        jt = self.jt
+        node = self.add(DO)
+        jt.advance()
+        name = jt.get_cur_token()
+        jt.advance()
+        call = self.begin_call(name)
+        arguments = []
+        if jt.get_cur_token() != ")":
+            arguments.append(self.build_expression())
+            while jt.get_cur_token() == ",":
+                jt.advance()
+                arguments.append(self.build_expression())
+        self.ast.set_children(call, arguments)
+        self.ast.set_children(node, [call])
+        # ')' and ';'
+        jt.advance()
+        jt.advance()
+        return node
+
+    def build_return(self) -> int:
+        jt = self.jt
+        node = self.add(RETURN)
+        jt.advance()
+        if jt.get_cur_token() != ";":
+            self.ast.set_children(node, [self.build_expression()])
+        # ';'
+        jt.advance()
+        return node
+
+    def begin_call(self, name: str) -> int:
+        """Adds a CALL node, the current token being the "(" or "." after
+        its first name. Stops after the opening "(".
+
+        Args:
+            name (str): the first name of the call.
+
+        Returns:
+            int: the CALL node, without arguments yet.
+        """
+        jt = self.jt
+        ast = self.ast
+        subroutine_name = NO_NAME
+        if jt.get_cur_token() == ".":
+            jt.advance()
+            subroutine_name = ast.intern(jt.get_cur_token())
+            jt.advance()
+        node = self.add(CALL, ast.intern(name), subroutine_name)
+        # '('
+        jt.advance()
+        return node
+
+    def build_expression(self) -> int:
+        """Adds an expression, with an explicit stack of the expressions
+        nested in it like CompilationEngine.compile_folded_expression.
+
+        Returns:
+            int: the EXPRESSION node, or the node of the term when the
+            expression is a single term.
+        """
+        jt = self.jt
+        ast = self.ast
+        add = self.add
+        intern = ast.intern
+        advance = jt.advance
+        set_children = ast.set_children
+        # a frame is the terms and operators of an expression, what ends it,
+        # the ARRAY or CALL node it belongs to with the children of that
+        # node, the unary operations of its current term and its line
+        frame = ([], OUTER, None, None, [], jt.line())
+        stack = [frame]
+        while True:
+            type_term = jt.token_type()
+            cur_token = jt.get_cur_token()
+            if type_term == SYMBOL and cur_token in UNARY_OP:
+                frame[4].append(cur_token)
+                advance()
+                continue
+            if cur_token == "(":
+                advance()
+                frame = ([], PARENTHESES, None, None, [], jt.line())
+                stack.append(frame)
+                continue
+            if type_term == IDENTIFIER:
+                advance()
+                next_token = jt.get_cur_token()
+                if next_token == "[":
+                    advance()
+                    term = add(ARRAY, intern(cur_token))
+                    frame = ([], INDEX, term, [], [], jt.line())
+                    stack.append(frame)
+                    continue
+                if next_token == "(" or next_token == ".":
+                    term = self.begin_call(cur_token)
+                    if jt.get_cur_token() != ")":
+                        frame = ([], ARGUMENTS, term, [], [],
+                                 jt.line())
+                        stack.append(frame)
+                        continue
+                    advance()
+                else:
+                    term = add(VARIABLE, intern(cur_token))
+            else:
+                if type_term == INT_CONST:
+                    term = add(INT, jt.int_val())
+                elif type_term == KEYWORD and cur_token == "this":
+                    term = add(THIS)
+                elif type_term == KEYWORD and cur_token in KEYWORD_CONSTANTS:
+                    term = add(INT, -1 if cur_token == "true" else 0)
+                elif type_term == KEYWORD or type_term == SYMBOL:
+                    raise self.unexpected()
+                else:
+                    term = add(STRING, intern(jt.string_val()))
+                advance()
+
+            # the term is complete: adds it to its expression, and closes
+            # every expression that ends right after it
+            while True:
+                unary = frame[4]
+                while unary:
+                    operation = add(UNARY, intern(unary.pop()))
+                    set_children(operation, [term])
+                    term = operation
+                children = frame[0]
+                children.append(term)
+                cur_token = jt.get_cur_token()
+                if cur_token not in EXPRESSION_END:
+                    if cur_token not in BINARY_OP:
+                        raise self.unexpected()
+                    children.append(add(OPERATOR, intern(cur_token)))
+                    advance()
+                    break
+                stack.pop()
+                if len(children) > 1:
+                    term = ast.add(EXPRESSION, 0, 0, frame[5])
+                    set_children(term, children)
+                closer = frame[1]
+                if closer == OUTER:
+                    return term
+                if closer != PARENTHESES:
+                    arguments = frame[3]
+                    arguments.append(term)
+                    term = frame[2]
+                    if closer == ARGUMENTS and cur_token == ",":
+                        advance()
+                        frame = ([], ARGUMENTS, term, arguments, [],
+                                 jt.line())
+                        stack.append(frame)
+                        break
+                    set_children(term, arguments)
+                # the closing bracket
+                advance()
+                frame = stack[-1]
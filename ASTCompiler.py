@@ -0,0 +1,311 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from ASTBuilder import ASTBuilder
+from CompilationEngine import CompilationEngine, PendingExpression, OUTER, \
+    PARENTHESES, INDEX, ARGUMENTS
+from JackAST import JackAST, STATIC_VAR, FIELD_VAR, ARGUMENT_VAR, \
+    LOCAL_VAR, SUBROUTINE, LET, IF, WHILE, DO, RETURN, EXPRESSION, INT, \
+    STRING, THIS, VARIABLE, ARRAY, CALL, UNARY, NO_NODE, NO_NAME
+from SymbolTable import Symbol, ARG, LOCAL, FIELD, STATIC
+from VMCode import PUSH, POP
+
+Pass = typing.Callable[[JackAST], None]
+
+DECLARATION_KINDS = {STATIC_VAR: STATIC, FIELD_VAR: FIELD,
+                     ARGUMENT_VAR: ARG, LOCAL_VAR: LOCAL}
+CONSTRUCTOR, METHOD = 0, 1
+
+
+class ASTCompiler(CompilationEngine):
+    """A CompilationEngine compiling in two passes: the class is first parsed
+    into a JackAST by an ASTBuilder, then code is generated from the tree.
+    Analysis passes given to the compiler run over the tree in between. The
+    generated code is the same as that of CompilationEngine.
+    """
+
+    def __init__(self, jack_tokenizer, output_stream: typing.IO,
+                 passes: typing.Sequence[Pass] = (), **options) -> None:
+        """Creates a compiler.
+
+        Args:
+            jack_tokenizer (JackTokenizer): the tokens of the class.
+            output_stream (typing.IO): the stream to write the code to.
+            passes (list): functions called with the tree of the class, in
+            order, before code is generated from it.
+            options: options of the CompilationEngine.
+        """
+        super().__init__(jack_tokenizer, output_stream, **options)
+        self.passes = passes
+        self.ast = None
+        self.line = 0  # the line of the statement being compiled
+
+    def compile_class(self) -> None:
+        """Parses the class, runs the analysis passes and generates its
+        code."""
+        self.ast = ASTBuilder(self.jt).build()
+        for analysis in self.passes:
+            analysis(self.ast)
+        self.generate_class()
+
+    def resolve(self, name: str) -> Symbol:
+        symbol = self.st.resolve(name)
+        if symbol is None:
+            raise NameError(f"Undefined variable {name!r} in line "
+                            f"{self.line}")
+        return symbol
+
+    def generate_class(self) -> None:
+        """Generates the code of the class, rooted at node 0."""
+        ast = self.ast
+        self.class_name = ast.text(0)
+        for node in ast.children(0):
+            if ast.kinds[node] == SUBROUTINE:
+                self.generate_subroutine(node)
+            else:
+                self.st.define(ast.text(node), ast.strings[ast.extras[node]],
+                               DECLARATION_KINDS[ast.kinds[node]])
+        self.write_string_builders()
+        self.vm.flush()
+
+    def generate_subroutine(self, node: int) -> None:
+        ast = self.ast
+        kinds = ast.kinds
+        self.st.start_subroutine()
+        kind = ast.extras[node]
+        if kind == METHOD:
+            self.st.define("this", self.class_name, ARG)
+        statements = []
+        for child in ast.children(node):
+            if kinds[child] == ARGUMENT_VAR or kinds[child] == LOCAL_VAR:
+                self.st.define(ast.text(child),
+                               ast.strings[ast.extras[child]],
+                               DECLARATION_KINDS[kinds[child]])
+            else:
+                statements.append(child)
+        self.vm.write_function(self.class_name + "." + ast.text(node),
+                               self.st.var_count(LOCAL))
+        if kind == CONSTRUCTOR:
+            self.write_constructor()
+        elif kind == METHOD:
+            self.vm.write_push("argument", 0)
+            self.vm.write_pop("pointer", 0)
+        for statement in statements:
+            self.generate_statement(statement)
+
+    def generate_statements(self, block: int) -> None:
+        for statement in self.ast.children(block):
+            self.generate_statement(statement)
+
+    def generate_statement(self, node: int) -> None:
+        """Generates the code of a statement, recursing into nested blocks
+        like CompilationEngine."""
+        ast = self.ast
+        vm = self.vm
+        kind = ast.kinds[node]
+        self.line = ast.lines[node]
+        first = ast.first_children[node]
+        if kind == LET:
+            symbol = self.resolve(ast.text(node))
+            if ast.extras[node]:
+                offset = self.write_array_base(
+                    symbol, self.generate_folded_expression(first))
+                self.generate_expression(ast.next_siblings[first])
+                vm.write_pop("temp", 0)
+                vm.write_pop("pointer", 1)
+                vm.write_push("temp", 0)
+                vm.write_pop("that", offset)
+            else:
+                self.generate_expression(first)
+                vm.write(POP, symbol.segment, symbol.index)
+        elif kind == IF:
+            self.if_counter += 1
+            if_counter = self.if_counter
+            self.generate_expression(first)
+            vm.write_arithmetic("NOT")
+            vm.write_if(f"label.{if_counter}")
+            block = ast.next_siblings[first]
+            self.generate_statements(block)
+            vm.write_goto(f"label_2.{if_counter}")
+            vm.write_label(f"label.{if_counter}")
+            if ast.next_siblings[block] != NO_NODE:
+                self.generate_statements(ast.next_siblings[block])
+            vm.write_label(f"label_2.{if_counter}")
+        elif kind == WHILE:
+            self.while_count += 1
+            while_count = self.while_count
+            vm.write_label(f"while_label.{while_count}")
+            self.generate_expression(first)
+            vm.write_arithmetic("NOT")
+            vm.write_if(f"while_label_2.{while_count}")
+            self.generate_statements(ast.next_siblings[first])
+            vm.write_goto(f"while_label.{while_count}")
+            vm.write_label(f"while_label_2.{while_count}")
+        elif kind == DO:
+            name, n_args = self.begin_call(first)
+            for argument in ast.children(first):
+                self.generate_expression(argument)
+                n_args += 1
+            vm.write_call(name, n_args)
+            vm.write_pop("temp", 0)
+        elif kind == RETURN:
+            if first != NO_NODE:
+                self.generate_expression(first)
+            else:
+                vm.write_push("constant", 0)
+            vm.write_return()
+
+    def begin_call(self, node: int) -> typing.Tuple[str, int]:
+        """Writes the object a method is called on, like
+        CompilationEngine.begin_subroutine_call.
+
+        Args:
+            node (int): a CALL node.
+
+        Returns:
+            tuple: the full name of the called subroutine and the number of
+            arguments already pushed, 1 for the object of a method call.
+        """
+        ast = self.ast
+        caller_name = ast.text(node)
+        subroutine_name = ast.extras[node]
+        if subroutine_name == NO_NAME:
+            # a method of the current object
+            self.vm.write_push("pointer", 0)
+            return self.class_name + "." + caller_name, 1
+        symbol = self.st.resolve(caller_name)
+        if symbol is not None:
+            # a method called on an object, which is passed as argument 0
+            self.vm.write(PUSH, symbol.segment, symbol.index)
+            return symbol.type + "." + ast.strings[subroutine_name], 1
+        return caller_name + "." + ast.strings[subroutine_name], 0
+
+    def generate_expression(self, node: int) -> None:
+        """Generates the code pushing an expression."""
+        constant = self.generate_folded_expression(node)
+        if constant is not None:
+            self.write_constant(constant)
+
+    def generate_folded_expression(self, node: int) -> typing.Optional[int]:
+        """Generates the code of an expression with an explicit stack of the
+        expressions nested in it, like
+        CompilationEngine.compile_folded_expression.
+
+        Args:
+            node (int): an EXPRESSION node.
+
+        Returns:
+            int: the value of a constant expression when folding is on, None
+            if it was pushed.
+        """
+        ast = self.ast
+        vm = self.vm
+        kinds, values = ast.kinds, ast.values
+        first_children, next_siblings = ast.first_children, ast.next_siblings
+        # the target of a frame is the expression node being generated; the
+        # call name or array symbol of a frame, and the term of the outer
+        # expression it is nested in, are kept in a parallel stack
+        frame = PendingExpression(OUTER, node)
+        stack = [frame]
+        outer = [(None, NO_NODE)]
+        term = first_children[node] if kinds[node] == EXPRESSION else node
+        while True:
+            nested_in = term
+            kind = kinds[term]
+            while kind == UNARY:
+                frame.unary.append(ast.text(term))
+                term = first_children[term]
+                kind = kinds[term]
+            value = None
+            if kind == EXPRESSION:
+                frame = PendingExpression(PARENTHESES, term)
+                stack.append(frame)
+                outer.append((None, nested_in))
+                term = first_children[term]
+                continue
+            if kind == ARRAY:
+                symbol = self.resolve(ast.text(term))
+                expression = first_children[term]
+                frame = PendingExpression(INDEX, expression)
+                stack.append(frame)
+                outer.append((symbol, nested_in))
+                term = first_children[expression] \
+                    if kinds[expression] == EXPRESSION else expression
+                continue
+            if kind == CALL:
+                name, n_args = self.begin_call(term)
+                expression = first_children[term]
+                if expression != NO_NODE:
+                    frame = PendingExpression(ARGUMENTS, expression, n_args)
+                    stack.append(frame)
+                    outer.append((name, nested_in))
+                    term = first_children[expression] \
+                        if kinds[expression] == EXPRESSION else expression
+                    continue
+                vm.write_call(name, n_args)
+            elif kind == VARIABLE:
+                symbol = self.resolve(ast.text(term))
+                vm.write(PUSH, symbol.segment, symbol.index)
+            elif kind == INT:
+                value = values[term]
+                if not self.fold:
+                    self.write_constant(value)
+                    value = None
+            elif kind == STRING:
+                if self.pool_strings:
+                    self.write_pooled_string(ast.text(term))
+                else:
+                    self.write_string(ast.text(term))
+            elif kind == THIS:
+                vm.write_push("pointer", 0)
+            term = nested_in
+
+            # the term is complete: applies it to its expression, and closes
+            # every expression that ends right after it
+            while True:
+                if frame.unary:
+                    value = self.write_unary(frame.unary, value)
+                if frame.operation is None:
+                    frame.constant = value
+                else:
+                    frame.constant = self.write_binary(
+                        frame.operation, frame.constant, value, frame.start)
+                # a single term expression has no operators, its siblings
+                # belong to its parent
+                operation = next_siblings[term] \
+                    if term != frame.target else NO_NODE
+                if operation != NO_NODE:
+                    frame.operation = ast.text(operation)
+                    frame.start = vm.position()
+                    term = next_siblings[operation]
+                    break
+                stack.pop()
+                target, term = outer.pop()
+                value = frame.constant
+                if frame.closer == OUTER:
+                    return value
+                if frame.closer == ARGUMENTS:
+                    if value is not None:
+                        self.write_constant(value)
+                    frame.n_args += 1
+                    expression = next_siblings[frame.target]
+                    if expression != NO_NODE:
+                        frame.target = expression
+                        frame.constant = frame.operation = None
+                        stack.append(frame)
+                        outer.append((target, term))
+                        term = first_children[expression] \
+                            if kinds[expression] == EXPRESSION else expression
+                        break
+                    vm.write_call(target, frame.n_args)
+                    value = None
+                elif frame.closer == INDEX:
+                    offset = self.write_array_base(target, value)
+                    vm.write_pop("pointer", 1)
+                    vm.write_push("that", offset)
+                    value = None
+                frame = stack[-1]
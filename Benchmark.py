@@ -0,0 +1,551 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import compileall
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import typing
+from ASTBuilder import ASTBuilder
+from ASTCompiler import ASTCompiler
+from CompilationEngine import CompilationEngine
+from JackCompiler import compile_file
+from JackGenerator import JackGenerator
+from JackTokenizer import JackTokenizer
+from VMCode import VMCode
+from VMWriter import VMWriter
+
+
+class RecordingWriter(VMWriter):
+    """A VMWriter that keeps the code it is asked to flush instead of writing
+    it, so code generation and output can be timed apart.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.chunks = []
+
+    def flush(self) -> None:
+        if len(self.code):
+            self.chunks.append(self.code)
+            self.code = VMCode()
+
+
+class RecursiveEngine(CompilationEngine):
+    """A CompilationEngine compiling expressions with the recursive
+    compile_term, to compare against the default iterative compiler.
+    """
+
+    compile_folded_expression = \
+        CompilationEngine.compile_recursive_expression
+
+
+def timings(samples: typing.List[float]) -> typing.Dict[str, float]:
+    """
+    Args:
+        samples (list): the durations of the repetitions of a phase.
+
+    Returns:
+        dict: the best and median duration, in seconds.
+    """
+    return {"best": min(samples), "median": statistics.median(samples)}
+
+
+def time_phases(sources: typing.List[str], repeat: int,
+                **options) -> typing.Dict[str, typing.Dict[str, float]]:
+    """Times the tokenizer, the engine and the writer separately.
+
+    Args:
+        sources (list): the Jack sources to compile.
+        repeat (int): the number of repetitions of every phase.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the timings of the "tokenize", "compile" and "write" phases.
+    """
+    binary = options.get("binary", False)
+    samples = {"tokenize": [], "compile": [], "write": []}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokenizers = [JackTokenizer(io.StringIO(source))
+                      for source in sources]
+        samples["tokenize"].append(time.perf_counter() - start)
+
+        engines = []
+        for tokenizer in tokenizers:
+            sink = io.BytesIO() if binary else io.StringIO()
+            engine = CompilationEngine(tokenizer, sink, **options)
+            engine.vm = RecordingWriter(sink, binary=binary,
+                                        optimizer=engine.optimizer)
+            engines.append(engine)
+        start = time.perf_counter()
+        for engine in engines:
+            engine.compile_class()
+        samples["compile"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for engine in engines:
+            writer = VMWriter(engine.vm.of, binary=binary,
+                              optimizer=engine.optimizer)
+            for chunk in engine.vm.chunks:
+                writer.code = chunk
+                writer.flush()
+        samples["write"].append(time.perf_counter() - start)
+    return {phase: timings(phase_samples)
+            for phase, phase_samples in samples.items()}
+
+
+def time_end_to_end(sources: typing.List[str], repeat: int,
+                    **options) -> typing.Dict[str, float]:
+    """
+    Args:
+        sources (list): the Jack sources to compile.
+        repeat (int): the number of repetitions.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the timings of compiling all sources with compile_file.
+    """
+    binary = options.get("binary", False)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for source in sources:
+            compile_file(io.StringIO(source),
+                         io.BytesIO() if binary else io.StringIO(), **options)
+        samples.append(time.perf_counter() - start)
+    return timings(samples)
+
+
+def nested_expression_class(depth: int) -> str:
+    """
+    Args:
+        depth (int): the nesting depth of the expression.
+
+    Returns:
+        str: the source of a class returning an expression nested depth
+        times, alternating parentheses, unary operations, array indexes and
+        subroutine arguments.
+    """
+    openings = ["(", "-", "a[", "Math.abs(", "~("]
+    closings = [")", "", "]", ")", ")"]
+    expression = "".join(openings[level % len(openings)]
+                         for level in range(depth)) + "x + 1" + \
+        "".join(closings[level % len(closings)]
+                for level in reversed(range(depth)))
+    return ("class Nested {\n"
+            "   function int f(int x, Array a) {\n"
+            f"      return {expression};\n"
+            "   }\n"
+            "}\n")
+
+
+def compare_expression_compilers(sources: typing.List[str], repeat: int,
+                                 nesting: int = 0,
+                                 **options) -> typing.Dict[str, typing.Any]:
+    """Times the iterative and the recursive expression compilers.
+
+    Args:
+        sources (list): the Jack sources to compile.
+        repeat (int): the number of repetitions.
+        nesting (int): if positive, also compiles an expression nested this
+        deep with both compilers.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the timings of compiling the tokenized sources with each
+        compiler and, for the nested expression, its timings or the error
+        which stopped the compiler.
+    """
+    binary = options.get("binary", False)
+    results = {}
+    for name, engine_class in (("iterative", CompilationEngine),
+                               ("recursive", RecursiveEngine)):
+        samples = []
+        for _ in range(repeat):
+            engines = [engine_class(JackTokenizer(io.StringIO(source)),
+                                    io.BytesIO() if binary else io.StringIO(),
+                                    **options)
+                       for source in sources]
+            start = time.perf_counter()
+            for engine in engines:
+                engine.compile_class()
+            samples.append(time.perf_counter() - start)
+        results[name] = timings(samples)
+        if nesting > 0:
+            engine = engine_class(
+                JackTokenizer(io.StringIO(nested_expression_class(nesting))),
+                io.BytesIO() if binary else io.StringIO(), **options)
+            start = time.perf_counter()
+            try:
+                engine.compile_class()
+                results[name]["nested"] = time.perf_counter() - start
+            except RecursionError as error:
+                results[name]["nested"] = f"{type(error).__name__}: {error}"
+    results["speedup"] = results["recursive"]["best"] / \
+        results["iterative"]["best"]
+    if nesting > 0:
+        results["nesting"] = nesting
+    return results
+
+
+def compare_ast_compiler(sources: typing.List[str], repeat: int,
+                         **options) -> typing.Dict[str, typing.Any]:
+    """Times the two pass ASTCompiler against the one pass engine.
+
+    Args:
+        sources (list): the Jack sources to compile.
+        repeat (int): the number of repetitions.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the timings of the one pass engine and of the parse and code
+        generation passes, and the size of the trees.
+    """
+    binary = options.get("binary", False)
+    samples = {"one_pass": [], "parse": [], "generate": []}
+    trees = []
+    for _ in range(repeat):
+        tokenizers = [JackTokenizer(io.StringIO(source))
+                      for source in sources]
+        engines = [CompilationEngine(tokenizer,
+                                     io.BytesIO() if binary else io.StringIO(),
+                                     **options)
+                   for tokenizer in tokenizers]
+        start = time.perf_counter()
+        for engine in engines:
+            engine.compile_class()
+        samples["one_pass"].append(time.perf_counter() - start)
+
+        compilers = [ASTCompiler(JackTokenizer(io.StringIO(source)),
+                                 io.BytesIO() if binary else io.StringIO(),
+                                 **options)
+                     for source in sources]
+        start = time.perf_counter()
+        trees = [ASTBuilder(compiler.jt).build() for compiler in compilers]
+        samples["parse"].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for compiler, tree in zip(compilers, trees):
+            compiler.ast = tree
+            compiler.generate_class()
+        samples["generate"].append(time.perf_counter() - start)
+    results = {phase: timings(phase_samples)
+               for phase, phase_samples in samples.items()}
+    results["nodes"] = sum(len(tree) for tree in trees)
+    results["bytes_per_node"] = sum(tree.nbytes() for tree in trees) / \
+        max(results["nodes"], 1)
+    return results
+
+
+def peak_memory(sources: typing.List[str],
+                **options) -> typing.Dict[str, int]:
+    """
+    Args:
+        sources (list): the Jack sources to compile.
+        options: options of the CompilationEngine. With mapped, the source
+        is compiled from a file mapped into memory, like with --mmap.
+
+    Returns:
+        dict: the peak of memory allocated by Python while compiling the
+        largest source, and the peak resident set size of the process.
+    """
+    binary = options.get("binary", False)
+    largest = max(sources, key=len)
+    with tempfile.TemporaryDirectory() as directory:
+        if options.get("mapped"):
+            path = os.path.join(directory, "Largest.jack")
+            with open(path, 'w') as source_file:
+                source_file.write(largest)
+            input_file = open(path, 'rb')
+        else:
+            input_file = io.StringIO(largest)
+        with input_file:
+            tracemalloc.start()
+            compile_file(input_file, io.BytesIO() if binary
+                         else io.StringIO(), **options).jt.close()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    memory = {"largest_file_traced_bytes": traced_peak}
+    try:
+        import resource
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        memory["max_rss_bytes"] = max_rss if sys.platform == "darwin" \
+            else max_rss * 1024
+    except ImportError:
+        pass
+    return memory
+
+
+def run_benchmark(sources: typing.Dict[str, str], repeat: int = 3,
+                  nesting: int = 0,
+                  **options) -> typing.Dict[str, typing.Any]:
+    """Benchmarks every phase of the compiler on a set of sources.
+
+    Args:
+        sources (dict): the Jack sources to compile, by file name.
+        repeat (int): the number of repetitions of every measurement.
+        nesting (int): the depth of the nested expression compiled by
+        compare_expression_compilers, 0 to skip it.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the results, ready to be dumped as JSON.
+    """
+    texts = list(sources.values())
+    lines = sum(text.count("\n") for text in texts)
+    tokens = sum(JackTokenizer(io.StringIO(text)).len for text in texts)
+    end_to_end = time_end_to_end(texts, repeat, **options)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": options,
+        "corpus": {"files": len(texts), "lines": lines, "tokens": tokens,
+                   "bytes": sum(len(text) for text in texts)},
+        "phases": time_phases(texts, repeat, **options),
+        "end_to_end": dict(end_to_end,
+                           lines_per_second=lines / end_to_end["best"],
+                           tokens_per_second=tokens / end_to_end["best"]),
+        "peak_memory": peak_memory(texts, **options),
+        "peak_memory_mapped": peak_memory(texts, mapped=True, **options),
+        "expressions": compare_expression_compilers(texts, repeat, nesting,
+                                                    **options),
+        "ast": compare_ast_compiler(texts, repeat, **options),
+    }
+
+
+# The import time of the modules loaded by a single file build, above those
+# the interpreter loads by itself, in milliseconds. Benchmark.py --startup
+# fails when it is exceeded.
+STARTUP_BUDGET = 25.0
+STARTUP_CLASS = """class Main {
+    function void main() {
+        do Output.printString("Hello world!");
+        return;
+    }
+}
+"""
+
+
+def import_times(command: typing.List[str]) -> typing.Dict[str, float]:
+    """
+    Args:
+        command (list): the arguments of a Python interpreter run.
+
+    Returns:
+        dict: the cumulative import time of every module the run imports at
+        the top level, in milliseconds, as reported by -X importtime.
+    """
+    result = subprocess.run(
+        command[:1] + ["-X", "importtime"] + command[1:],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def measure_startup(repeat: int = 20) -> typing.Dict[str, typing.Any]:
+    """Times single file builds of a one-class program, each in a fresh
+    interpreter, the way most compilations run.
+
+    Args:
+        repeat (int): the number of runs.
+
+    Returns:
+        dict: the timings of the builds and of an interpreter doing nothing,
+        the startup overhead of the compiler between their best times, and
+        the import time of the modules the build loads itself, by module
+        and in total, in milliseconds.
+    """
+    compiler_dir = os.path.dirname(os.path.abspath(__file__))
+    # the bytecode is compiled as it would be after a first run, even if the
+    # environment does not let the interpreter write it
+    compileall.compile_dir(compiler_dir, maxlevels=0, quiet=1)
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, "Main.jack")
+        with open(source_path, 'w') as source_file:
+            source_file.write(STARTUP_CLASS)
+        build = [sys.executable, os.path.join(compiler_dir, "JackCompiler.py"),
+                 "--force", source_path]
+        interpreter = [sys.executable, "-c", "pass"]
+        samples = {"interpreter": [], "build": []}
+        for _ in range(repeat):
+            for name, command in (("interpreter", interpreter),
+                                  ("build", build)):
+                start = time.perf_counter()
+                subprocess.run(command, check=True)
+                samples[name].append(time.perf_counter() - start)
+        own_imports = import_times(interpreter)
+        imports = {name: cumulative for name, cumulative in
+                   import_times(build).items() if name not in own_imports}
+    results = {name: timings(name_samples)
+               for name, name_samples in samples.items()}
+    results["overhead"] = results["build"]["best"] - \
+        results["interpreter"]["best"]
+    results["imports"] = imports
+    results["import_total"] = sum(imports.values())
+    return results
+
+
+def emulate_programs(directories: typing.List[str],
+                     inputs: typing.Sequence[str] = (),
+                     ram: typing.Optional[typing.Dict[int, int]] = None,
+                     cycles: typing.Optional[int] = None,
+                     **options) -> typing.Dict[str, typing.Dict]:
+    """Compiles Jack programs in memory and runs them in a VMEmulator, to
+    measure the speed of the generated code.
+
+    Args:
+        directories (list): directories of .jack programs.
+        inputs (list): the keyboard input of every program.
+        ram (dict): initial values of RAM words of every program, by
+        address.
+        cycles (int): the maximal number of VM commands of every program.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the emulator statistics of every program, with its number of
+        VM commands in "commands" and its output, by directory name.
+    """
+    from VMEmulator import VMEmulator
+    options["binary"] = True
+    results = {}
+    for directory in directories:
+        codes = {}
+        for filename, source in read_project(directory).items():
+            output = io.BytesIO()
+            compile_file(io.StringIO(source), output, **options)
+            codes[os.path.splitext(filename)[0]] = \
+                VMCode.from_bytes(output.getvalue())
+        emulator = VMEmulator(codes, inputs, ram)
+        start = time.perf_counter()
+        emulator.run(cycles)
+        seconds = time.perf_counter() - start
+        results[os.path.basename(os.path.normpath(directory))] = dict(
+            emulator.stats(), commands=sum(map(len, codes.values())),
+            seconds=seconds, output=emulator.output())
+    return results
+
+
+def read_project(directory: str) -> typing.Dict[str, str]:
+    """
+    Args:
+        directory (str): a directory of .jack files.
+
+    Returns:
+        dict: the sources of the directory, by file name.
+    """
+    sources = {}
+    for filename in sorted(os.listdir(directory)):
+        if os.path.splitext(filename)[1].lower() == ".jack":
+            with open(os.path.join(directory, filename), 'r') as file:
+                sources[filename] = file.read()
+    return sources
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="Benchmark",
+        description="Times the compiler phases on a generated Jack project, "
+                    "or on an existing one, and reports JSON results.")
+    parser.add_argument("--project", help="benchmark the .jack files of this "
+                                          "directory instead of a generated "
+                                          "project")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--subroutines", type=int, default=20)
+    parser.add_argument("--statements", type=int, default=30)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--strings", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--nesting", type=int, default=10000,
+                        help="depth of the nested expression compiled by "
+                             "both expression compilers, 0 to skip it")
+    parser.add_argument("-O", dest="optimization_level", type=int, default=0,
+                        choices=[0, 1])
+    parser.add_argument("--output", help="write the JSON results to this "
+                                         "file instead of stdout")
+    parser.add_argument("--startup", action="store_true",
+                        help="only time single file builds in fresh "
+                             "interpreters, and fail if their imports take "
+                             "longer than the budget")
+    parser.add_argument("--startup-budget", type=float,
+                        default=STARTUP_BUDGET, metavar="MS",
+                        help="import time budget of a single file build, in "
+                             f"milliseconds (default: {STARTUP_BUDGET})")
+    parser.add_argument("--emulate", action="append", metavar="DIR",
+                        help="only compile this program and run it in the "
+                             "VM emulator, counting the commands it executes "
+                             "(can be repeated)")
+    parser.add_argument("--input", action="append", default=[],
+                        metavar="LINE",
+                        help="a line typed on the keyboard of the emulated "
+                             "programs, in order")
+    parser.add_argument("--ram", action="append", default=[],
+                        metavar="ADDRESS=VALUE",
+                        help="set a RAM word of the emulated programs")
+    parser.add_argument("--cycles", type=int,
+                        help="stop emulated programs after this many VM "
+                             "commands")
+    arguments = parser.parse_args()
+    if arguments.emulate:
+        from VMEmulator import ram_value
+        results = emulate_programs(
+            arguments.emulate, arguments.input,
+            dict(map(ram_value, arguments.ram)), arguments.cycles,
+            optimization_level=arguments.optimization_level)
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        sys.exit()
+    if arguments.startup:
+        results = measure_startup(max(arguments.repeat, 20))
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        for name, cumulative in sorted(results["imports"].items(),
+                                       key=lambda item: -item[1]):
+            print(f"{cumulative:8.2f} ms  {name}", file=sys.stderr)
+        print(f"{results['import_total']:8.2f} ms  imports in total, budget "
+              f"{arguments.startup_budget:.2f} ms", file=sys.stderr)
+        if results["import_total"] > arguments.startup_budget:
+            sys.exit(f"startup regression: imports take "
+                     f"{results['import_total']:.2f} ms, over the budget of "
+                     f"{arguments.startup_budget:.2f} ms")
+        sys.exit()
+    if arguments.project:
+        project = read_project(arguments.project)
+        corpus = {"project": os.path.abspath(arguments.project)}
+    else:
+        generator = JackGenerator(arguments.seed, arguments.classes,
+                                  arguments.subroutines, arguments.statements,
+                                  arguments.depth, arguments.strings)
+        project = generator.project()
+        corpus = {"seed": arguments.seed, "classes": arguments.classes,
+                  "subroutines": arguments.subroutines,
+                  "statements": arguments.statements,
+                  "depth": arguments.depth, "strings": arguments.strings}
+    results = run_benchmark(project, arguments.repeat, arguments.nesting,
+                            optimization_level=arguments.optimization_level)
+    results["corpus"].update(corpus)
+    if arguments.output:
+        with open(arguments.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
@@ -0,0 +1,153 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+
+MANIFEST_NAME = ".jackbuild.json"
+DIGEST_SIZE = 1 << 16
+
+# The modules whose code decides the generated code, and nothing else: a
+# change to any of them invalidates every cached output. A new module taking
+# part in code generation has to be listed here.
+CODEGEN_MODULES = ("JackCompiler.py", "JackTokenizer.py",
+                   "CompilationEngine.py", "SymbolTable.py", "VMWriter.py",
+                   "VMCode.py", "PeepholeOptimizer.py", "JackAST.py",
+                   "ASTBuilder.py", "ASTCompiler.py", "ClassSplitter.py",
+                   "Profiler.py", "CallGraph.py", "Inliner.py")
+
+
+def file_digest(path: str) -> typing.Optional[str]:
+    """
+    Args:
+        path (str): path of the file to hash.
+
+    Returns:
+        str: the hex sha256 of the file's content, or None if it is missing.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            # a chunk at a time, for outputs streamed to disk
+            for chunk in iter(lambda: file.read(DIGEST_SIZE), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def compiler_fingerprint(*options: str) -> str:
+    """
+    Args:
+        options (str): compilation options that change the generated code.
+
+    Returns:
+        str: a hex digest of the code generating modules and the given
+        options.
+    """
+    digest = hashlib.sha256()
+    compiler_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in CODEGEN_MODULES:
+        digest.update(module.encode())
+        digest.update((file_digest(os.path.join(compiler_dir, module))
+                       or "").encode())
+    for option in options:
+        digest.update(option.encode())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """An on-disk manifest of the .jack files of a directory whose .vm output
+    is up to date. Every entry holds the content hash of the source and of
+    the output it compiled into, under a compiler fingerprint.
+    """
+
+    def __init__(self, directory: str, fingerprint: str,
+                 force: bool = False, output_extension: str = ".vm") -> None:
+        """Loads the manifest of the given directory, dropping it when it was
+        written by a different compiler.
+
+        Args:
+            directory (str): the directory holding the sources and outputs.
+            fingerprint (str): the fingerprint of the running compiler.
+            force (bool): treat every file as changed, still recording it.
+            output_extension (str): the extension of the compiled outputs.
+        """
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.fingerprint = fingerprint
+        self.force = force
+        self.output_extension = output_extension
+        self.entries = {}
+        self.source_digests = {}
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.manifest_path, 'r') as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return
+        if manifest.get("fingerprint") == fingerprint:
+            self.entries = manifest.get("files", {})
+
+    def output_path(self, input_path: str) -> str:
+        return os.path.splitext(input_path)[0] + self.output_extension
+
+    def is_fresh(self, input_path: str) -> bool:
+        """Checks whether a file can be skipped, and counts a hit or a miss.
+
+        Args:
+            input_path (str): path of the .jack file.
+
+        Returns:
+            bool: True if neither the source nor its output changed since
+            the file was last recorded.
+        """
+        source_digest = file_digest(input_path)
+        self.source_digests[input_path] = source_digest
+        entry = self.entries.get(os.path.basename(input_path))
+        if not self.force and entry is not None and \
+                entry["source"] == source_digest and \
+                entry["output"] == file_digest(self.output_path(input_path)):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, input_path: str) -> None:
+        """Marks a freshly compiled file as up to date.
+
+        Args:
+            input_path (str): path of the .jack file.
+        """
+        source_digest = self.source_digests.get(input_path)
+        if source_digest is None:
+            source_digest = file_digest(input_path)
+        self.entries[os.path.basename(input_path)] = {
+            "source": source_digest,
+            "output": file_digest(self.output_path(input_path))}
+
+    def forget(self, input_path: str) -> None:
+        """Drops a file from the manifest, e.g. when it failed to compile.
+
+        Args:
+            input_path (str): path of the .jack file.
+        """
+        self.entries.pop(os.path.basename(input_path), None)
+
+    def save(self) -> None:
+        """Writes the manifest back to disk."""
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w') as manifest_file:
+            json.dump({"fingerprint": self.fingerprint,
+                       "files": self.entries}, manifest_file,
+                      indent=1, sort_keys=True)
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,123 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from VMCode import VMCode, CALL, FUNCTION
+
+# The entry points of a program: Sys.init when the project brings its own
+# OS, and Main.main, which the OS calls.
+ROOTS = ("Sys.init", "Main.main")
+
+
+class CallGraph:
+    """The calls between the functions of a whole program, given as the
+    VMCode of each of its classes. Calls through variables are compiled to
+    the function of the variable's declared type, so the call targets are
+    exactly the functions which may run.
+    """
+
+    def __init__(self, codes: typing.Dict[str, VMCode]) -> None:
+        """Builds the graph.
+
+        Args:
+            codes (dict): the code of every class of the program, by path.
+        """
+        self.codes = codes
+        # function name -> (path, start, end) of its code
+        self.functions = {}
+        # function name -> the names of the functions it calls, in order
+        self.calls = {}
+        for path, code in codes.items():
+            names = code.names
+            name = None
+            start = 0
+            for position, (opcode, arg, _) in enumerate(code):
+                if opcode == FUNCTION:
+                    if name is not None:
+                        self.functions[name] = (path, start, position)
+                    name, start = names[arg], position
+                    self.calls[name] = []
+                elif opcode == CALL and name is not None:
+                    self.calls[name].append(names[arg])
+            if name is not None:
+                self.functions[name] = (path, start, len(code))
+
+    def roots(self) -> typing.List[str]:
+        """
+        Returns:
+            list: the entry points defined by the program.
+        """
+        return [root for root in ROOTS if root in self.functions]
+
+    def reachable(self, roots: typing.Iterable[str]) -> typing.Set[str]:
+        """
+        Args:
+            roots (list): the names of the functions the program starts in.
+
+        Returns:
+            set: the functions of the program the roots may call, directly or
+            not, roots included. Calls to functions outside the program, like
+            the OS, are ignored.
+        """
+        seen = set()
+        stack = [root for root in roots if root in self.functions]
+        while stack:
+            name = stack.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            stack.extend(callee for callee in self.calls[name]
+                         if callee in self.functions and callee not in seen)
+        return seen
+
+    def prune(self, keep: typing.Set[str]) \
+            -> typing.Tuple[typing.Dict[str, VMCode], typing.List[str]]:
+        """
+        Args:
+            keep (set): the names of the functions to keep.
+
+        Returns:
+            tuple: the code of every class without the functions not kept,
+            by path, and the names of the removed functions in program order.
+        """
+        pruned_codes = {}
+        pruned = []
+        for path, code in self.codes.items():
+            pruned_code = VMCode()
+            pruned_code.names = code.names
+            pruned_code.name_ids = code.name_ids
+            for name, (function_path, start, end) in self.functions.items():
+                if function_path != path:
+                    continue
+                if name not in keep:
+                    pruned.append(name)
+                    continue
+                for column, source in ((pruned_code.opcodes, code.opcodes),
+                                       (pruned_code.args, code.args),
+                                       (pruned_code.indexes, code.indexes)):
+                    column.extend(source[start:end])
+            pruned_codes[path] = pruned_code
+        return pruned_codes, pruned
+
+
+def eliminate_dead_code(codes: typing.Dict[str, VMCode]) \
+        -> typing.Tuple[typing.Dict[str, VMCode], typing.List[str]]:
+    """Removes the functions a whole program never calls.
+
+    Args:
+        codes (dict): the code of every class of the program, by path.
+
+    Returns:
+        tuple: the code of every class with only the functions reachable from
+        the entry points of the program, by path, and the names of the
+        removed functions. Nothing is removed from a program without an
+        entry point, like a library.
+    """
+    graph = CallGraph(codes)
+    roots = graph.roots()
+    if not roots:
+        return codes, []
+    return graph.prune(graph.reachable(roots))
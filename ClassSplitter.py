@@ -0,0 +1,291 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import io
+import re
+import typing
+from CompilationEngine import CompilationEngine
+from JackTokenizer import JackTokenizer, COMMENT_PATTERN, STRING_PATTERN, \
+    DIGIT_PATTERN, IDENTIFIER_PATTERN
+
+# Classes of at least this many characters are split between workers
+SPLIT_SIZE = 1 << 16
+BATCHES_PER_JOB = 4
+SUBROUTINE_KEYWORDS = frozenset(["constructor", "function", "method"])
+
+# The tokens of LEXER which matter to split a class: braces, the words which
+# start subroutines or number labels, and string literals. Comments, strings,
+# numbers and words are matched whole, so nothing inside them is taken for
+# one of those.
+SCANNER = re.compile(r'(?P<COMMENT>{})|(?P<STRING>{})|{}|(?P<WORD>{})|'
+                     r'(?P<BRACE>[{{}}])'.format(
+                         COMMENT_PATTERN, STRING_PATTERN, DIGIT_PATTERN,
+                         IDENTIFIER_PATTERN), re.S)
+GAP = re.compile(r'(?:\s+|{})*'.format(COMMENT_PATTERN), re.S)
+
+# A contiguous run of subroutines: its start and end offsets in the source,
+# the line and column it starts in, and the if_counter, while_count and
+# string_uses of CompilationEngine when a serial compilation reaches it.
+Batch = typing.Tuple[int, int, int, int, int, int, int]
+
+
+class ClassSplit:
+    """A class cut at subroutine boundaries. Every batch of subroutines is
+    compiled as a class of its own, made of the declarations of the class
+    and the batch at its original position, by an engine which starts with
+    the label counters and string pool a serial compilation has there. The
+    code of the batches, in order, is then that of the whole class.
+    """
+
+    def __init__(self, source: str, header_end: int, class_name: str,
+                 batches: typing.List[Batch],
+                 strings: typing.List[str]) -> None:
+        """
+        Args:
+            source (str): the source of the class.
+            header_end (int): the offset of the first subroutine.
+            class_name (str): the name of the class.
+            batches (list): the batches of subroutines, in order.
+            strings (list): the string literals of the class, in order.
+        """
+        self.source = source
+        self.header = source[:header_end]
+        self.class_name = class_name
+        self.batches = batches
+        self.string_uses = len(strings)
+        # literal -> its index in the string pool, by first use
+        self.string_pool = {}
+        for literal in strings:
+            self.string_pool.setdefault(literal, len(self.string_pool))
+
+    def task(self, index: int, pool_strings: bool) \
+            -> typing.Tuple[str, str, typing.Tuple[int, int, int],
+                            typing.Dict[str, int]]:
+        """
+        Args:
+            index (int): the index of a batch.
+            pool_strings (bool): whether literals are pooled.
+
+        Returns:
+            tuple: the arguments of compile_batch, but the options.
+        """
+        start, end, line, column, if_counter, while_count, string_uses = \
+            self.batches[index]
+        header_lines = self.header.count("\n")
+        newlines = line - 1 - header_lines
+        # pads the batch to its original line and column, for errors
+        padding = "\n" * newlines + " " * (
+            column if newlines else column - (
+                len(self.header) - self.header.rfind("\n") - 1))
+        return (self.header, padding + self.source[start:end],
+                (if_counter, while_count, string_uses),
+                self.string_pool if pool_strings else {})
+
+    def submit(self, executor, **options) -> typing.List:
+        """Starts compiling the batches.
+
+        Args:
+            executor (concurrent.futures.Executor): the pool to compile in.
+            options: options of the CompilationEngine.
+
+        Returns:
+            list: the future of every batch, in order.
+        """
+        pool_strings = options.get("pool_strings", False)
+        return [executor.submit(compile_batch,
+                                *self.task(index, pool_strings), **options)
+                for index in range(len(self.batches))]
+
+    def join(self, futures: typing.List,
+             **options) -> typing.Dict[str, typing.Any]:
+        """Waits for the batches and joins their code in order, followed by
+        the string builders of the class.
+
+        Args:
+            futures (list): the futures returned by submit.
+            options: options of the CompilationEngine.
+
+        Returns:
+            dict: "output" holds the code of the class as a serial
+            compilation writes it, "commands", "removed", "strings",
+            "string_uses" and "calls_saved" are as in the report of
+            JackCompiler.compile_path. The first error of the class, in
+            source order, is raised.
+        """
+        binary = options.get("binary", False)
+        pool_strings = options.get("pool_strings", False)
+        parts = []
+        commands = removed = calls_saved = 0
+        for future in futures:
+            content, batch_commands, batch_removed, batch_calls_saved = \
+                future.result()
+            parts.append(content)
+            commands += batch_commands
+            removed += batch_removed
+            calls_saved += batch_calls_saved
+        output = io.BytesIO() if binary else io.StringIO()
+        engine = CompilationEngine(None, output, **options)
+        if pool_strings:
+            engine.class_name = self.class_name
+            engine.string_pool = self.string_pool
+            engine.write_string_builders()
+            engine.vm.flush()
+        parts.append(output.getvalue())
+        return {"commands": commands + engine.optimizer.commands_in,
+                "removed": removed + engine.optimizer.removed,
+                "strings": len(self.string_pool) if pool_strings else 0,
+                "string_uses": self.string_uses if pool_strings else 0,
+                "calls_saved": calls_saved,
+                "output": (b"" if binary else "").join(parts)}
+
+
+def split_class(source: str, n_batches: int) -> typing.Optional[ClassSplit]:
+    """
+    Args:
+        source (str): the source of a class.
+        n_batches (int): the number of batches to cut the class into, at
+        most.
+
+    Returns:
+        ClassSplit: the class cut into batches of about the same size, or
+        None if it has fewer than two subroutines or isn't laid out as
+        declarations followed by subroutines, which only a serial compilation
+        reports correctly.
+    """
+    depth = 0
+    words = []
+    # (start, end, if statements, while statements, string literals)
+    subroutines = []
+    strings = []
+    start = ifs = whiles = uses = 0
+    in_subroutine = False
+    for match in SCANNER.finditer(source):
+        kind = match.lastgroup
+        if kind == "COMMENT":
+            continue
+        if depth == 0:
+            # "class", its name, then "{"
+            if kind == "WORD" and len(words) < 2:
+                words.append(match.group())
+            elif match.group() == "{" and words[:1] == ["class"] and \
+                    len(words) == 2:
+                depth = 1
+            else:
+                return None
+        elif kind == "BRACE":
+            if match.group() == "{":
+                if not in_subroutine:
+                    return None
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:
+                subroutines.append((start, match.end(), ifs, whiles, uses))
+                in_subroutine = False
+            elif depth == 0:
+                if in_subroutine or not subroutines or not GAP.fullmatch(
+                        source, subroutines[-1][1], match.start()):
+                    return None
+                break
+        elif in_subroutine:
+            if kind == "STRING":
+                strings.append(match.group()[1:-1])
+                uses += 1
+            elif kind == "WORD":
+                if match.group() == "if":
+                    ifs += 1
+                elif match.group() == "while":
+                    whiles += 1
+        elif kind == "WORD" and match.group() in SUBROUTINE_KEYWORDS:
+            if subroutines and not GAP.fullmatch(
+                    source, subroutines[-1][1], match.start()):
+                return None
+            in_subroutine = True
+            start, ifs, whiles, uses = match.start(), 0, 0, 0
+        elif subroutines:
+            # a declaration after the first subroutine
+            return None
+    else:
+        return None
+    if len(subroutines) < 2 or len(words) < 2:
+        return None
+    # cuts the class into batches of about the same number of characters
+    size = (subroutines[-1][1] - subroutines[0][0]) / n_batches
+    batches = []
+    line = source.count("\n", 0, subroutines[0][0]) + 1
+    if_counter = while_count = string_uses = 0
+    first = 0
+    for index, (start, end, ifs, whiles, uses) in enumerate(subroutines):
+        if index + 1 < len(subroutines) and \
+                end - subroutines[first][0] < size:
+            continue
+        batch_start = subroutines[first][0]
+        column = batch_start - source.rfind("\n", 0, batch_start) - 1
+        batches.append((batch_start, end, line, column, if_counter,
+                        while_count, string_uses))
+        for _, _, ifs, whiles, uses in subroutines[first:index + 1]:
+            if_counter += ifs
+            while_count += whiles
+            string_uses += uses
+        if index + 1 < len(subroutines):
+            line += source.count("\n", batch_start,
+                                 subroutines[index + 1][0])
+        first = index + 1
+    return ClassSplit(source, subroutines[0][0], words[1], batches, strings)
+
+
+class BatchEngine(CompilationEngine):
+    """A CompilationEngine compiling a batch of the subroutines of a split
+    class, starting from the state a serial compilation of the whole class
+    has before them. The string builders are written once all batches are
+    joined.
+    """
+
+    def __init__(self, jack_tokenizer: JackTokenizer,
+                 output_stream: typing.IO,
+                 state: typing.Tuple[int, int, int],
+                 string_pool: typing.Dict[str, int], **options) -> None:
+        """
+        Args:
+            jack_tokenizer (JackTokenizer): the tokens of the batch, as a
+            class.
+            output_stream (typing.IO): the stream to write the code to.
+            state (tuple): the starting if_counter, while_count and
+            string_uses.
+            string_pool (dict): the string pool of the whole class.
+            options: options of the CompilationEngine.
+        """
+        super().__init__(jack_tokenizer, output_stream, **options)
+        self.if_counter, self.while_count, self.string_uses = state
+        self.string_pool = dict(string_pool)
+
+    def write_string_builders(self) -> None:
+        pass
+
+
+def compile_batch(header: str, body: str, state: typing.Tuple[int, int, int],
+                  string_pool: typing.Dict[str, int], **options) \
+        -> typing.Tuple[typing.Union[str, bytes], int, int, int]:
+    """Compiles a batch of subroutines. Runs in worker processes.
+
+    Args:
+        header (str): the source of the class before its first subroutine.
+        body (str): the source of the batch, padded to its position.
+        state (tuple): the if_counter, while_count and string_uses before
+        the batch.
+        string_pool (dict): the string pool of the whole class.
+        options: options of the CompilationEngine.
+
+    Returns:
+        tuple: the code of the batch, and the numbers of commands generated,
+        of commands optimized away, and of String calls saved by the pool.
+    """
+    output = io.BytesIO() if options.get("binary") else io.StringIO()
+    engine = BatchEngine(JackTokenizer(io.StringIO(header + body + "\n}")),
+                         output, state, string_pool, **options)
+    engine.compile_class()
+    return (output.getvalue(), engine.optimizer.commands_in,
+            engine.optimizer.removed, engine.string_calls_saved)
@@ -4,7 +4,8 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from SymbolTable import SymbolTable, ARG, LOCAL, FIELD, STATIC
+from __future__ import annotations
+from SymbolTable import SymbolTable, Symbol, ARG, LOCAL, FIELD, STATIC
 from JackTokenizer import JackTokenizer, KEYWORD, SYMBOL, IDENTIFIER, \
     INT_CONST, STRING
 
@@ -12,9 +13,14 @@ from JackTokenizer import JackTokenizer, KEYWORD, SYMBOL, IDENTIFIER, \
 REMEMBER  - EACH FUNCTION **ONLY** ADVANCE IN ITS END!
 """
 
-import typing
 import JackTokenizer as JT
 import VMWriter as vm
+from PeepholeOptimizer import PeepholeOptimizer, to_signed, MAX_CONSTANT
+from VMCode import PUSH, POP
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
 
 enum = {
     "constructor": 0,
@@ -31,8 +37,9 @@ dict_tag_open = {"CLASS": "<class>",
 
 un_operation_dict = {
     "-": "NEG",
+    "~": "NOT",
     "^": "SHIFTLEFT",
-    "#": "SHFITRIGHT"
+    "#": "SHIFTRIGHT"
 }
 
 operation_dict = {
@@ -56,6 +63,122 @@ LINE = "\n"
 
 UNARY_OP = ['-', '~', '^', '#']
 
+BINARY_OP = frozenset(['+', '-', '*', '/', '&', '|', '<', '>', '='])
+
+KEYWORD_CONSTANTS = frozenset(['true', 'false', 'null', 'this'])
+
+TRUE = -1
+
+# Without shiftleft, x * 2^k is compiled to k doublings of four commands each,
+# which only beats a call to Math.multiply for small k.
+MAX_DOUBLINGS = 4
+
+
+def fold_unary(operation: str, value: int) -> typing.Optional[int]:
+    """
+    Args:
+        operation (str): a unary operation symbol.
+        value (int): the constant operand.
+
+    Returns:
+        int: the result of the operation as a signed 16 bit value, or None if
+        it can't be computed at compile time.
+    """
+    if operation == "-":
+        return to_signed(-value)
+    if operation == "~":
+        return to_signed(~value)
+    if operation == "^":
+        return to_signed(value << 1)
+    # shiftright is left to the target, which defines its sign handling
+    return None
+
+
+def fold_binary(operation: str, left: int,
+                right: int) -> typing.Optional[int]:
+    """
+    Args:
+        operation (str): a binary operation symbol.
+        left (int): the constant left operand.
+        right (int): the constant right operand.
+
+    Returns:
+        int: the result of the operation as a signed 16 bit value, with the
+        truncating division of Math.divide and -1 for true, or None if it
+        can't be computed at compile time.
+    """
+    if operation == "+":
+        return to_signed(left + right)
+    if operation == "-":
+        return to_signed(left - right)
+    if operation == "*":
+        return to_signed(left * right)
+    if operation == "/":
+        if right == 0:
+            return None
+        quotient = abs(left) // abs(right)
+        return to_signed(quotient if (left < 0) == (right < 0)
+                         else -quotient)
+    if operation == "&":
+        return to_signed(left & right)
+    if operation == "|":
+        return to_signed(left | right)
+    if operation == "<":
+        return TRUE if left < right else 0
+    if operation == ">":
+        return TRUE if left > right else 0
+    if operation == "=":
+        return TRUE if left == right else 0
+    return None
+
+
+def power_of_two(value: int) -> typing.Optional[int]:
+    """
+    Args:
+        value (int): any integer.
+
+    Returns:
+        int: k if value is 2^k for k > 0, None otherwise.
+    """
+    if value > 1 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
+# What ends an expression started by the iterative expression compiler: the
+# end of the outermost expression, a ")" of parentheses, the "]" of an array
+# index, or the "," or ")" after a subroutine argument.
+OUTER, PARENTHESES, INDEX, ARGUMENTS = range(4)
+EXPRESSION_END = frozenset([")", "]", ",", ";"])
+
+
+class PendingExpression:
+    """An expression the iterative expression compiler started and has not
+    finished yet, with the state compile_recursive_expression keeps in its
+    local variables.
+    """
+
+    __slots__ = ("closer", "target", "n_args", "constant", "operation",
+                 "start", "unary")
+
+    def __init__(self, closer: int, target=None, n_args: int = 0) -> None:
+        """Starts an expression.
+
+        Args:
+            closer (int): what ends the expression, OUTER, PARENTHESES, INDEX
+            or ARGUMENTS.
+            target: the Symbol of the indexed array, or the name of the called
+            subroutine.
+            n_args (int): the number of arguments of the call pushed so far.
+        """
+        self.closer = closer
+        self.target = target
+        self.n_args = n_args
+        self.constant = None  # the value of the left operand, if constant
+        self.operation = None  # the operation waiting for its right operand
+        self.start = 0  # the position of the right operand's code
+        self.unary = []  # unary operations on the term being compiled
+
 
 class CompilationEngine:
     """Gets input from a JackTokenizer and emits its parsed structure into an
@@ -63,18 +186,34 @@ class CompilationEngine:
     """
 
     def __init__(self, jack_tokenizer: JT.JackTokenizer,
-                 output_stream: typing.TextIO) -> None:
+                 output_stream: typing.IO, binary: bool = False,
+                 optimization_level: int = 0,
+                 shift_ops: bool = False,
+                 pool_strings: bool = False) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param binary: Write the binary VMCode format instead of text.
+        :param optimization_level: 0 emits the code as generated, 1 folds
+        constant expressions, strength-reduces multiplications, reaches
+        array entries at constant indexes through the that segment and runs
+        the peephole optimizer.
+        :param shift_ops: The target supports the shiftleft command.
+        :param pool_strings: Build every distinct string literal of the class
+        once and reuse it, instead of building it on every evaluation. The
+        strings are shared, so code must not dispose or modify literals.
         """
         self.jt = jack_tokenizer
         self.output_file = output_stream
         self.if_counter = 0
         self.while_count = 0
-        self.vm = vm.VMWriter(output_stream)
+        self.fold = optimization_level >= 1
+        self.shift_ops = shift_ops
+        self.optimizer = PeepholeOptimizer(optimization_level)
+        self.vm = vm.VMWriter(output_stream, binary=binary,
+                              optimizer=self.optimizer)
         self.class_name = None
         self.dict_compile_func = {"class": self.compile_class,
                                   "field": self.compile_class_var_dec,
@@ -94,15 +233,44 @@ class CompilationEngine:
         }
 
         self.st = SymbolTable()
+        self.pool_strings = pool_strings
+        self.string_pool = {}  # literal -> its index in the pool
+        self.string_uses = 0
+        self.string_calls_saved = 0
 
     def write_constructor(self):
         arg_num = self.st.var_count(FIELD)
         self.vm.write_push("constant", arg_num)
         self.vm.write_call("Memory.alloc", 1)
+        self.vm.write_pop("pointer", 0)
 
     def advance(self):
         self.jt.advance()
 
+    def resolve(self, name: str) -> Symbol:
+        """
+        Args:
+            name (str): name of a variable used by the current statement.
+
+        Returns:
+            Symbol: the variable.
+        """
+        symbol = self.st.resolve(name)
+        if symbol is None:
+            line, column = self.jt.position()
+            raise NameError(f"Undefined variable {name!r} near line {line}, "
+                            f"column {column}")
+        return symbol
+
+    def unexpected(self) -> SyntaxError:
+        """
+        Returns:
+            SyntaxError: an error about the current token.
+        """
+        line, column = self.jt.position()
+        return SyntaxError(f"Unexpected token {self.jt.get_cur_token()!r} "
+                           f"in line {line}, column {column}")
+
     def __check_block(self):
         """Check Next Statement """
 
@@ -112,6 +280,11 @@ class CompilationEngine:
             else:
                 if self.jt.token_type() == "KEYWORD":
                     self.dict_compile_func[self.jt.keyword()]()
+                else:
+                    line, column = self.jt.position()
+                    raise SyntaxError(
+                        f"Unexpected token {self.jt.get_cur_token()!r} in "
+                        f"line {line}, column {column}")
 
     def compile_class(self) -> None:
         """Compiles a complete class."""
@@ -128,29 +301,27 @@ class CompilationEngine:
 
         # Writes } - symbol
         self.jt.advance()
+        self.write_string_builders()
+        self.vm.flush()
 
     def compile_class_var_dec(self) -> None:
         """Compiles a static declaration or a field declaration."""
         # Writes class variable-static or field - keyword
-        obj_kind = self.jt.keyword()  # sets the objects kind
+        obj_kind = FIELD if self.jt.keyword() == "field" else STATIC
         self.jt.advance()
-        obj_type = self.jt.token_type()  # sets the objects type
-        while self.jt.has_more_tokens():
-            if self.jt.symbol() == ";":
-                # Writes ; - symbol
-                break
-            if self.jt.get_cur_token() == ",":
-                continue
-            else:
+        obj_type = self.jt.get_cur_token()  # sets the objects type
+        self.jt.advance()
+        while self.jt.get_cur_token() != ";":
+            if self.jt.get_cur_token() != ",":
                 obj_name = self.jt.get_cur_token()
                 self.st.define(obj_name, obj_type, obj_kind)  # writes the object to the symbol table
-                self.jt.advance()
+            self.jt.advance()
 
+        # Writes ; - symbol
         self.jt.advance()
 
     def compile_subroutine(self) -> None:
         """Compiles a complete method, function, or constructor."""
-        # Our code goes here!
         self.st.start_subroutine()
         # Written function/method/constructor - keyword
         method_type = self.jt.get_cur_token()
@@ -165,9 +336,17 @@ class CompilationEngine:
 
         # Open bracket of func
         self.jt.advance()
-        n_args = self.compile_parameter_list(method_type)
-        self.vm.write_function(func_name, n_args)
+        self.compile_parameter_list(method_type)
+        # Close bracket of func
+        self.advance()
+
+        # start func body (passed '{' )
+        self.advance()
+        while self.jt.get_cur_token() == 'var':
+            self.compile_var_dec()
 
+        # the locals count is only known once all var declarations are read
+        self.vm.write_function(func_name, self.st.var_count(LOCAL))
         if method_type == "constructor":
             self.write_constructor()
 
@@ -175,15 +354,6 @@ class CompilationEngine:
             self.vm.write_push("argument", 0)
             self.vm.write_pop("pointer", 0)
 
-        self.advance()
-        # OPEN SubroutineBody
-
-        # start func body (passed '{' )
-        self.advance()
-        while self.jt.get_cur_token() == 'var':
-            self.compile_var_dec()
-            # self.jt.advance()
-
         self.compile_statements()
 
         # Closed Curly Bracket
@@ -195,38 +365,27 @@ class CompilationEngine:
         """
         if calli_type == "method":  # TODO: Daniels elephant tail.
             self.st.define("this", self.class_name, ARG)
-        if self.jt.get_cur_token() == ")":
-            return
 
-        while self.jt.has_more_tokens():
-            if self.jt.symbol() == ")":
-                break
-            else:
-                if self.jt.get_cur_token() == ",":
-                    continue
-                else:
-                    token_type = self.jt.get_cur_token()
-                    self.jt.advance()
-                    token_name = self.jt.get_cur_token()
-                    self.st.define(token_name, token_type, ARG)
+        while self.jt.get_cur_token() != ")":
+            if self.jt.get_cur_token() != ",":
+                token_type = self.jt.get_cur_token()
                 self.jt.advance()
+                token_name = self.jt.get_cur_token()
+                self.st.define(token_name, token_type, ARG)
+            self.jt.advance()
         return self.st.var_count(ARG)
 
     def compile_var_dec(self) -> None:
         """Compiles a var declaration."""
         # token = "var"
         self.jt.advance()
-        while self.jt.has_more_tokens():
-            if self.jt.symbol() == ";":
-                break
-            elif self.jt.get_cur_token() == ",":
-                continue
-            else:
-                token_type = self.jt.token_type()
-                self.advance()
+        token_type = self.jt.get_cur_token()
+        self.advance()
+        while self.jt.get_cur_token() != ";":
+            if self.jt.get_cur_token() != ",":
                 token_name = self.jt.get_cur_token()
                 self.st.define(token_name, token_type, LOCAL)
-                self.advance()
+            self.advance()
         self.jt.advance()
 
     def compile_statements(self) -> None:
@@ -243,26 +402,64 @@ class CompilationEngine:
         # Put subroutine or className|varName name - identifier
         caller_name = self.jt.get_cur_token()
         self.advance()
-        while self.jt.get_cur_token() == ".":
+        self.compile_subroutine_call(caller_name)
+
+        # writes symbol ")"
+        self.advance()
+        # the returned value of a do statement is discarded
+        self.vm.write_pop("temp", 0)
+        # writes symbol ";"
+        self.advance()
+
+    def compile_subroutine_call(self, caller_name: str) -> None:
+        """Compiles a subroutine call whose first identifier was already read.
+        The current token should be "(" or "." and the routine stops on the
+        closing ")".
+
+        Args:
+            caller_name (str): the subroutine, class or variable name which
+            starts the call.
+        """
+        name, n_args = self.begin_subroutine_call(caller_name)
+        n_args += self.compile_expression_list()
+        self.vm.write_call(name, n_args)
+
+    def begin_subroutine_call(self, caller_name: str) -> typing.Tuple[str, int]:
+        """Compiles the part of a subroutine call before its arguments: the
+        name and the object a method is called on. The current token should
+        be "(" or "." and the routine stops after the opening "(".
+
+        Args:
+            caller_name (str): the subroutine, class or variable name which
+            starts the call.
+
+        Returns:
+            tuple: the full name of the called subroutine and the number of
+            arguments already pushed, 1 for the object of a method call.
+        """
+        n_args = 0
+        if self.jt.get_cur_token() == ".":
             # Put '.'
-            caller_name += "."
             self.advance()
-
             # put subroutineCall - identifier
-            caller_name += self.jt.get_cur_token()
+            subroutine_name = self.jt.get_cur_token()
             self.advance()
+            symbol = self.st.resolve(caller_name)
+            if symbol is not None:
+                # a method called on an object, which is passed as argument 0
+                self.vm.write(PUSH, symbol.segment, symbol.index)
+                caller_name = symbol.type
+                n_args = 1
+            caller_name += "." + subroutine_name
+        else:
+            # a method of the current object
+            self.vm.write_push("pointer", 0)
+            caller_name = self.class_name + "." + caller_name
+            n_args = 1
 
         # Write symbol "("
         self.advance()
-
-        # if self.jt.get_cur_token() != ")":
-        param_count = self.compile_expression_list()
-
-        # writes symbol ")"
-        self.advance()
-        self.vm.write_call(caller_name, param_count)
-        # writes symbol ";"
-        self.advance()
+        return caller_name, n_args
 
     def compile_let(self) -> None:
         """Compiles a let statement."""
@@ -271,71 +468,77 @@ class CompilationEngine:
         # 'varName' - identifier
         var_name = self.jt.get_cur_token()
         self.advance()
+        symbol = self.resolve(var_name)
 
         if self.jt.get_cur_token() == "[":
             #  '[' - symbol
             self.advance()
-            self.compile_expression()
+            index = self.compile_folded_expression()
             #  ']' - symbol
             self.advance()
-        # navigation to var pointer plus the location (memory navigation)
-        self.vm.write_push(self.st.kind_of(var_name),
-                           self.st.index_of(var_name))  # assuming the last pushed value is an int constant
-        self.output_file.write(operation_dict["+"])  # getting the right location
-        #  '=' - symbol
-        self.advance()
-        self.compile_expression()
-        self.vm.write_pop("temp", 0)
-        self.vm.write_pop("pointer", 1)
-        self.vm.write_push("temp", 0)
-        self.vm.write_pop("that", 0)
+            # navigation to var pointer plus the location (memory navigation)
+            offset = self.write_array_base(symbol, index)
+            #  '=' - symbol
+            self.advance()
+            self.compile_expression()
+            self.vm.write_pop("temp", 0)
+            self.vm.write_pop("pointer", 1)
+            self.vm.write_push("temp", 0)
+            self.vm.write_pop("that", offset)
+        else:
+            #  '=' - symbol
+            self.advance()
+            self.compile_expression()
+            self.vm.write(POP, symbol.segment, symbol.index)
         # end of line (;)
         self.advance()
 
     def compile_while(self) -> None:
         """Compiles a while statement."""
         self.while_count += 1
+        # nested loops bump the counter, so keep our own copy
+        while_count = self.while_count
         #  the 'while' itself
         self.advance()
         #  '('
         self.advance()
-        self.vm.write_label(f"while_label.{self.while_count}")
+        self.vm.write_label(f"while_label.{while_count}")
         self.compile_expression()
-        self.vm.write_arithmetic("NEG")
-        self.vm.write_if(f"while_label_2.{self.while_count}")
+        self.vm.write_arithmetic("NOT")
+        self.vm.write_if(f"while_label_2.{while_count}")
         # writes ')'
         self.advance()
         # writes '{'
         self.advance()
         self.compile_statements()
-        self.vm.write_goto(f"while_label.{self.while_count}")
+        self.vm.write_goto(f"while_label.{while_count}")
         # writes "}"
         self.advance()
-        self.vm.write_label(f"while_label_2.{self.while_count}")
+        self.vm.write_label(f"while_label_2.{while_count}")
 
     def compile_return(self) -> None:
         """Compiles a return statement."""
         self.jt.advance()
         if self.jt.get_cur_token() != ";":
             self.compile_expression()
-            self.vm.write_return()
         else:
             self.vm.write_push("constant", 0)
-            self.vm.write_return()
-            self.vm.write_pop("temp", 0)
+        self.vm.write_return()
         # The ';' symbol
         self.advance()
 
     def compile_if(self) -> None:
         """Compiles a if statement, possibly with a trailing else clause."""
         self.if_counter += 1
+        # nested statements bump the counter, so keep our own copy
+        if_counter = self.if_counter
         #  the 'if' itself
         self.advance()
         #  '('
         self.advance()
         self.compile_expression()
-        self.vm.write_arithmetic("NEG")
-        self.vm.write_if(f"label.{self.if_counter}")
+        self.vm.write_arithmetic("NOT")
+        self.vm.write_if(f"label.{if_counter}")
         #  ')'
         self.advance()
         #  '{'
@@ -343,30 +546,319 @@ class CompilationEngine:
         self.compile_statements()
         #  "}"
         self.advance()
-        self.vm.write_goto(f"label_2.{self.if_counter}")
-        self.vm.write_label(f"label.{self.if_counter}")
+        self.vm.write_goto(f"label_2.{if_counter}")
+        self.vm.write_label(f"label.{if_counter}")
         if self.jt.get_cur_token() == "else":
             self.compile_else()
 
-        self.vm.write_label(f"label_2.{self.if_counter}")
+        self.vm.write_label(f"label_2.{if_counter}")
 
     def compile_expression(self) -> None:
         """Compiles an expression."""
-        self.compile_term()
+        constant = self.compile_folded_expression()
+        if constant is not None:
+            self.write_constant(constant)
+
+    def compile_folded_expression(self) -> typing.Optional[int]:
+        """Compiles an expression. When folding is on, an expression whose
+        value is known at compile time is not pushed, its value is returned
+        instead.
+        Jack operators have no precedence, so expressions are compiled left
+        to right, keeping an explicit stack of the expressions nested in
+        parentheses, array indexes and subroutine arguments rather than
+        recursing into them: nesting is only limited by memory. The code is
+        the same as that of compile_recursive_expression.
+
+        Returns:
+            int: the value of a constant expression, None if it was pushed.
+        """
+        jt = self.jt
+        vm = self.vm
+        advance = jt.advance
+        frame = PendingExpression(OUTER)
+        stack = [frame]
+        while True:
+            # reads unary operations and opening brackets until a term
+            type_term = jt.token_type()
+            cur_token = jt.get_cur_token()
+            value = None
+            if type_term == SYMBOL and cur_token in UNARY_OP:
+                frame.unary.append(cur_token)
+                advance()
+                continue
+            if cur_token == "(":
+                advance()
+                frame = PendingExpression(PARENTHESES)
+                stack.append(frame)
+                continue
+            if type_term == IDENTIFIER:
+                advance()
+                next_token = jt.get_cur_token()
+                if next_token == "[":
+                    advance()
+                    frame = PendingExpression(INDEX, self.resolve(cur_token))
+                    stack.append(frame)
+                    continue
+                if next_token == "(" or next_token == ".":
+                    name, n_args = self.begin_subroutine_call(cur_token)
+                    if jt.get_cur_token() != ")":
+                        frame = PendingExpression(ARGUMENTS, name, n_args)
+                        stack.append(frame)
+                        continue
+                    vm.write_call(name, n_args)
+                    advance()
+                else:
+                    # a plain variable, the look-ahead token is not ours
+                    symbol = self.resolve(cur_token)
+                    vm.write(PUSH, symbol.segment, symbol.index)
+            else:
+                if type_term == STRING and self.pool_strings:
+                    self.write_pooled_string(jt.string_val())
+                elif type_term == STRING:
+                    self.write_string(jt.string_val())
+                elif type_term == INT_CONST:
+                    value = jt.int_val()
+                elif type_term == KEYWORD and cur_token in KEYWORD_CONSTANTS:
+                    if cur_token == "true":
+                        value = TRUE
+                    elif cur_token == "this":
+                        vm.write_push("pointer", 0)
+                    else:
+                        value = 0
+                else:
+                    raise self.unexpected()
+                advance()
+                if value is not None and not self.fold:
+                    self.write_constant(value)
+                    value = None
+
+            # the term is complete: applies it to its expression, and closes
+            # every expression that ends right after it
+            while True:
+                if frame.unary:
+                    value = self.write_unary(frame.unary, value)
+                if frame.operation is None:
+                    frame.constant = value
+                else:
+                    frame.constant = self.write_binary(
+                        frame.operation, frame.constant, value, frame.start)
+                cur_token = jt.get_cur_token()
+                if cur_token not in EXPRESSION_END:
+                    if cur_token not in BINARY_OP:
+                        raise self.unexpected()
+                    frame.operation = cur_token
+                    advance()
+                    frame.start = vm.position()
+                    break
+                stack.pop()
+                value = frame.constant
+                if frame.closer == OUTER:
+                    return value
+                if frame.closer == ARGUMENTS:
+                    if value is not None:
+                        self.write_constant(value)
+                    frame.n_args += 1
+                    if cur_token == ",":
+                        advance()
+                        frame.constant = frame.operation = None
+                        stack.append(frame)
+                        break
+                    vm.write_call(frame.target, frame.n_args)
+                    value = None
+                elif frame.closer == INDEX:
+                    offset = self.write_array_base(frame.target, value)
+                    vm.write_pop("pointer", 1)
+                    vm.write_push("that", offset)
+                    value = None
+                # the closing bracket
+                advance()
+                frame = stack[-1]
+
+    def write_unary(self, operations: typing.List[str],
+                    value: typing.Optional[int]) -> typing.Optional[int]:
+        """Writes the unary operations of a term once the code of the term was
+        written, innermost first, emptying the list.
+
+        Args:
+            operations (list): the unary operation symbols, outermost first.
+            value (int): the value of the term if constant, None if pushed.
+
+        Returns:
+            int: the value of the operations when the term is constant and
+            they were folded, None if the result was pushed.
+        """
+        while operations:
+            operation = operations.pop()
+            if value is not None:
+                folded = fold_unary(operation, value)
+                if folded is not None:
+                    value = folded
+                    continue
+                self.write_constant(value)
+                value = None
+            self.vm.write_arithmetic(un_operation_dict[operation])
+        return value
+
+    def compile_recursive_expression(self) -> typing.Optional[int]:
+        """Compiles an expression like compile_folded_expression, recursing
+        through compile_term for every nested term. Kept as the reference
+        for the iterative compiler, see Benchmark.py.
+
+        Returns:
+            int: the value of a constant expression, None if it was pushed.
+        """
+        constant = self.compile_term()
         while self.jt.get_cur_token() != ")" and \
                 self.jt.get_cur_token() != "]" and \
                 self.jt.get_cur_token() != "," and \
                 self.jt.get_cur_token() != ";":
             # OP symbol
-            if self.jt.get_cur_token() in self.math_operation_dict.keys():
-                self.vm.write_call(self.math_operation_dict[self.jt.get_cur_token()], 2)
-            else:
-                self.vm.write_arithmetic(operation_dict[self.jt.get_cur_token()])
+            operation = self.jt.get_cur_token()
+            if operation not in BINARY_OP:
+                raise self.unexpected()
             self.advance()
-            # make sure a push is happening
-            self.compile_term()
+            start = self.vm.position()
+            # both operands are pushed before the operation is applied
+            right = self.compile_term()
+            constant = self.write_binary(operation, constant, right, start)
+        return constant
+
+    def write_binary(self, operation: str, left: typing.Optional[int],
+                     right: typing.Optional[int],
+                     start: int) -> typing.Optional[int]:
+        """Writes a binary operation once the code of its right operand was
+        written.
+
+        Args:
+            operation (str): the operation symbol.
+            left (int): the value of a constant left operand, None if it was
+            pushed.
+            right (int): the value of a constant right operand, None if it was
+            pushed.
+            start (int): the position of the code of the right operand.
+
+        Returns:
+            int: the value of the operation when both operands are constant
+            and it was folded, None if its result was pushed.
+        """
+        if left is not None and right is not None:
+            folded = fold_binary(operation, left, right)
+            if folded is not None:
+                return folded
+            self.write_constant(left)
+            self.write_constant(right)
+            self.write_operation(operation)
+        elif right is not None:
+            if not self.write_reduced_operation(operation, right, False):
+                self.write_constant(right)
+                self.write_operation(operation)
+        elif left is not None:
+            if not self.write_reduced_operation(operation, left, True):
+                # the left operand goes before the code of the right one
+                end = self.vm.position()
+                self.write_constant(left)
+                self.vm.move_to_end(start, end)
+                self.write_operation(operation)
+        else:
+            self.write_operation(operation)
+        return None
 
-    def compile_term(self) -> None:
+    def write_operation(self, operation: str) -> None:
+        """Writes a binary operation on the two topmost stack values.
+
+        Args:
+            operation (str): the operation symbol.
+        """
+        if operation in self.math_operation_dict.keys():
+            self.vm.write_call(self.math_operation_dict[operation], 2)
+        else:
+            self.vm.write_arithmetic(operation_dict[operation])
+
+    def write_reduced_operation(self, operation: str, value: int,
+                                constant_left: bool) -> bool:
+        """Writes a cheaper equivalent of an operation between the value on
+        top of the stack and a constant, if there is one: x + 0, x * 1 and
+        x / 1 are x, x * 0 is 0 and x * 2^k is k doublings of x.
+        x / 2^k is deliberately left to Math.divide, which truncates towards
+        zero: shifting right rounds negative numbers down when the shift is
+        arithmetic, and the sign handling of shiftright is up to the target,
+        so no shift sequence is right for negative x on every target.
+
+        Args:
+            operation (str): the operation symbol.
+            value (int): the constant operand.
+            constant_left (bool): whether the constant is the left operand.
+
+        Returns:
+            bool: True if the operation was written, False if it wasn't.
+        """
+        if value == 0 and (operation in ("+", "|") or
+                           operation == "-" and not constant_left):
+            return True
+        if value == 1 and (operation == "*" or
+                           operation == "/" and not constant_left):
+            return True
+        if operation != "*":
+            return False
+        if value == 0:
+            # the other operand is still computed, for its side effects
+            self.vm.write_push("constant", 0)
+            self.vm.write_arithmetic("AND")
+            return True
+        shift = power_of_two(value)
+        if shift is None or not self.shift_ops and shift > MAX_DOUBLINGS:
+            return False
+        for _ in range(shift):
+            if self.shift_ops:
+                self.vm.write_arithmetic(un_operation_dict["^"])
+            else:
+                self.vm.write_pop("temp", 0)
+                self.vm.write_push("temp", 0)
+                self.vm.write_push("temp", 0)
+                self.vm.write_arithmetic("ADD")
+        return True
+
+    def write_constant(self, value: int) -> None:
+        """Pushes a constant, which may be negative.
+
+        Args:
+            value (int): the value to push, wrapped to 16 bits.
+        """
+        value = to_signed(value)
+        if value >= 0:
+            self.vm.write_push("constant", value)
+        elif value == -MAX_CONSTANT - 1:
+            self.vm.write_push("constant", MAX_CONSTANT)
+            self.vm.write_arithmetic("NOT")
+        else:
+            self.vm.write_push("constant", -value)
+            self.vm.write_arithmetic("NEG")
+
+    def write_array_base(self, symbol: Symbol,
+                         index: typing.Optional[int]) -> int:
+        """Pushes the address to load into pointer 1 to reach an entry of an
+        array, once the code of its index was written. A constant index that
+        isn't negative is not added to the base of the array: it becomes the
+        offset of the entry in the that segment, so index 0 costs nothing.
+
+        Args:
+            symbol (Symbol): the array.
+            index (int): the value of a constant index, None if it was pushed.
+
+        Returns:
+            int: the offset of the entry from the pushed address.
+        """
+        if index is not None:
+            index = to_signed(index)
+            if index >= 0:
+                self.vm.write(PUSH, symbol.segment, symbol.index)
+                return index
+            self.write_constant(index)
+        self.vm.write(PUSH, symbol.segment, symbol.index)
+        self.vm.write_arithmetic(operation_dict["+"])
+        return 0
+
+    def compile_term(self) -> typing.Optional[int]:
         """Compiles a term. 
         This routine is faced with a slight difficulty when
         trying to decide between some of the alternative parsing rules.
@@ -375,101 +867,153 @@ class CompilationEngine:
         A single look-ahead token, which may be one of "[", "(", or "." suffices
         to distinguish between the three possibilities. Any other token is not
         part of this term and should not be advanced over.
+
+        Returns:
+            int: the value of a constant term when folding is on, in which
+            case nothing is pushed. None if the term was pushed.
         """
         # Write the first part of the term
-        # TODO: in case of info loss. may need to add advance calls
         type_term = self.jt.token_type()
         cur_token = self.jt.get_cur_token()
-        if self.jt.get_cur_token() in UNARY_OP:
+        constant = None
+        if type_term == SYMBOL and cur_token in UNARY_OP:
             # Write Unary-OP (symbol)
-            unary_op = self.jt.get_cur_token()
             self.advance()
-            self.compile_term()
-            self.vm.write_arithmetic(un_operation_dict[unary_op])
+            constant = self.compile_term()
+            if constant is not None:
+                folded = fold_unary(cur_token, constant)
+                if folded is not None:
+                    return folded
+                self.write_constant(constant)
+            self.vm.write_arithmetic(un_operation_dict[cur_token])
+            # the inner term already advanced past itself
+            return None
 
-        elif self.jt.get_cur_token() == "(":
+        elif cur_token == "(":
             # Write "(" Symbol
             self.advance()
-            self.compile_expression()
+            constant = self.compile_recursive_expression()
             # Write ")" Symbol
 
         else:
             # Write stringConstant\intConstant\keywordConstant\varName\
-            if self.jt.token_type() == JT.STRING:
-                cur_string = self.jt.get_cur_token()[1:-1]
-                self.vm.write_push("constant", len(cur_string))
-                self.vm.write_call("String.new", 1)
-                for i in range(len(cur_string)):
-                    self.vm.write_push("constant", ord(cur_string[i]))
-                    self.vm.write_call("String.appendChar", 2)
-                    # ToDo: daniel will check the code block in his free time
+            if type_term == STRING and self.pool_strings:
+                self.write_pooled_string(self.jt.string_val())
+            elif type_term == STRING:
+                self.write_string(self.jt.string_val())
             elif type_term == INT_CONST:
-                self.vm.write_push("constant", self.jt.get_cur_token())
+                constant = self.jt.int_val()
 
-            elif type_term == KEYWORD:
+            elif type_term == KEYWORD and cur_token in KEYWORD_CONSTANTS:
                 if cur_token == "true":
-                    self.vm.write_push("constant", 1)
-                    self.vm.write_arithmetic("NEG")
+                    constant = TRUE
                 elif cur_token == "this":
                     self.vm.write_push("pointer", 0)
                 else:
-                    self.vm.write_push("constant", 0)
+                    constant = 0
 
             elif type_term == IDENTIFIER:
-                self.advance()  # TODO: might need to go back one token
-                if cur_token != "(" or cur_token != "." or \
-                        cur_token != "[":
-                    self.vm.write_push(self.st.kind_of(cur_token),
-                                       self.st.index_of(cur_token))
-                    return
-
-                elif self.jt.get_cur_token() == "[":
+                self.advance()
+                if self.jt.get_cur_token() == "[":
                     # Write "[" Symbol
                     self.advance()
-                    self.compile_expression()
-                    self.vm.write_push(self.st.kind_of(cur_token), self.st.index_of(cur_token))
+                    symbol = self.resolve(cur_token)
+                    offset = self.write_array_base(
+                        symbol, self.compile_folded_expression())
                     self.vm.write_pop("pointer", 1)
-                    self.vm.write_push("that", 0)
+                    self.vm.write_push("that", offset)
                     # Write "]" Symbol
 
-                elif self.jt.get_cur_token() == "(":
-                    # Write "(" Symbol
-                    self.advance()
-                    n_args = self.compile_expression_list()
-                    self.vm.write_call(cur_token, n_args)
+                elif self.jt.get_cur_token() in ("(", "."):
+                    self.compile_subroutine_call(cur_token)
                     # Write ")" Symbol
 
-                elif self.jt.get_cur_token() == ".":
-                    # Write "." Symbol
-                    def create_call(cur_token):
-                        cur_token += "."
-                        self.advance()
-                        cur_token += self.jt.get_cur_token()
-                        # Write "SubroutineName" Identifier
-                        self.advance()
-                        return cur_token
-
-                    cur_token = create_call(cur_token)
-                    while self.jt.get_cur_token() == ".":
-                        cur_token = create_call(cur_token)
-                    # Write "(" Symbol
-                    self.advance()
-                    n_args = self.compile_expression_list()
-                    self.vm.write_call(cur_token, n_args)
-                    # Write ")" Symbol
+                else:
+                    # a plain variable, the look-ahead token is not ours
+                    symbol = self.resolve(cur_token)
+                    self.vm.write(PUSH, symbol.segment, symbol.index)
+                    return None
+
+            else:
+                raise self.unexpected()
 
         self.advance()
+        if constant is not None and not self.fold:
+            self.write_constant(constant)
+            return None
+        return constant
 
-    def compile_expression_list(self):
-        """Compiles a (possibly empty) comma-separated list of expressions."""
+    def write_string(self, cur_string: str) -> None:
+        """Pushes a new string built from a literal.
+
+        Args:
+            cur_string (str): the literal, without the double quotes.
+        """
+        self.vm.write_push("constant", len(cur_string))
+        self.vm.write_call("String.new", 1)
+        for i in range(len(cur_string)):
+            self.vm.write_push("constant", ord(cur_string[i]))
+            self.vm.write_call("String.appendChar", 2)
+
+    def write_pooled_string(self, cur_string: str) -> None:
+        """Pushes the pooled string of a literal. Each distinct literal of the
+        class is kept in a static slot after the declared statics, which is
+        filled by the literal's builder function the first time it is
+        evaluated. Statics start out as 0, i.e. not built yet.
+
+        Args:
+            cur_string (str): the literal, without the double quotes.
+        """
+        if cur_string not in self.string_pool:
+            self.string_pool[cur_string] = len(self.string_pool)
+        pool_index = self.string_pool[cur_string]
+        slot = self.st.var_count(STATIC) + pool_index
+        ready_label = f"string_ready.{self.string_uses}"
+        self.string_uses += 1
+        # once built, evaluating the literal calls neither String.new nor
+        # String.appendChar
+        self.string_calls_saved += len(cur_string) + 1
+
+        self.vm.write_push("static", slot)
+        self.vm.write_if(ready_label)
+        self.vm.write_call(self.string_builder_name(pool_index), 0)
+        self.vm.write_pop("static", slot)
+        self.vm.write_label(ready_label)
+        self.vm.write_push("static", slot)
+
+    def string_builder_name(self, pool_index: int) -> str:
+        """
+        Args:
+            pool_index (int): the index of a literal in the string pool.
+
+        Returns:
+            str: the name of the function building the literal. "$" can't
+            appear in Jack identifiers, so it never clashes with user code.
+        """
+        return f"{self.class_name}.string${pool_index}"
+
+    def write_string_builders(self) -> None:
+        """Writes a function building each pooled literal of the class."""
+        for cur_string, pool_index in self.string_pool.items():
+            self.vm.write_function(self.string_builder_name(pool_index), 0)
+            self.write_string(cur_string)
+            self.vm.write_return()
+
+    def compile_expression_list(self) -> int:
+        """Compiles a (possibly empty) comma-separated list of expressions.
+
+        Returns:
+            int: the number of expressions in the list.
+        """
         param_count = 0
         if self.jt.get_cur_token() != ')':
             self.compile_expression()
+            param_count += 1
             while self.jt.get_cur_token() == ',':
                 # Write ','
                 self.advance()
                 self.compile_expression()
-        # self.jt.advance()
+                param_count += 1
         return param_count
 
     def compile_else(self):
@@ -0,0 +1,137 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import typing
+from VMCode import VMCode, LABEL, GOTO, IF_GOTO, CALL, FUNCTION
+
+# OS calls which cost far more than a VM command, shown in their own columns
+EXPENSIVE_CALLS = ("Math.multiply", "Math.divide", "String.appendChar")
+# The words a call pushes before the locals of the callee: the return
+# address and the LCL, ARG, THIS and THAT of the caller
+FRAME_SIZE = 5
+
+
+def subroutine_costs(code: VMCode) -> typing.Dict[str, typing.Dict]:
+    """Estimates the cost of every subroutine of a class from its code.
+    Loops are found as backward jumps, which is how while statements are
+    compiled, so the estimate holds for optimized and inlined code too.
+
+    Args:
+        code (VMCode): the code of a class.
+
+    Returns:
+        dict: by subroutine name, its number of VM commands, function
+        command excluded, the number of those in a loop, its deepest loop
+        nesting, its number of calls by target, and the words of its frame:
+        those pushed by the call and its locals.
+    """
+    costs = {}
+    names = code.names
+    starts = [position for position, opcode in enumerate(code.opcodes)
+              if opcode == FUNCTION] + [len(code)]
+    for start, end in zip(starts, starts[1:]):
+        labels = {}
+        # the nesting depth change at every position, +1 where a loop
+        # starts and -1 after it ends
+        changes = [0] * (end - start + 1)
+        calls = {}
+        for position in range(start + 1, end):
+            opcode, arg = code.opcodes[position], code.args[position]
+            if opcode == LABEL:
+                labels[arg] = position
+            elif opcode == GOTO or opcode == IF_GOTO:
+                target = labels.get(arg)
+                if target is not None:
+                    changes[target - start] += 1
+                    changes[position - start + 1] -= 1
+            elif opcode == CALL:
+                calls[names[arg]] = calls.get(names[arg], 0) + 1
+        depth = loop_depth = loop_commands = 0
+        for position in range(start + 1, end):
+            depth += changes[position - start]
+            loop_depth = max(loop_depth, depth)
+            if depth:
+                loop_commands += 1
+        n_locals = code.indexes[start]
+        costs[names[code.args[start]]] = {
+            "commands": end - start - 1,
+            "loop_commands": loop_commands,
+            "loop_depth": loop_depth,
+            "calls": dict(sorted(calls.items(), key=lambda item: -item[1])),
+            "locals": n_locals,
+            "frame_words": FRAME_SIZE + n_locals}
+    return costs
+
+
+def cost_report(codes: typing.Dict[str, VMCode]) \
+        -> typing.Dict[str, typing.Dict]:
+    """
+    Args:
+        codes (dict): the code of every class, by path of its .jack file.
+
+    Returns:
+        dict: the costs of every subroutine, as given by subroutine_costs,
+        with the basename of its file in "file", by subroutine name.
+    """
+    report = {}
+    for path, code in codes.items():
+        for name, costs in subroutine_costs(code).items():
+            report[name] = dict(costs, file=os.path.basename(path))
+    return report
+
+
+def format_table(report: typing.Dict[str, typing.Dict]) -> str:
+    """
+    Args:
+        report (dict): the costs of every subroutine, by name.
+
+    Returns:
+        str: a table of the costs, largest subroutine first, then by
+        deepest loop, with a total row.
+    """
+    header = ["subroutine", "commands", "in loops", "loop depth", "calls"] + \
+        [name.split(".")[1] for name in EXPENSIVE_CALLS] + ["frame"]
+    totals = {"commands": 0, "loop_commands": 0, "loop_depth": 0,
+              "calls": {}, "frame_words": 0}
+    rows = []
+    for name, costs in sorted(report.items(),
+                              key=lambda item: (-item[1]["commands"],
+                                                -item[1]["loop_depth"],
+                                                item[0])):
+        totals["commands"] += costs["commands"]
+        totals["loop_commands"] += costs["loop_commands"]
+        totals["loop_depth"] = max(totals["loop_depth"], costs["loop_depth"])
+        totals["frame_words"] += costs["frame_words"]
+        for target, count in costs["calls"].items():
+            totals["calls"][target] = totals["calls"].get(target, 0) + count
+        rows.append(cost_row(name, costs))
+    rows.append(cost_row("total", totals))
+    widths = [max(len(row[column]) for row in rows + [header])
+              for column in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))))
+    return "\n".join(lines)
+
+
+def cost_row(name: str, costs: typing.Dict[str, typing.Any]) \
+        -> typing.List[str]:
+    """
+    Args:
+        name (str): the name of the row.
+        costs (dict): the costs of the row.
+
+    Returns:
+        list: the cells of the row.
+    """
+    calls = costs["calls"]
+    return [name, str(costs["commands"]), str(costs["loop_commands"]),
+            str(costs["loop_depth"]), str(sum(calls.values()))] + \
+        [str(calls.get(target, 0)) for target in EXPENSIVE_CALLS] + \
+        [str(costs["frame_words"])]
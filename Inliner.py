@@ -0,0 +1,265 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from CallGraph import CallGraph
+from VMCode import VMCode, RETURN, PUSH, POP, LABEL, GOTO, IF_GOTO, CALL, \
+    FUNCTION, CONSTANT, ARGUMENT, LOCAL, STATIC, THIS, THAT, POINTER, TEMP
+
+# Instructions of a function body, with the names of labels, functions and
+# calls as strings rather than ids, so they can move between classes.
+Instruction = typing.Tuple[int, typing.Any, int]
+
+# Arguments and locals of inlined code live in temp 1 to temp 7. temp 0 is
+# scratch space of the code around it, and nothing else uses the others.
+FIRST_TEMP, TEMPS = 1, 7
+DEFAULT_SIZE = 8
+
+
+def class_of(name: str) -> str:
+    return name.split(".", 1)[0]
+
+
+class Inliner:
+    """Replaces calls to small functions of a whole program by their body.
+
+    A function is inlined when its body, after what was inlined into it, has
+    at most max_size commands, is straight-line code ending in its only
+    return, and is not part of a recursive cycle. Its arguments are popped
+    into temps at the call site and its locals are zeroed temps; a method,
+    which sets pointer 0 to its object, uses pointer 1 and that instead, so
+    the object of the caller is kept. None of those are saved by a real call,
+    so functions calling others are only inlined without any argument, local
+    or object. The caller never has a value in temp 1 to 7 or in pointer 1
+    while it calls.
+    """
+
+    def __init__(self, codes: typing.Dict[str, VMCode],
+                 max_size: int = DEFAULT_SIZE) -> None:
+        """Creates an inliner.
+
+        Args:
+            codes (dict): the code of every class of the program, by path.
+            max_size (int): the maximal number of commands in an inlined
+            function, excluding its function and return commands.
+        """
+        self.codes = codes
+        self.max_size = max_size
+        self.graph = CallGraph(codes)
+        # function name -> its instructions, function command excluded
+        self.bodies = {}
+        for name, (path, start, end) in self.graph.functions.items():
+            code = codes[path]
+            self.bodies[name] = [
+                (opcode, code.names[arg] if opcode >= LABEL else arg, index)
+                for opcode, arg, index in zip(code.opcodes[start + 1:end],
+                                              code.args[start + 1:end],
+                                              code.indexes[start + 1:end])]
+        self.locals = {name: codes[path].indexes[start] for name, (
+            path, start, _) in self.graph.functions.items()}
+        # inlined function -> number of call sites it replaced
+        self.inlined = {}
+        # function that was not inlined -> the reason why
+        self.rejected = {}
+
+    def rejection(self, name: str) -> typing.Optional[str]:
+        """
+        Args:
+            name (str): a function with its final body.
+
+        Returns:
+            str: why the function can't be inlined, None if it can.
+        """
+        body = self.bodies[name]
+        if len(body) - 1 > self.max_size:
+            return "too large"
+        if not body or body[-1][0] != RETURN or any(
+                opcode == RETURN for opcode, _, _ in body[:-1]):
+            return "more than one return"
+        if any(LABEL <= opcode <= IF_GOTO for opcode, _, _ in body):
+            return "has branches"
+        if self.arity(name) + self.locals[name] and any(
+                (opcode == PUSH or opcode == POP) and segment == TEMP and
+                index >= FIRST_TEMP for opcode, segment, index in body):
+            return "uses temps"
+        calls = any(opcode == CALL for opcode, _, _ in body)
+        if calls and (self.locals[name] or any(
+                (opcode == PUSH or opcode == POP) and segment == ARGUMENT
+                for opcode, segment, _ in body)):
+            return "calls with arguments or locals"
+        if (POP, POINTER, 0) in body:
+            if calls:
+                return "calls with an object"
+            first = next(instruction for instruction in body
+                         if instruction[0] <= POP and instruction[1] in
+                         (THIS, THAT, POINTER) and instruction[0] >= PUSH)
+            if first != (POP, POINTER, 0) or any(
+                    (opcode == PUSH or opcode == POP) and
+                    (segment == THAT or (segment, index) == (POINTER, 1))
+                    for opcode, segment, index in body):
+                return "uses this and that"
+        return None
+
+    def arity(self, name: str) -> int:
+        """
+        Args:
+            name (str): a function.
+
+        Returns:
+            int: the number of arguments of the function it reads.
+        """
+        return max((index + 1 for opcode, segment, index in self.bodies[name]
+                    if (opcode == PUSH or opcode == POP) and
+                    segment == ARGUMENT), default=0)
+
+    def candidates(self) -> typing.List[str]:
+        """
+        Returns:
+            list: the functions small enough to be inlined, callees before
+            their callers, without those calling themselves, directly or not.
+        """
+        small = [name for name, body in self.bodies.items()
+                 if len(body) - 1 <= self.max_size]
+        candidates = []
+        for name in small:
+            callees = [callee for callee in self.graph.calls[name]
+                       if callee in self.bodies]
+            if callees and name in self.graph.reachable(callees):
+                self.rejected[name] = "recursive"
+            else:
+                candidates.append(name)
+        # depth-first post-order over the calls between candidates
+        candidate_set = set(candidates)
+        order = []
+        done = set()
+        for root in candidates:
+            if root in done:
+                continue
+            stack = [(root, iter(self.graph.calls[root]))]
+            done.add(root)
+            while stack:
+                name, callees = stack[-1]
+                for callee in callees:
+                    if callee in candidate_set and callee not in done:
+                        done.add(callee)
+                        stack.append((callee, iter(self.graph.calls[callee])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(name)
+        return order
+
+    def expand(self, caller: str, inlinable: typing.Set[str]) \
+            -> typing.List[Instruction]:
+        """
+        Args:
+            caller (str): a function.
+            inlinable (set): the functions whose calls are replaced.
+
+        Returns:
+            list: the body of the caller, with its calls to inlinable
+            functions replaced by their bodies.
+        """
+        body = []
+        for instruction in self.bodies[caller]:
+            opcode, callee, n_args = instruction
+            if opcode != CALL or callee not in inlinable or \
+                    not self.fits(callee, caller, n_args):
+                body.append(instruction)
+                continue
+            body.extend(self.inline(callee, n_args))
+            self.inlined[callee] = self.inlined.get(callee, 0) + 1
+        return body
+
+    def fits(self, callee: str, caller: str, n_args: int) -> bool:
+        """
+        Args:
+            callee (str): an inlinable function.
+            caller (str): a function calling it.
+            n_args (int): the number of arguments pushed by the call site.
+
+        Returns:
+            bool: True if the callee can be inlined at the call site: there
+            are enough temps for its variables, and it only uses static
+            variables when they are those of the caller's class.
+        """
+        if n_args + self.locals[callee] > TEMPS or \
+                self.arity(callee) > n_args:
+            return False
+        return class_of(callee) == class_of(caller) or not any(
+            (opcode == PUSH or opcode == POP) and segment == STATIC
+            for opcode, segment, _ in self.bodies[callee])
+
+    def inline(self, name: str, n_args: int) -> typing.List[Instruction]:
+        """
+        Args:
+            name (str): an inlinable function.
+            n_args (int): the number of arguments pushed by the call site.
+
+        Returns:
+            list: the instructions replacing the call.
+        """
+        body = self.bodies[name][:-1]
+        n_locals = self.locals[name]
+        spill = [(POP, TEMP, FIRST_TEMP + argument)
+                 for argument in reversed(range(n_args))]
+        spill.extend(instruction for local in range(n_locals) for instruction
+                     in ((PUSH, CONSTANT, 0),
+                         (POP, TEMP, FIRST_TEMP + n_args + local)))
+        moved = (POP, POINTER, 0) in body
+        segments = {ARGUMENT: (TEMP, FIRST_TEMP),
+                    LOCAL: (TEMP, FIRST_TEMP + n_args)}
+        if moved:
+            segments[THIS] = (THAT, 0)
+        inlined = []
+        for opcode, segment, index in body:
+            if opcode == PUSH or opcode == POP:
+                if moved and segment == POINTER:
+                    index = 1
+                elif segment in segments:
+                    segment, offset = segments[segment]
+                    index += offset
+            inlined.append((opcode, segment, index))
+        # the object of a method is on the top of the stack: pops it where
+        # the method puts it rather than through a temp
+        if n_args and not n_locals and inlined[:1] == [
+                (PUSH, TEMP, FIRST_TEMP)] and \
+                (PUSH, TEMP, FIRST_TEMP) not in inlined[1:] and \
+                (POP, TEMP, FIRST_TEMP) not in inlined[1:]:
+            del spill[-1]
+            del inlined[0]
+        return spill + inlined
+
+    def run(self) -> typing.Dict[str, VMCode]:
+        """Inlines the calls to every inlinable function.
+
+        Returns:
+            dict: the code of every class, by path. Inlined functions are
+            kept, and can be removed with CallGraph.prune once unreachable.
+        """
+        inlinable = set()
+        for name in self.candidates():
+            self.bodies[name] = self.expand(name, inlinable)
+            reason = self.rejection(name)
+            if reason is None:
+                inlinable.add(name)
+            else:
+                self.rejected[name] = reason
+        for name in self.bodies:
+            if name not in inlinable:
+                self.bodies[name] = self.expand(name, inlinable)
+        codes = {}
+        for path in self.codes:
+            code = VMCode()
+            for name, (function_path, _, _) in self.graph.functions.items():
+                if function_path != path:
+                    continue
+                code.append(FUNCTION, code.intern(name), self.locals[name])
+                for opcode, arg, index in self.bodies[name]:
+                    code.append(opcode, code.intern(arg)
+                                if opcode >= LABEL else arg, index)
+            codes[path] = code
+        return codes
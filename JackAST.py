@@ -0,0 +1,165 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from array import array
+
+# Node kinds. The value and extra columns of a node hold, by kind:
+#   CLASS          name
+#   STATIC_VAR, FIELD_VAR, ARGUMENT_VAR, LOCAL_VAR
+#                  name, type
+#   SUBROUTINE     name, kind (0 constructor, 1 method, 2 function)
+#   LET            variable name, 1 if an array entry is assigned
+#   OPERATOR, UNARY
+#                  operation symbol
+#   INT            the value, -1 for true and 0 for false and null
+#   STRING         the literal, without the double quotes
+#   VARIABLE, ARRAY
+#                  variable name
+#   CALL           first name, subroutine name after the "." or NO_NAME
+# Names, types, symbols and literals are ids in the strings table.
+# Children, in order:
+#   CLASS          variable declarations and subroutines
+#   SUBROUTINE     ARGUMENT_VAR, LOCAL_VAR, then statements
+#   BLOCK          statements
+#   LET            [index expression], value expression
+#   IF             condition expression, BLOCK, [else BLOCK]
+#   WHILE          condition expression, BLOCK
+#   DO             CALL
+#   RETURN         [expression]
+#   EXPRESSION     term, then OPERATOR and term pairs
+#   UNARY          term
+#   ARRAY          index expression
+#   CALL           argument expressions
+# A term is an INT, STRING, THIS, VARIABLE, ARRAY, CALL, UNARY, or an
+# EXPRESSION in parentheses. An expression of a single term is that term
+# alone, as are parentheses around a single term, which compile the same.
+CLASS, STATIC_VAR, FIELD_VAR, ARGUMENT_VAR, LOCAL_VAR, SUBROUTINE, BLOCK, \
+    LET, IF, WHILE, DO, RETURN, EXPRESSION, OPERATOR, INT, STRING, THIS, \
+    VARIABLE, ARRAY, CALL, UNARY = range(21)
+KIND_NAMES = ("class", "static", "field", "argument", "local", "subroutine",
+              "block", "let", "if", "while", "do", "return", "expression",
+              "operator", "int", "string", "this", "variable", "array",
+              "call", "unary")
+
+NO_NODE = -1
+NO_NAME = -1
+
+
+class JackAST:
+    """An abstract syntax tree of a Jack class, kept in an arena: a node is
+    an index into typed columns holding its kind, value, extra value, source
+    line and links to its first child and next sibling.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty tree."""
+        self.kinds = array("B")
+        self.values = array("i")
+        self.extras = array("i")
+        self.lines = array("I")
+        self.first_children = array("i")
+        self.next_siblings = array("i")
+        self.strings = []
+        self.string_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def intern(self, text: str) -> int:
+        """
+        Args:
+            text (str): a name, type, symbol or literal.
+
+        Returns:
+            int: the id of the text in the strings table.
+        """
+        string_id = self.string_ids.get(text)
+        if string_id is None:
+            string_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def add(self, kind: int, value: int = 0, extra: int = 0,
+            line: int = 0) -> int:
+        """Adds a node without a parent.
+
+        Args:
+            kind (int): the kind of the node.
+            value (int): the value of the node.
+            extra (int): the extra value of the node.
+            line (int): the source line the node starts in.
+
+        Returns:
+            int: the new node.
+        """
+        self.kinds.append(kind)
+        self.values.append(value)
+        self.extras.append(extra)
+        self.lines.append(line)
+        self.first_children.append(NO_NODE)
+        self.next_siblings.append(NO_NODE)
+        return len(self.kinds) - 1
+
+    def set_children(self, parent: int, children: typing.List[int]) -> None:
+        """Makes nodes the children of another, replacing its children.
+
+        Args:
+            parent (int): the parent node.
+            children (list): nodes without a parent, in order.
+        """
+        next_siblings = self.next_siblings
+        previous = NO_NODE
+        for child in reversed(children):
+            next_siblings[child] = previous
+            previous = child
+        self.first_children[parent] = previous
+
+    def children(self, node: int) -> typing.Iterator[int]:
+        """
+        Args:
+            node (int): a node.
+
+        Yields:
+            int: the children of the node, in order.
+        """
+        child = self.first_children[node]
+        while child != NO_NODE:
+            yield child
+            child = self.next_siblings[child]
+
+    def walk(self, node: int = 0) -> typing.Iterator[int]:
+        """
+        Args:
+            node (int): the root of the walked subtree, the class by default.
+
+        Yields:
+            int: the nodes of the subtree in pre-order, without recursion.
+        """
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(list(self.children(node))))
+
+    def text(self, node: int) -> str:
+        """
+        Args:
+            node (int): a node whose value is a string id.
+
+        Returns:
+            str: the string value of the node.
+        """
+        return self.strings[self.values[node]]
+
+    def nbytes(self) -> int:
+        """
+        Returns:
+            int: the size of the columns, strings table excluded.
+        """
+        return sum(column.itemsize * len(column) for column in (
+            self.kinds, self.values, self.extras, self.lines,
+            self.first_children, self.next_siblings))
@@ -4,25 +4,432 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+from __future__ import annotations
+import argparse
+import functools
+import io
 import os
 import sys
-import typing
+import time
+from BuildCache import BuildCache, compiler_fingerprint
 from CompilationEngine import CompilationEngine
-from JackTokenizer import JackTokenizer
+from OutputManager import OutputManager, temp_path
+from JackTokenizer import JackTokenizer, StreamingTokenizer, \
+    MappedTokenizer
 from SymbolTable import SymbolTable
+from VMCode import VMCode
 from VMWriter import VMWriter
 
+# Startup time matters for single file builds: typing is only needed by type
+# checkers, and the process pool only by builds of several files, which pay
+# for its import when they start one.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+
+
+VM_EXTENSION, BINARY_VM_EXTENSION = ".vm", ".vmb"
+# The options of compile_path which are options of the CompilationEngine
+ENGINE_OPTIONS = ("binary", "optimization_level", "shift_ops", "pool_strings")
+
+
+class HelpFormatter(argparse.HelpFormatter):
+    """Wraps help to the width of the terminal like argparse.HelpFormatter,
+    which imports shutil for it whenever an argument is added, even if no
+    help is shown.
+    """
+
+    def __init__(self, prog: str) -> None:
+        try:
+            width = int(os.environ["COLUMNS"])
+        except (KeyError, ValueError):
+            try:
+                width = os.get_terminal_size(sys.__stdout__.fileno()).columns
+            except (AttributeError, ValueError, OSError):
+                width = 80
+        super().__init__(prog, width=width - 2)
+
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.IO,
+        stream: bool = False, mapped: bool = False, ast: bool = False,
+        **options) -> CompilationEngine:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.IO): writes all output to this file.
+        stream (bool): tokenize the file lazily in chunks instead of all at
+        once, keeping the memory of the tokenizer flat for huge files.
+        mapped (bool): memory-map the file and tokenize its bytes in place
+        instead, input_file being a file opened in binary mode.
+        ast (bool): parse the file into an AST first and generate code from
+        it in a second pass, with an ASTCompiler.
+        options: options of the CompilationEngine, e.g. binary or
+        optimization_level.
+
+    Returns:
+        CompilationEngine: the engine that compiled the file. Its tokenizer
+        is left open for the caller to close, unless compiling failed.
     """
-    # Your code goes here!
-    pass
+    if mapped:
+        tokenizer = MappedTokenizer(input_file)
+    elif stream:
+        tokenizer = StreamingTokenizer(input_file)
+    else:
+        tokenizer = JackTokenizer(input_file)
+    try:
+        if ast:
+            from ASTCompiler import ASTCompiler
+            engine = ASTCompiler(tokenizer, output_file, **options)
+        else:
+            engine = CompilationEngine(tokenizer, output_file, **options)
+        engine.compile_class()
+    except Exception:
+        tokenizer.close()
+        raise
+    return engine
+
+
+def compile_path(input_path: str, profile: bool = False,
+                 profile_dir: typing.Optional[str] = None,
+                 keep_code: bool = False,
+                 **options) -> typing.Dict[str, typing.Any]:
+    """Compiles a single .jack file into memory, the content of the .vm (or
+    .vmb) file next to it being returned for an OutputManager to write. When
+    streaming, the output is written to a temporary file for the
+    OutputManager instead, so memory stays flat. Runs in the worker
+    processes of compile_paths, so errors are returned rather than raised.
+
+    Args:
+        input_path (str): path of the .jack file to compile.
+        profile (bool): measure the phases of the compilation.
+        profile_dir (str): if given, a cProfile dump of the compilation is
+        written to this directory, named after the file.
+        keep_code (bool): return the binary code of the file in the report
+        instead of its output, for whole-program passes over every file.
+        options: options of compile_file, e.g. stream, binary or
+        optimization_level.
+
+    Returns:
+        dict: a report of the compilation. "error" describes the error that
+        stopped it, or is None if the file compiled successfully; "commands"
+        and "removed" count the VM commands generated and optimized away;
+        "strings", "string_uses" and "calls_saved" describe the string pool,
+        calls_saved being the String calls no longer made each time all the
+        pooled literals are evaluated once built; when profiling, "profile"
+        holds the measurements of Profiler.profile_file; "output" holds the
+        content of the output file, or when streaming, "output_file" holds
+        the path of the temporary file it was written to, or with keep_code,
+        "code" holds the code as written by VMCode.to_bytes.
+    """
+    measurements = None
+    output = code = written_path = None
+    if keep_code:
+        options["binary"] = True
+    elif options.get("stream"):
+        written_path = temp_path(os.path.splitext(input_path)[0] + (
+            BINARY_VM_EXTENSION if options.get("binary") else VM_EXTENSION))
+    try:
+        if written_path is not None:
+            output_file = open(written_path,
+                               'wb' if options.get("binary") else 'w')
+        else:
+            output_file = io.BytesIO() if options.get("binary") \
+                else io.StringIO()
+        with output_file, open(input_path, 'rb' if options.get("mapped")
+                               else 'r') as input_file:
+            if profile or profile_dir:
+                import Profiler
+                dump_path = os.path.join(
+                    profile_dir, os.path.basename(input_path) + ".prof") \
+                    if profile_dir else None
+                engine, measurements = Profiler.profile_file(
+                    input_file, output_file, dump_path, **options)
+            else:
+                engine = compile_file(input_file, output_file, **options)
+            engine.jt.close()
+            if keep_code:
+                code = output_file.getvalue()
+            elif written_path is None:
+                output = output_file.getvalue()
+    except Exception as error:
+        if written_path is not None and os.path.exists(written_path):
+            os.remove(written_path)
+        return {"error": f"{type(error).__name__}: {error}"}
+    return {"error": None,
+            "commands": engine.optimizer.commands_in,
+            "removed": engine.optimizer.removed,
+            "strings": len(engine.string_pool),
+            "string_uses": engine.string_uses,
+            "calls_saved": engine.string_calls_saved,
+            "profile": measurements,
+            "output": output,
+            "output_file": written_path,
+            "code": code}
+
+
+def compile_paths(input_paths: typing.List[str], jobs: int,
+                  split_classes: bool = False,
+                  **options) -> typing.Dict[str, typing.Dict]:
+    """Compiles every given file, using a pool of worker processes when more
+    than one job is allowed. Every file is independent, so each one gets its
+    own tokenizer, engine and writer.
+
+    Args:
+        input_paths (list): paths of the .jack files to compile.
+        jobs (int): the maximal number of files compiled at the same time.
+        split_classes (bool): also compile the subroutines of classes of at
+        least ClassSplitter.SPLIT_SIZE characters in parallel, in batches.
+        The code is the same as that of a serial compilation. Streamed
+        files are not split, which would read them whole.
+        options: options of compile_path, e.g. binary or
+        optimization_level.
+
+    Returns:
+        dict: the report of every file, as returned by compile_path, by path
+        and in the order of input_paths.
+    """
+    compile_one = functools.partial(compile_path, **options)
+    splits = {}
+    if split_classes and jobs > 1 and not options.get("profile") and \
+            not options.get("profile_dir") and not options.get("stream"):
+        splits = split_paths(input_paths, jobs)
+    if not splits and (jobs <= 1 or len(input_paths) <= 1):
+        return dict(zip(input_paths, map(compile_one, input_paths)))
+    from concurrent.futures import ProcessPoolExecutor
+    engine_options = {key: options[key] for key in ENGINE_OPTIONS
+                      if key in options}
+    if options.get("keep_code"):
+        engine_options["binary"] = True
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # the batches of the split classes, the largest ones, go first
+        batches = {input_path: split.submit(pool, **engine_options)
+                   for input_path, split in splits.items()}
+        files = {input_path: pool.submit(compile_one, input_path)
+                 for input_path in input_paths if input_path not in splits}
+        # reports are collected in submission order, keeping them stable
+        reports = {}
+        for input_path in input_paths:
+            if input_path in splits:
+                reports[input_path] = join_split(
+                    splits[input_path], batches[input_path],
+                    options.get("keep_code", False), **engine_options)
+            else:
+                reports[input_path] = files[input_path].result()
+        return reports
+
+
+def split_paths(input_paths: typing.List[str], jobs: int) \
+        -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        input_paths (list): paths of the .jack files to compile.
+        jobs (int): the number of worker processes.
+
+    Returns:
+        dict: the ClassSplit of every file large enough to be split, by
+        path.
+    """
+    from ClassSplitter import SPLIT_SIZE, BATCHES_PER_JOB, split_class
+    splits = {}
+    for input_path in input_paths:
+        try:
+            if os.path.getsize(input_path) < SPLIT_SIZE:
+                continue
+            with open(input_path, 'r') as input_file:
+                split = split_class(input_file.read(),
+                                    jobs * BATCHES_PER_JOB)
+        except (OSError, UnicodeDecodeError):
+            # compile_path reports it
+            continue
+        if split is not None:
+            splits[input_path] = split
+    return splits
+
+
+def join_split(split, futures: typing.List, keep_code: bool = False,
+               **options) -> typing.Dict[str, typing.Any]:
+    """
+    Args:
+        split (ClassSplit): a class whose batches were submitted.
+        futures (list): the futures of its batches.
+        keep_code (bool): return the code in "code" rather than "output",
+        as compile_path does.
+        options: options of the CompilationEngine.
+
+    Returns:
+        dict: the report of the class, as returned by compile_path.
+    """
+    try:
+        report = split.join(futures, **options)
+    except Exception as error:
+        return {"error": f"{type(error).__name__}: {error}"}
+    if keep_code:
+        report["code"], report["output"] = report["output"], None
+    else:
+        report["code"] = None
+    report.update(error=None, profile=None, output_file=None)
+    return report
+
+
+def read_outputs(input_paths: typing.List[str], cache: BuildCache,
+                 binary: bool = False) -> typing.Dict[str, VMCode]:
+    """
+    Args:
+        input_paths (list): paths of compiled .jack files.
+        cache (BuildCache): the build manifest of the files.
+        binary (bool): the outputs are binary .vmb files.
+
+    Returns:
+        dict: the code in the output of every file which has one, by path.
+    """
+    codes = {}
+    for input_path in input_paths:
+        try:
+            with open(cache.output_path(input_path),
+                      'rb' if binary else 'r') as output_file:
+                content = output_file.read()
+        except FileNotFoundError:
+            continue
+        codes[input_path] = VMCode.from_bytes(content) if binary \
+            else VMCode.from_text(content)
+    return codes
+
+
+def build(arguments: argparse.Namespace, files_to_assemble: typing.List[str],
+          cache: BuildCache,
+          changed: typing.Optional[typing.List[str]] = None,
+          removed: typing.Sequence[str] = ()) \
+        -> typing.Tuple[typing.List[str], typing.Dict[str, str]]:
+    """Compiles the files that are not up to date and reports on them, as
+    requested by the command line arguments.
+
+    Args:
+        arguments (argparse.Namespace): the parsed command line.
+        files_to_assemble (list): paths of every .jack file of the build.
+        cache (BuildCache): the build manifest of the files.
+        changed (list): if given, only these files may be out of date.
+        removed (list): .jack files removed since the last build, whose
+        outputs are removed with the writes of this one.
+
+    Returns:
+        tuple: the files compiled, and the error of every file which failed
+        to compile, by path.
+    """
+    whole_program = arguments.whole_program or arguments.inline is not None
+    outputs = OutputManager(arguments.fsync)
+    for input_path in removed:
+        cache.forget(input_path)
+        outputs.remove(cache.output_path(input_path))
+    files_to_compile = [input_path for input_path in
+                        (files_to_assemble if changed is None else changed)
+                        if not cache.is_fresh(input_path)]
+    if whole_program and files_to_compile:
+        # any change may make code of other files reachable or dead
+        files_to_compile = files_to_assemble
+    reports = compile_paths(
+        files_to_compile, arguments.jobs,
+        split_classes=arguments.split_classes, binary=arguments.binary,
+        optimization_level=arguments.optimization_level,
+        shift_ops=arguments.shift_ops,
+        pool_strings=arguments.pool_strings, stream=arguments.stream,
+        mapped=arguments.mapped,
+        ast=arguments.ast, keep_code=whole_program,
+        profile=arguments.profile,
+        profile_dir=arguments.profile_dir and
+        os.path.abspath(arguments.profile_dir))
+    errors = {input_path: report["error"]
+              for input_path, report in reports.items() if report["error"]}
+    if whole_program and files_to_compile and not errors:
+        codes = {input_path: VMCode.from_bytes(report["code"])
+                 for input_path, report in reports.items()}
+        commands = sum(map(len, codes.values()))
+        if arguments.inline is not None:
+            from Inliner import Inliner
+            from PeepholeOptimizer import PeepholeOptimizer
+            inliner = Inliner(codes, arguments.inline)
+            codes = inliner.run()
+            # the optimizer cleans up around the inlined code
+            optimizer = PeepholeOptimizer(arguments.optimization_level)
+            codes = {input_path: optimizer.optimize(code)
+                     for input_path, code in codes.items()}
+            inlined = sum(map(len, codes.values()))
+            print(f"inliner: {sum(inliner.inlined.values())} calls to "
+                  f"{len(inliner.inlined)} subroutines inlined, "
+                  f"{commands} -> {inlined} commands "
+                  f"({inlined - commands:+d})", file=sys.stderr)
+            for name, sites in inliner.inlined.items():
+                print(f"  inlined {name} at {sites} call sites",
+                      file=sys.stderr)
+            for name, reason in inliner.rejected.items():
+                print(f"  kept {name}: {reason}", file=sys.stderr)
+            commands = inlined
+        if arguments.whole_program:
+            from CallGraph import eliminate_dead_code
+            codes, pruned = eliminate_dead_code(codes)
+            print(f"whole program: removed {len(pruned)} unreachable "
+                  f"subroutines, {commands - sum(map(len, codes.values()))} "
+                  f"of {commands} commands", file=sys.stderr)
+            for name in pruned:
+                print(f"  {name}", file=sys.stderr)
+        for input_path, code in codes.items():
+            outputs.write(cache.output_path(input_path),
+                          code.to_bytes() if arguments.binary
+                          else code.to_text())
+    elif not whole_program:
+        for input_path, report in reports.items():
+            if report["error"]:
+                continue
+            if report["output_file"] is not None:
+                outputs.write_file(cache.output_path(input_path),
+                                   report["output_file"])
+            else:
+                outputs.write(cache.output_path(input_path),
+                              report["output"])
+    outputs.commit()
+    for input_path in files_to_compile:
+        # an incomplete program is not written, its calls being unknown
+        if input_path in errors or whole_program and errors:
+            cache.forget(input_path)
+        else:
+            cache.record(input_path)
+    if files_to_compile:
+        cache.save()
+    if arguments.opt_stats:
+        def total(key):
+            return sum(report.get(key, 0) for report in reports.values())
+        print(f"peephole: removed {total('removed')} of "
+              f"{total('commands')} commands", file=sys.stderr)
+        if arguments.pool_strings:
+            print(f"string pool: {total('strings')} literals pooled, "
+                  f"{total('string_uses')} uses, {total('calls_saved')} "
+                  f"calls saved per evaluation of every use",
+                  file=sys.stderr)
+    if arguments.profile or arguments.profile_dir:
+        import Profiler
+        print(Profiler.format_table(
+            {input_path: report.get("profile")
+             for input_path, report in reports.items()
+             if report.get("profile")}), file=sys.stderr)
+    if arguments.cost_report or arguments.cost_report_json:
+        import CostReport
+        report = CostReport.cost_report(read_outputs(
+            [input_path for input_path in files_to_assemble
+             if input_path not in errors], cache, arguments.binary))
+        if arguments.cost_report:
+            print(CostReport.format_table(report), file=sys.stderr)
+        if arguments.cost_report_json:
+            import json
+            with open(arguments.cost_report_json, 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+    if arguments.cache_stats:
+        print(f"build cache: {cache.hits} hits, {cache.misses} misses, "
+              f"{outputs.written} outputs written, {outputs.unchanged} "
+              f"unchanged, {outputs.removed} removed", file=sys.stderr)
+    for input_path, error in errors.items():
+        print(f"{input_path}: {error}", file=sys.stderr)
+    return files_to_compile, errors
 
 
 if "__main__" == __name__:
@@ -31,20 +438,142 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        prog="JackCompiler", formatter_class=HelpFormatter,
+        usage="JackCompiler [--jobs N] [--force] [--cache-stats] "
+              "[--binary] [-O LEVEL] [--shift-ops] [--pool-strings] "
+              "[--opt-stats] [--profile] [--profile-dir DIR] [--stream] "
+              "[--mmap] [--ast] [--whole-program] [--inline SIZE] [--watch] "
+              "[--poll-interval SECONDS] [--fsync] [--cost-report] "
+              "[--cost-report-json FILE] [--split-classes] <input path>")
+    parser.add_argument("path")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of files compiled in parallel "
+                             "(default: the number of CPUs)")
+    parser.add_argument("--force", action="store_true",
+                        help="recompile files even if their output is up "
+                             "to date")
+    parser.add_argument("--cache-stats", action="store_true",
+                        help="report build cache hits and misses")
+    parser.add_argument("--binary", action="store_true",
+                        help="write compact binary .vmb files instead of .vm")
+    parser.add_argument("-O", dest="optimization_level", type=int, default=0,
+                        choices=[0, 1],
+                        help="0 (default) writes the code as generated, 1 "
+                             "folds constants, strength-reduces "
+                             "multiplications and runs the peephole "
+                             "optimizer")
+    parser.add_argument("--shift-ops", action="store_true",
+                        help="the target VM supports shiftleft/shiftright")
+    parser.add_argument("--pool-strings", action="store_true",
+                        help="build each string literal of a class once and "
+                             "share it (literals must not be modified)")
+    parser.add_argument("--opt-stats", action="store_true",
+                        help="report the number of commands optimized away "
+                             "and the string pool sizes")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the tokenize, compile and write phases "
+                             "of every file and count tokens, commands and "
+                             "symbol lookups (up to date files are skipped "
+                             "unless --force is given)")
+    parser.add_argument("--profile-dir",
+                        help="also write a cProfile dump of every file "
+                             "into this directory")
+    parser.add_argument("--stream", action="store_true",
+                        help="tokenize lazily in chunks and write outputs "
+                             "straight to disk, keeping memory flat for huge "
+                             "source files (classes are not split, and "
+                             "--ast, --whole-program and --inline still hold "
+                             "a whole class)")
+    parser.add_argument("--mmap", dest="mapped", action="store_true",
+                        help="memory-map source files and tokenize their "
+                             "bytes in place, for very large files")
+    parser.add_argument("--ast", action="store_true",
+                        help="compile in two passes, parsing each class into "
+                             "an array-backed AST before generating code")
+    parser.add_argument("--whole-program", action="store_true",
+                        help="compile a directory as one program, removing "
+                             "the subroutines Main.main never calls")
+    parser.add_argument("--inline", type=int, metavar="SIZE",
+                        help="compile a directory as one program, replacing "
+                             "calls to subroutines of at most SIZE commands "
+                             "by their code")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running, and recompile the files that "
+                             "change as soon as they are saved")
+    parser.add_argument("--poll-interval", type=float, default=0.1,
+                        metavar="SECONDS",
+                        help="seconds between two checks for changes in "
+                             "watch mode (default: 0.1)")
+    parser.add_argument("--fsync", action="store_true",
+                        help="flush the outputs of every build to the disk "
+                             "before they replace the previous ones")
+    parser.add_argument("--split-classes", action="store_true",
+                        help="also spread the subroutines of very large "
+                             "classes over the --jobs worker processes")
+    parser.add_argument("--cost-report", action="store_true",
+                        help="estimate the cost of every subroutine from "
+                             "its code: commands, loops, calls and frame "
+                             "size, largest first")
+    parser.add_argument("--cost-report-json", metavar="FILE",
+                        help="also write the cost report as JSON into this "
+                             "file")
+    arguments = parser.parse_args()
+    if arguments.profile_dir:
+        os.makedirs(arguments.profile_dir, exist_ok=True)
+    argument_path = os.path.abspath(arguments.path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".jack"]
+    # Files whose source and .vm output match the build manifest are skipped
+    cache = BuildCache(os.path.dirname(files_to_assemble[0])
+                       if files_to_assemble else argument_path,
+                       compiler_fingerprint(
+                           f"O{arguments.optimization_level}",
+                           *(["binary"] if arguments.binary else []),
+                           *(["shift-ops"] if arguments.shift_ops else []),
+                           *(["pool-strings"] if arguments.pool_strings
+                             else []),
+                           *(["whole-program"] if arguments.whole_program
+                             else []),
+                           *([f"inline{arguments.inline}"]
+                             if arguments.inline is not None else [])),
+                       arguments.force,
+                       BINARY_VM_EXTENSION if arguments.binary
+                       else VM_EXTENSION)
+    files_to_compile, errors = build(arguments, files_to_assemble, cache)
+    if arguments.watch:
+        from Watcher import Watcher
+        watcher = Watcher(argument_path, arguments.poll_interval)
+        print(f"watching {argument_path} for changes, press Ctrl-C to stop",
+              file=sys.stderr)
+        try:
+            while True:
+                changed, removed = watcher.wait()
+                start = time.perf_counter()
+                if removed and (arguments.whole_program or
+                                arguments.inline is not None):
+                    # the rest of the program has to be linked again
+                    changed = None
+                    for input_path in watcher.sources():
+                        cache.forget(input_path)
+                files_to_compile, errors = build(
+                    arguments, watcher.sources(), cache, changed, removed)
+                if removed and not files_to_compile:
+                    cache.save()
+                print(f"rebuilt {len(files_to_compile)} of "
+                      f"{len(watcher.sources())} files in "
+                      f"{(time.perf_counter() - start) * 1000:.1f} ms"
+                      f"{f', {len(errors)} failed' if errors else ''}",
+                      file=sys.stderr)
+        except KeyboardInterrupt:
+            pass
+    elif errors:
+        sys.exit(f"{len(errors)} of {len(files_to_assemble)} files failed "
+                 f"to compile")
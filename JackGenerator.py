@@ -0,0 +1,230 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import random
+import typing
+
+OPERATIONS = ["+", "-", "*", "/", "&", "|", "<", ">", "="]
+WORDS = ["alpha", "beta", "gamma", "delta", "score", "level", "ready",
+         "value", "total", "game", "over", "the", "ball", "bat", "hit"]
+
+
+class JackGenerator:
+    """Generates deterministic, syntactically valid Jack projects of any size
+    for benchmarking the compiler: many classes, long subroutines, deeply
+    nested expressions and many string literals. The same seed and sizes
+    always give the same sources.
+    """
+
+    def __init__(self, seed: int = 0, classes: int = 10,
+                 subroutines: int = 10, statements: int = 20,
+                 depth: int = 4, strings: float = 0.1) -> None:
+        """Creates a generator.
+
+        Args:
+            seed (int): the seed of the generator's random numbers.
+            classes (int): the number of classes in the project.
+            subroutines (int): the number of subroutines in every class.
+            statements (int): the number of statements in every subroutine.
+            depth (int): the maximal nesting depth of expressions.
+            strings (float): the probability of a term being a string.
+        """
+        self.random = random.Random(seed)
+        self.classes = classes
+        self.subroutines = subroutines
+        self.statements = statements
+        self.depth = depth
+        self.strings = strings
+        self.class_names = [f"Class{index}" for index in range(classes)]
+        # the names visible in the subroutine being generated
+        self.variables = []
+        self.arrays = []
+
+    def project(self) -> typing.Dict[str, str]:
+        """
+        Returns:
+            dict: the source of every class, by file name. Main.jack holds a
+            main function calling into every other class.
+        """
+        sources = {f"{name}.jack": self.jack_class(name)
+                   for name in self.class_names}
+        calls = "".join(f"      do {name}.function0(1, 2);\n"
+                        for name in self.class_names)
+        sources["Main.jack"] = ("class Main {\n"
+                                "   function void main() {\n"
+                                f"{calls}"
+                                "      return;\n"
+                                "   }\n"
+                                "}\n")
+        return sources
+
+    def write(self, directory: str) -> None:
+        """Writes the project's sources into a directory.
+
+        Args:
+            directory (str): the directory to write to, created if missing.
+        """
+        os.makedirs(directory, exist_ok=True)
+        for filename, source in self.project().items():
+            with open(os.path.join(directory, filename), 'w') as file:
+                file.write(source)
+
+    def jack_class(self, name: str) -> str:
+        """
+        Args:
+            name (str): the name of the class.
+
+        Returns:
+            str: the source of the class.
+        """
+        lines = [f"// Generated benchmark class {name}",
+                 f"class {name} {{",
+                 "   field int x, y, size;",
+                 "   field Array cells;",
+                 "   static int count;"]
+        lines.append(f"   constructor {name} new(int ax, int ay) {{")
+        lines.append("      let x = ax;")
+        lines.append("      let y = ay;")
+        lines.append("      let cells = Array.new(16);")
+        lines.append("      return this;")
+        lines.append("   }")
+        for index in range(self.subroutines):
+            kind = "function" if index % 2 == 0 else "method"
+            lines.extend(self.subroutine(kind, f"{kind}{index}"))
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def subroutine(self, kind: str, name: str) -> typing.List[str]:
+        """
+        Args:
+            kind (str): "function" or "method".
+            name (str): the name of the subroutine.
+
+        Returns:
+            list: the lines of the subroutine.
+        """
+        self.variables = ["a", "b", "i", "j", "k"]
+        if kind == "method":
+            self.variables += ["x", "y", "size"]
+        self.arrays = ["arr"] + (["cells"] if kind == "method" else [])
+        lines = [f"   {kind} int {name}(int a, int b) {{",
+                 "      var int i, j, k;",
+                 "      var Array arr;",
+                 "      var String s;",
+                 "      /* set up the scratch array */",
+                 "      let arr = Array.new(8);"]
+        for _ in range(self.statements):
+            lines.extend(self.statement(2))
+        lines.append(f"      return {self.expression(self.depth)};")
+        lines.append("   }")
+        return lines
+
+    def statement(self, depth: int) -> typing.List[str]:
+        """
+        Args:
+            depth (int): how many more statements may be nested inside.
+
+        Returns:
+            list: the lines of a random statement.
+        """
+        indent = "   " * (4 - depth)
+        choice = self.random.random()
+        if depth > 0 and choice < 0.15:
+            lines = [f"{indent}if ({self.expression(self.depth)}) {{"]
+            lines.extend(self.statement(depth - 1))
+            lines.append(f"{indent}}} else {{")
+            lines.extend(self.statement(depth - 1))
+            lines.append(f"{indent}}}")
+            return lines
+        if depth > 0 and choice < 0.25:
+            lines = [f"{indent}while ({self.expression(self.depth)}) {{"]
+            lines.extend(self.statement(depth - 1))
+            lines.append(f"{indent}   let i = i + 1; // step")
+            lines.append(f"{indent}}}")
+            return lines
+        if choice < 0.4:
+            target = self.random.choice(self.class_names)
+            return [f"{indent}do {target}.function0("
+                    f"{self.expression(1)}, {self.expression(1)});"]
+        if choice < 0.5:
+            array = self.random.choice(self.arrays)
+            return [f"{indent}let {array}[{self.expression(1)}] = "
+                    f"{self.expression(self.depth)};"]
+        if choice < 0.55:
+            return [f"{indent}let s = {self.string()};"]
+        variable = self.random.choice(self.variables)
+        return [f"{indent}let {variable} = {self.expression(self.depth)};"]
+
+    def expression(self, depth: int) -> str:
+        """
+        Args:
+            depth (int): how many more levels of terms may be nested.
+
+        Returns:
+            str: a random expression.
+        """
+        terms = [self.term(depth) for _ in range(self.random.randint(1, 3))]
+        expression = terms[0]
+        for term in terms[1:]:
+            expression += f" {self.random.choice(OPERATIONS)} {term}"
+        return expression
+
+    def term(self, depth: int) -> str:
+        """
+        Args:
+            depth (int): how many more levels of terms may be nested.
+
+        Returns:
+            str: a random term.
+        """
+        choice = self.random.random()
+        if depth > 0 and choice < 0.3:
+            return f"({self.expression(depth - 1)})"
+        if depth > 0 and choice < 0.35:
+            return f"-{self.term(depth - 1)}"
+        if depth > 0 and choice < 0.4:
+            return f"~({self.expression(depth - 1)})"
+        if depth > 0 and choice < 0.45:
+            return f"{self.random.choice(self.arrays)}[" \
+                   f"{self.expression(depth - 1)}]"
+        if depth > 0 and choice < 0.5:
+            return f"Math.max({self.expression(depth - 1)}, " \
+                   f"{self.expression(depth - 1)})"
+        if choice < 0.5 + self.strings:
+            return self.string() if self.random.random() < 0.5 \
+                else "s.length()"
+        if choice < 0.75:
+            return str(self.random.randint(0, 1000))
+        if choice < 0.8:
+            return self.random.choice(["true", "false", "null"])
+        return self.random.choice(self.variables)
+
+    def string(self) -> str:
+        """
+        Returns:
+            str: a random string literal, quotes included.
+        """
+        words = self.random.sample(WORDS, self.random.randint(1, 4))
+        return '"' + " ".join(words) + '"'
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="JackGenerator",
+        description="Writes a synthetic Jack project for benchmarking.")
+    parser.add_argument("directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--subroutines", type=int, default=10)
+    parser.add_argument("--statements", type=int, default=20)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--strings", type=float, default=0.1)
+    arguments = parser.parse_args()
+    JackGenerator(arguments.seed, arguments.classes, arguments.subroutines,
+                  arguments.statements, arguments.depth,
+                  arguments.strings).write(arguments.directory)
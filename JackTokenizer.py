@@ -4,19 +4,28 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+from __future__ import annotations
 import re
-import typing
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import mmap
+    import typing
+    Token = typing.Tuple[int, str, typing.Union[int, str], int, int]
 
 KEYWORD_PATTERN = 'class|constructor|function|method|field|static|var|int|' \
                   'char|boolean|void|true|false|null|this|let|do|' \
                   'if|else|while|return'
 
-SYMBOL_PATTERN = '\{|\}|\(|\)|\[|\]|\.|\,|\;|\+|\-|\/|\*|\&|\||' \
-                 '\<|\>|\=|\~|\^|\#'
-# DIGIT_PATTERN = '[0-9]{0,5}'
-DIGIT_PATTERN = '\d+'
-STRING_PATTERN = "\".*\""
-IDENTIFIER_PATTERN = "\w+"
+SYMBOL_PATTERN = r'\{|\}|\(|\)|\[|\]|\.|\,|\;|\+|\-|\/(?!\*)|\*|\&|\||' \
+                 r'\<|\>|\=|\~|\^|\#'
+DIGIT_PATTERN = r'\d+'
+STRING_PATTERN = r'"[^"\n]*"'
+IDENTIFIER_PATTERN = r'[A-Za-z_]\w*'
+COMMENT_PATTERN = r'//[^\n]*|/\*.*?\*/'
 
 KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING = "KEYWORD", \
                                                  "SYMBOL", \
@@ -24,6 +33,161 @@ KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING = "KEYWORD", \
                                                  "INT_CONST", \
                                                  "STRING_CONST"
 
+KEYWORDS = frozenset(KEYWORD_PATTERN.split("|"))
+
+# Integer kind codes kept per token; TOKEN_TYPES maps them back to the names
+# returned by token_type().
+KEYWORD_KIND, SYMBOL_KIND, IDENTIFIER_KIND, INT_CONST_KIND, STRING_KIND = \
+    range(5)
+TOKEN_TYPES = (KEYWORD, SYMBOL, IDENTIFIER, INT_CONST, STRING)
+KIND_CODES = {name: code for code, name in enumerate(TOKEN_TYPES)}
+
+# One alternation for the whole language, compiled once. Comments come first
+# so "//" and "/*" are never split into two "/" symbols, and strings come
+# before symbols so nothing inside the quotes is tokenized. A "/*" without
+# its "*/" is not a "/" symbol either, it is an error.
+LEXER = re.compile(r'(?P<SKIP>\s+|{})|(?P<{}>{})|(?P<{}>{})|(?P<WORD>{})|'
+                   r'(?P<{}>{})|(?P<ERROR>.)'.format(
+                       COMMENT_PATTERN, STRING, STRING_PATTERN,
+                       INT_CONST, DIGIT_PATTERN, IDENTIFIER_PATTERN,
+                       SYMBOL, SYMBOL_PATTERN), re.S)
+
+# The same language as LEXER over bytes, for MappedTokenizer. Keywords get
+# their own group, so words are classified without copying them out.
+BYTES_LEXER = re.compile(
+    r'(?P<SKIP>\s+|{})|(?P<{}>{})|(?P<{}>{})|(?P<{}>(?:{})(?!\w))|'
+    r'(?P<{}>{})|(?P<{}>{})|(?P<ERROR>.)'.format(
+        COMMENT_PATTERN, STRING, STRING_PATTERN, INT_CONST, DIGIT_PATTERN,
+        KEYWORD, KEYWORD_PATTERN, IDENTIFIER, IDENTIFIER_PATTERN,
+        SYMBOL, SYMBOL_PATTERN).encode(), re.S)
+NOT_DECODED = -1
+LONG_TOKEN = 255
+
+# Characters read from the input at a time, and tokens kept behind the
+# current one, by StreamingTokenizer.
+CHUNK_SIZE = 1 << 16
+LOOKBACK = 4
+
+
+class TokenStore:
+    """Compact, array-backed storage for a tokenized input. Every token is a
+    kind code, an index into a table of interned values and a line/column
+    position, each kept in its own typed array.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty token store."""
+        self.kinds = array("B")
+        self.value_ids = array("I")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.texts = []  # interned token texts, indexed by value id
+        self.values = []  # decoded values (int / unquoted str), same index
+        self.value_index = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def append(self, kind: int, text: str, line: int, column: int) -> None:
+        """Adds a token to the end of the store.
+
+        Args:
+            kind (int): the kind code of the token.
+            text (str): the token as it appears in the source.
+            line (int): the 1-based line the token starts in.
+            column (int): the 0-based column the token starts in.
+        """
+        self.kinds.append(kind)
+        self.value_ids.append(self.intern(kind, text))
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def intern(self, kind: int, text: str) -> int:
+        """
+        Args:
+            kind (int): the kind code of a token.
+            text (str): the token as it appears in the source.
+
+        Returns:
+            int: the value id of the token, added to the tables if new.
+        """
+        value_id = self.value_index.get(text)
+        if value_id is None:
+            value_id = len(self.texts)
+            self.value_index[text] = value_id
+            self.texts.append(text)
+            if kind == INT_CONST_KIND:
+                self.values.append(int(text))
+            elif kind == STRING_KIND:
+                self.values.append(text[1:-1])
+            else:
+                self.values.append(text)
+        return value_id
+
+
+class SpanStore(TokenStore):
+    """A TokenStore for a bytes input, keeping every token as an (offset,
+    length) span into it. The text of a token is only decoded, and interned
+    like in a TokenStore, the first time it is asked for; value_ids holds
+    NOT_DECODED until then. Lengths take a byte, tokens of LONG_TOKEN bytes
+    or more being lexed again to find theirs, and lines are found from the
+    index of the first token of every line, so a token takes 10 bytes.
+    """
+
+    def __init__(self, data: typing.Union[bytes, mmap.mmap]) -> None:
+        """Creates an empty store.
+
+        Args:
+            data (bytes or mmap.mmap): the input the spans point into.
+        """
+        super().__init__()
+        self.data = data
+        self.starts = array("I")
+        self.lengths = array("B")
+        self.value_ids = array("i")
+        # line_starts[i] is the index of the first token after the start of
+        # line i + 1
+        self.line_starts = array("I", [0])
+        del self.lines, self.columns
+
+    def decode(self, index: int) -> int:
+        """Decodes the text of a token.
+
+        Args:
+            index (int): the index of the token.
+
+        Returns:
+            int: the value id of the token.
+        """
+        start = self.starts[index]
+        length = self.lengths[index]
+        if length == LONG_TOKEN:
+            length = BYTES_LEXER.match(self.data, start).end() - start
+        value_id = self.value_ids[index] = self.intern(
+            self.kinds[index], self.data[start:start + length].decode())
+        return value_id
+
+    def line(self, index: int) -> int:
+        """
+        Args:
+            index (int): the index of a token.
+
+        Returns:
+            int: the 1-based line the token starts in.
+        """
+        return bisect_right(self.line_starts, index)
+
+    def column(self, index: int) -> int:
+        """
+        Args:
+            index (int): the index of a token.
+
+        Returns:
+            int: the 0-based column, in bytes, the token starts in.
+        """
+        start = self.starts[index]
+        return start - self.data.rfind(b"\n", 0, start) - 1
+
 
 class JackTokenizer:
     """Removes all comments from the input stream and breaks it
@@ -36,10 +200,10 @@ class JackTokenizer:
         Args:
             input_stream (typing.TextIO): input stream.
         """
-        self.input_lines = input_stream.read().splitlines()
+        self.input_text = input_stream.read()
         self.token_counter = 0
-        self.parsed_text = self.clean_input()
-        self.len = len(self.parsed_text)
+        self.tokens = self.clean_input()
+        self.len = len(self.tokens)
 
     def has_more_tokens(self) -> bool:
         """Do we have more tokens in the input?
@@ -62,17 +226,15 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        token = self.parsed_text[self.token_counter]
-        if re.fullmatch(KEYWORD_PATTERN, token):
-            return KEYWORD
-        elif re.match(SYMBOL_PATTERN, token):
-            return SYMBOL
-        elif re.match(DIGIT_PATTERN, token):
-            return INT_CONST
-        elif re.match(STRING_PATTERN, token):
-            return STRING
-        else:
-            return IDENTIFIER
+        return TOKEN_TYPES[self.tokens.kinds[self.token_counter]]
+
+    def kind(self) -> int:
+        """
+        Returns:
+            int: the kind code of the current token, one of KEYWORD_KIND,
+            SYMBOL_KIND, IDENTIFIER_KIND, INT_CONST_KIND, STRING_KIND.
+        """
+        return self.tokens.kinds[self.token_counter]
 
     def keyword(self) -> str:
         """
@@ -83,7 +245,8 @@ class JackTokenizer:
             "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        return self.parsed_text[self.token_counter]
+        tokens = self.tokens
+        return tokens.texts[tokens.value_ids[self.token_counter]]
 
     def symbol(self) -> str:
         """
@@ -91,7 +254,8 @@ class JackTokenizer:
             str: the character which is the current token.
             Should be called only when token_type() is "SYMBOL".
         """
-        return self.parsed_text[self.token_counter]
+        tokens = self.tokens
+        return tokens.texts[tokens.value_ids[self.token_counter]]
 
     def identifier(self) -> str:
         """
@@ -99,15 +263,17 @@ class JackTokenizer:
             str: the identifier which is the current token.
             Should be called only when token_type() is "IDENTIFIER".
         """
-        return self.parsed_text[self.token_counter]
+        tokens = self.tokens
+        return tokens.texts[tokens.value_ids[self.token_counter]]
 
     def int_val(self) -> int:
         """
         Returns:
-            str: the integer value of the current token.
+            int: the integer value of the current token.
             Should be called only when token_type() is "INT_CONST".
         """
-        return self.parsed_text[self.token_counter]
+        tokens = self.tokens
+        return tokens.values[tokens.value_ids[self.token_counter]]
 
     def string_val(self) -> str:
         """
@@ -115,95 +281,356 @@ class JackTokenizer:
             str: the string value of the current token, without the double 
             quotes. Should be called only when token_type() is "STRING_CONST".
         """
-        return self.parsed_text[self.token_counter]
-
-    def clean_input(self):
-        array = []
-        line_idx = 0
-        while line_idx < len(self.input_lines):
-            line = self.input_lines[line_idx]
-            if line[0:2] == "/*":
-                while "*/" not in line:
-                    line_idx += 1
-                    line = self.input_lines[line_idx]
-                line_idx += 1
-                continue
-            if len(line) == 0 or line[0] == "*" or line[0:2] == "//":
-                line_idx += 1
-                continue
+        tokens = self.tokens
+        return tokens.values[tokens.value_ids[self.token_counter]]
 
-            else:
-                # line = line.strip()
-                line = re.sub("/\*.*\*/", "", line).strip()
-                if line[0:2] == "/*":
-                    while "*/" not in line:
-                        line_idx += 1
-                        line = self.input_lines[line_idx]
-                    line_idx += 1
-                    continue
-                if len(line) == 0 or line[0] == "*" or \
-                        line[0:2] == "//" or line[0:2] == "/*":
-                    line_idx += 1
-                    continue
-                idx_matcher_quote = re.search("(\")", line)
-                idx = self.string_comment_checker(line)
-                # idx_matcher = re.search("(//|/\*)",
-                #                         line)  # TODO : ADD OPTION */ and
-                #               than it will start right after it! IMPORTANT
-                # idx = len(line)
-                # if idx_matcher != None:
-                #     idx = idx_matcher.start()
-                temp = [x for x in re.findall(r'({}|{}|{}|{}|{})'.format(
-                    IDENTIFIER_PATTERN, DIGIT_PATTERN, STRING_PATTERN,
-                    SYMBOL_PATTERN, KEYWORD_PATTERN), line[:idx])]
-                temp2 = []
-                for i in range(len(temp)):
-                    if temp[i] == "<":
-                        temp2.append("&lt;")
-                    elif temp[i] == ">":
-                        temp2.append("&gt;")
-                    # elif re.match(STRING_PATTERN,temp[i]):
-                    # temp2.append(temp[i][1:-1])
-                    elif temp[i] == "&":
-                        temp2.append("&amp;")
-                    else:
-                        temp2.append(temp[i])
+    def clean_input(self) -> TokenStore:
+        """Scans the whole input once with the precompiled lexer, dropping
+        whitespace and comments and classifying every token as it goes.
 
-                array += [t for t in temp2 if len(t) > 0]
-                line_idx += 1
-        # self.len = len(self.parsed_text)
-        return array
+        Returns:
+            TokenStore: the tokens of the input, in order.
+        """
+        store = TokenStore()
+        text = self.input_text
+        line, line_start = 1, 0
+        for match in LEXER.finditer(text):
+            kind = match.lastgroup
+            token = match.group()
+            if kind == "SKIP":
+                newlines = token.count("\n")
+                if newlines:
+                    line += newlines
+                    line_start = match.start() + token.rindex("\n") + 1
+                continue
+            if kind == "WORD":
+                code = KEYWORD_KIND if token in KEYWORDS else IDENTIFIER_KIND
+            elif kind == "ERROR":
+                raise ValueError(f"Unexpected character {token!r} in line "
+                                 f"{line}, column {match.start() - line_start}")
+            else:
+                code = KIND_CODES[kind]
+            store.append(code, token, line, match.start() - line_start)
+        return store
 
     def get_cur_token(self):
         """ Return current token"""
-        return self.parsed_text[self.token_counter]
+        tokens = self.tokens
+        return tokens.texts[tokens.value_ids[self.token_counter]]
+
+    def line(self) -> int:
+        """
+        Returns:
+            int: the line the current token starts in.
+        """
+        return self.tokens.lines[self.token_counter]
+
+    def position(self) -> typing.Tuple[int, int]:
+        """
+        Returns:
+            tuple: the (line, column) the current token starts in.
+        """
+        return self.tokens.lines[self.token_counter], \
+            self.tokens.columns[self.token_counter]
 
     def take_one_step_back(self):
         if self.token_counter > 0:
             self.token_counter -= 1
 
-    def string_comment_checker(self, line):
-        all_quotes = [x.start() for x in re.finditer("\"", line)]
-        all_backslash = [x.start() for x in re.finditer("//|/\*", line)]
-        if len(all_backslash) == 0:
-            return len(line)
-
-        if len(all_quotes) == 0:
-            return all_backslash[0]
-
-        i = 0
-        j = 0
-        while i < len(all_quotes) and j < len(all_backslash):
-            while all_quotes[i] < all_backslash[j] < all_quotes[i + 1]:
-                j += 1
-                if j >= len(all_backslash):
+    def close(self) -> None:
+        """Releases what the tokenizer holds of its input. The tokens can't
+        be read afterwards. Nothing is held here, as the input is read whole.
+        """
+
+
+class StreamingTokenizer(JackTokenizer):
+    """A JackTokenizer that reads its input in chunks and produces tokens only
+    as the engine advances to them, so its memory stays flat regardless of
+    the size of the input. Only the current token and a few tokens before it
+    are kept, for take_one_step_back.
+    """
+
+    def __init__(self, input_stream: typing.TextIO,
+                 chunk_size: int = CHUNK_SIZE,
+                 lookback: int = LOOKBACK) -> None:
+        """Opens the input stream and reads the first token.
+
+        Args:
+            input_stream (typing.TextIO): input stream.
+            chunk_size (int): the number of characters read at a time.
+            lookback (int): how many times take_one_step_back can be called
+            in a row.
+        """
+        self.input_stream = input_stream
+        self.chunk_size = chunk_size
+        self.token_counter = 0
+        self.len = 0  # the number of tokens read so far
+        self.stream = self.scan()
+        # window[-1] is the current token, None past the end of the input
+        self.window = deque(maxlen=lookback + 1)
+        self.ahead = []  # tokens stepped back over, the next one last
+        self.window.append(self.next_token())
+
+    def next_token(self) -> typing.Optional[Token]:
+        """
+        Returns:
+            tuple: the next token of the input as (kind code, text, value,
+            line, column), or None if there are no more tokens.
+        """
+        if self.ahead:
+            return self.ahead.pop()
+        token = next(self.stream, None)
+        if token is not None:
+            self.len += 1
+        return token
+
+    def scan(self) -> typing.Iterator[Token]:
+        """Tokenizes the input chunk by chunk. A match reaching the end of
+        the text read so far may be cut in the middle (a word, a number, a
+        comment, a string missing its closing quote), so it is only accepted
+        once more input was read after it. Block comments are skipped as they
+        are read, so even huge ones are never held in memory whole.
+
+        Yields:
+            tuple: the tokens of the input as (kind code, text, value, line,
+            column).
+        """
+        text = ""
+        position = 0
+        line, line_start = 1, 0
+        in_comment = False
+        comment_line = comment_column = 0
+        at_end = False
+        while True:
+            if not at_end:
+                chunk = self.input_stream.read(self.chunk_size)
+                at_end = not chunk
+                # drop the consumed text, keeping columns relative to it
+                text = text[position:] + chunk
+                line_start -= position
+                position = 0
+            while position < len(text):
+                if in_comment:
+                    end = text.find("*/", position)
+                    if end < 0:
+                        if at_end:
+                            break
+                        # keep a last "*" that may start the closing "*/"
+                        skipped = len(text) - 1
+                    else:
+                        skipped = end + 2
+                        in_comment = False
+                    newlines = text.count("\n", position, skipped)
+                    if newlines:
+                        line += newlines
+                        line_start = text.rindex("\n", position, skipped) + 1
+                    position = skipped
+                    if in_comment:
+                        break
+                    continue
+                match = LEXER.match(text, position)
+                kind = match.lastgroup
+                token = match.group()
+                if not at_end and (match.end() == len(text) or (
+                        kind == "ERROR" and (token == "/" or token == '"' and
+                                             "\n" not in text[position:]))):
+                    if kind == "ERROR" and token == "/":
+                        # a block comment not closed in the text read so far
+                        in_comment = True
+                        comment_line = line
+                        comment_column = position - line_start
+                        position += 2
+                        continue
                     break
-            if j >= len(all_backslash):
-                break
-            i += 2
+                position = match.end()
+                if kind == "SKIP":
+                    newlines = token.count("\n")
+                    if newlines:
+                        line += newlines
+                        line_start = match.start() + token.rindex("\n") + 1
+                    continue
+                column = match.start() - line_start
+                if kind == "WORD":
+                    yield (KEYWORD_KIND if token in KEYWORDS
+                           else IDENTIFIER_KIND), token, token, line, column
+                elif kind == INT_CONST:
+                    yield INT_CONST_KIND, token, int(token), line, column
+                elif kind == STRING:
+                    yield STRING_KIND, token, token[1:-1], line, column
+                elif kind == SYMBOL:
+                    yield SYMBOL_KIND, token, token, line, column
+                else:
+                    raise ValueError(f"Unexpected character {token!r} in "
+                                     f"line {line}, column {column}")
+            if at_end:
+                if in_comment:
+                    # the input ended in a block comment
+                    raise ValueError(f"Unexpected character '/' in line "
+                                     f"{comment_line}, column "
+                                     f"{comment_column}")
+                return
+
+    def has_more_tokens(self) -> bool:
+        return self.window[-1] is not None
+
+    def advance(self) -> None:
+        self.token_counter += 1
+        self.window.append(self.next_token())
+
+    def token_type(self) -> str:
+        return TOKEN_TYPES[self.window[-1][0]]
+
+    def kind(self) -> int:
+        return self.window[-1][0]
+
+    def keyword(self) -> str:
+        return self.window[-1][1]
+
+    def symbol(self) -> str:
+        return self.window[-1][1]
+
+    def identifier(self) -> str:
+        return self.window[-1][1]
+
+    def int_val(self) -> int:
+        return self.window[-1][2]
+
+    def string_val(self) -> str:
+        return self.window[-1][2]
+
+    def get_cur_token(self):
+        return self.window[-1][1]
+
+    def line(self) -> int:
+        return self.window[-1][3]
+
+    def position(self) -> typing.Tuple[int, int]:
+        return self.window[-1][3], self.window[-1][4]
+
+    def take_one_step_back(self):
+        if len(self.window) > 1:
+            self.ahead.append(self.window.pop())
+            self.token_counter -= 1
+
+
+class MappedTokenizer(JackTokenizer):
+    """A JackTokenizer that memory-maps its input file and lexes its bytes
+    in place. Tokens are kept as spans into the mapping, so the source is
+    never decoded or copied as a whole, and the text of a token is decoded
+    the first time the compiler reads it. The input must be ASCII outside
+    of comments and string literals, as Jack requires, and columns count
+    bytes.
+    """
+
+    def __init__(self, input_file: typing.BinaryIO) -> None:
+        """Maps the input file and tokenizes it.
+
+        Args:
+            input_file (typing.BinaryIO): a file opened in binary mode.
+        """
+        import mmap
+        try:
+            self.data = mmap.mmap(input_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            self.data = b""
+        self.token_counter = 0
+        try:
+            self.tokens = self.clean_input()
+        except ValueError:
+            self.close()
+            raise
+        self.len = len(self.tokens)
+
+    def close(self) -> None:
+        """Unmaps the input file. The text of tokens not read yet can't be
+        decoded afterwards.
+        """
+        if not isinstance(self.data, bytes):
+            self.data.close()
+
+    def clean_input(self) -> SpanStore:
+        """Scans the whole mapping once with the bytes lexer, keeping the
+        span and kind of every token, and where every line starts.
+
+        Returns:
+            SpanStore: the tokens of the input, in order.
+        """
+        store = SpanStore(self.data)
+        kinds, line_starts = store.kinds, store.line_starts
+        add_kind, add_start = kinds.append, store.starts.append
+        add_length, add_value_id = store.lengths.append, \
+            store.value_ids.append
+        for match in BYTES_LEXER.finditer(self.data):
+            kind = match.lastgroup
+            if kind == "SKIP":
+                newlines = match.group().count(b"\n")
+                if newlines:
+                    line_starts.extend(array("I", [len(kinds)]) * newlines)
+                continue
+            start, end = match.span()
+            if kind == "ERROR":
+                column = start - self.data.rfind(b"\n", 0, start) - 1
+                character = match.group().decode("ascii", "backslashreplace")
+                raise ValueError(f"Unexpected character {character!r} "
+                                 f"in line {len(line_starts)}, column "
+                                 f"{column}")
+            add_kind(KIND_CODES[kind])
+            add_start(start)
+            length = end - start
+            add_length(length if length < LONG_TOKEN else LONG_TOKEN)
+            add_value_id(NOT_DECODED)
+        return store
+
+    def text(self) -> str:
+        """
+        Returns:
+            str: the current token as it appears in the source.
+        """
+        tokens = self.tokens
+        value_id = tokens.value_ids[self.token_counter]
+        if value_id < 0:
+            value_id = tokens.decode(self.token_counter)
+        return tokens.texts[value_id]
+
+    def value(self) -> typing.Union[int, str]:
+        """
+        Returns:
+            int or str: the value of the current token, as returned by
+            int_val and string_val.
+        """
+        tokens = self.tokens
+        value_id = tokens.value_ids[self.token_counter]
+        if value_id < 0:
+            value_id = tokens.decode(self.token_counter)
+        return tokens.values[value_id]
+
+    def keyword(self) -> str:
+        return self.text()
+
+    def symbol(self) -> str:
+        return self.text()
+
+    def identifier(self) -> str:
+        return self.text()
+
+    def int_val(self) -> int:
+        return self.value()
+
+    def string_val(self) -> str:
+        return self.value()
+
+    def get_cur_token(self):
+        tokens = self.tokens
+        value_id = tokens.value_ids[self.token_counter]
+        if value_id < 0:
+            value_id = tokens.decode(self.token_counter)
+        return tokens.texts[value_id]
 
-        if j < len(all_backslash):
-            return all_backslash[j]
+    def line(self) -> int:
+        return self.tokens.line(self.token_counter)
 
-        if i < len(all_quotes):
-            return len(line)
+    def position(self) -> typing.Tuple[int, int]:
+        return self.tokens.line(self.token_counter), \
+            self.tokens.column(self.token_counter)
@@ -0,0 +1,192 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from __future__ import annotations
+import os
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+
+TEMP_SUFFIX = ".tmp"
+COMPARE_SIZE = 1 << 16
+
+
+def temp_path(path: str) -> str:
+    """
+    Args:
+        path (str): path of an output file.
+
+    Returns:
+        str: the temporary file next to it the current process writes it to.
+    """
+    return f"{path}.{os.getpid()}{TEMP_SUFFIX}"
+
+
+def same_content(path: str, content: typing.Union[str, bytes]) -> bool:
+    """
+    Args:
+        path (str): path of a file.
+        content (str or bytes): content the file may hold.
+
+    Returns:
+        bool: True if the file exists and holds exactly this content.
+    """
+    binary = isinstance(content, bytes)
+    try:
+        if binary and os.path.getsize(path) != len(content):
+            return False
+        with open(path, 'rb' if binary else 'r') as file:
+            return file.read() == content
+    except (OSError, UnicodeDecodeError):
+        return False
+
+
+def same_file(path: str, other_path: str) -> bool:
+    """
+    Args:
+        path (str): path of a file.
+        other_path (str): path of another file.
+
+    Returns:
+        bool: True if both files exist and hold the same bytes. They are
+        compared a chunk at a time, so memory does not grow with them.
+    """
+    try:
+        if os.path.getsize(path) != os.path.getsize(other_path):
+            return False
+        with open(path, 'rb') as file, open(other_path, 'rb') as other_file:
+            while True:
+                chunk = file.read(COMPARE_SIZE)
+                if chunk != other_file.read(COMPARE_SIZE):
+                    return False
+                if not chunk:
+                    return True
+    except OSError:
+        return False
+
+
+class OutputManager:
+    """Collects the output files of a build and writes them together. Every
+    file is written to a temporary file next to it which then replaces it at
+    once, so an output is never seen half written, and a failed build keeps
+    the previous outputs. Files whose content did not change are not written
+    at all, keeping their modification time. Outputs whose source is gone
+    are removed together with the writes.
+    """
+
+    def __init__(self, fsync: bool = False) -> None:
+        """Creates a manager without pending outputs.
+
+        Args:
+            fsync (bool): flush the new contents to the disk before renaming
+            them into place, all of them at once for the whole build, so a
+            crash of the machine can not leave an empty output either.
+        """
+        self.fsync = fsync
+        # output path -> its new content, or None to remove it, in the order
+        # given
+        self.pending = {}
+        # output path -> the temporary file already holding its new content
+        self.files = {}
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def write(self, path: str, content: typing.Union[str, bytes]) -> None:
+        """Adds an output file to write at the next commit, replacing any
+        pending content for it.
+
+        Args:
+            path (str): path of the output file.
+            content (str or bytes): the content of the file, written in
+            binary mode when given as bytes.
+        """
+        self.files.pop(path, None)
+        self.pending[path] = content
+
+    def write_file(self, path: str, written_path: str) -> None:
+        """Adds an output file whose new content was already written to a
+        temporary file, e.g. by a compiler streaming its output, replacing
+        any pending content for it. The temporary file is renamed into place
+        at the next commit, or removed if the content did not change.
+
+        Args:
+            path (str): path of the output file.
+            written_path (str): the temporary file, next to the output file.
+        """
+        self.pending.pop(path, None)
+        self.files[path] = written_path
+
+    def remove(self, path: str) -> None:
+        """Adds an output file to remove at the next commit, replacing any
+        pending content for it.
+
+        Args:
+            path (str): path of the output file.
+        """
+        self.files.pop(path, None)
+        self.pending[path] = None
+
+    def commit(self) -> typing.List[str]:
+        """Writes the pending outputs: all temporary files first, then a
+        flush of each of them to the disk when fsync is on, then the renames
+        and the removals.
+
+        Returns:
+            list: the paths whose file was replaced or removed.
+        """
+        pending, self.pending = self.pending, {}
+        files, self.files = self.files, {}
+        removed = [path for path, content in pending.items()
+                   if content is None and os.path.exists(path)]
+        contents = {path: content for path, content in pending.items()
+                    if content is not None}
+        changed = [path for path, content in contents.items()
+                   if not same_content(path, content)]
+        written = [path for path, written_path in files.items()
+                   if not same_file(path, written_path)]
+        self.unchanged += len(contents) + len(files) - len(changed) - \
+            len(written)
+        # the given temporary files are removed too unless renamed
+        temp_paths = dict(files)
+        try:
+            for path in changed:
+                content = pending[path]
+                output_temp_path = temp_paths[path] = temp_path(path)
+                with open(output_temp_path, 'wb' if isinstance(content, bytes)
+                          else 'w') as temp_file:
+                    temp_file.write(content)
+            changed += written
+            if self.fsync:
+                # one barrier for every temporary file of the build, which
+                # leaves the other files of the machine alone
+                for path in changed:
+                    temp_fd = os.open(temp_paths[path], os.O_RDWR)
+                    try:
+                        os.fsync(temp_fd)
+                    finally:
+                        os.close(temp_fd)
+            for path in changed:
+                os.replace(temp_paths.pop(path), path)
+            for path in removed:
+                os.remove(path)
+        finally:
+            for output_temp_path in temp_paths.values():
+                if os.path.exists(output_temp_path):
+                    os.remove(output_temp_path)
+        if self.fsync and (changed or removed) and os.name == "posix":
+            # makes the renames and removals themselves durable
+            for directory in {os.path.dirname(path) or "."
+                              for path in changed + removed}:
+                directory_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(directory_fd)
+                finally:
+                    os.close(directory_fd)
+        self.written += len(changed)
+        self.removed += len(removed)
+        return changed + removed
@@ -0,0 +1,293 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from __future__ import annotations
+from VMCode import VMCode, ADD, NEG, NOT, RETURN, PUSH, POP, LABEL, GOTO, \
+    IF_GOTO, FUNCTION, CONSTANT, STATIC, THIS, THAT, POINTER, TEMP
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+    Instruction = typing.Tuple[int, int, int]
+
+MAX_CONSTANT = 32767
+WORD = 1 << 16
+
+
+def to_signed(value: int) -> int:
+    """
+    Args:
+        value (int): any integer.
+
+    Returns:
+        int: the value wrapped to a signed 16 bit word.
+    """
+    value %= WORD
+    return value - WORD if value > MAX_CONSTANT else value
+
+
+def push_constant(value: int) -> typing.List[Instruction]:
+    """
+    Args:
+        value (int): a signed 16 bit value.
+
+    Returns:
+        list: the shortest instructions that push the value.
+    """
+    if value >= 0:
+        return [(PUSH, CONSTANT, value)]
+    if value == -WORD // 2:
+        return [(PUSH, CONSTANT, MAX_CONSTANT), (NOT, 0, 0)]
+    return [(PUSH, CONSTANT, -value), (NEG, 0, 0)]
+
+
+def constant_tail(instructions: typing.List[Instruction],
+                  end: int) -> typing.Optional[typing.Tuple[int, int]]:
+    """Finds a constant pushed by the instructions right before end: a push
+    constant, optionally followed by neg or not.
+
+    Args:
+        instructions (list): the instructions to look in.
+        end (int): the index after the last instruction to consider.
+
+    Returns:
+        tuple: the pushed value and the number of instructions pushing it, or
+        None if the instructions before end do not push a constant.
+    """
+    if end >= 1 and instructions[end - 1][:2] == (PUSH, CONSTANT):
+        return instructions[end - 1][2], 1
+    if end >= 2 and instructions[end - 2][:2] == (PUSH, CONSTANT):
+        value = instructions[end - 2][2]
+        if instructions[end - 1][0] == NEG:
+            return to_signed(-value), 2
+        if instructions[end - 1][0] == NOT:
+            return to_signed(~value), 2
+    return None
+
+
+def fold_unary(instructions: typing.List[Instruction]) -> bool:
+    """neg / not applied to a constant become the shortest constant push:
+    'push constant 1, neg, not' becomes 'push constant 0'."""
+    opcode = instructions[-1][0]
+    if opcode != NEG and opcode != NOT:
+        return False
+    constant = constant_tail(instructions, len(instructions) - 1)
+    if constant is None:
+        return False
+    value, length = constant
+    value = to_signed(-value if opcode == NEG else ~value)
+    replacement = push_constant(value)
+    if len(replacement) > length:
+        return False
+    instructions[-length - 1:] = replacement
+    return True
+
+
+def cancel_unary(instructions: typing.List[Instruction]) -> bool:
+    """Two consecutive neg, or two consecutive not, cancel out."""
+    if len(instructions) >= 2 and instructions[-1][0] in (NEG, NOT) and \
+            instructions[-1] == instructions[-2]:
+        del instructions[-2:]
+        return True
+    return False
+
+
+def constant_branch(instructions: typing.List[Instruction]) -> bool:
+    """An if-goto on a constant condition is a goto when it is true and
+    nothing when it is false, e.g. the exit test of 'while (true)'."""
+    if instructions[-1][0] != IF_GOTO:
+        return False
+    constant = constant_tail(instructions, len(instructions) - 1)
+    if constant is None:
+        return False
+    value, length = constant
+    branch = instructions[-1]
+    instructions[-length - 1:] = [(GOTO, branch[1], 0)] if value else []
+    return True
+
+
+def push_pop(instructions: typing.List[Instruction]) -> bool:
+    """Pushing a value and popping it back into the same place is a no-op."""
+    if len(instructions) >= 2 and instructions[-1][0] == POP and \
+            instructions[-2] == (PUSH,) + instructions[-1][1:]:
+        del instructions[-2:]
+        return True
+    return False
+
+
+def array_store(instructions: typing.List[Instruction]) -> bool:
+    """The temp 0 shuffle of an array assignment is not needed when the value
+    is a single push that does not depend on pointer 1:
+    'push x, pop temp 0, pop pointer 1, push temp 0, pop that n' becomes
+    'pop pointer 1, push x, pop that n'. temp 0 is only used as scratch
+    space, so it is never read after the shuffle."""
+    if len(instructions) < 5 or instructions[-4:-1] != [
+            (POP, TEMP, 0), (POP, POINTER, 1), (PUSH, TEMP, 0)] or \
+            instructions[-1][:2] != (POP, THAT):
+        return False
+    value = instructions[-5]
+    if value[0] != PUSH or value[1] == THAT or value[1:] == (POINTER, 1) or \
+            value[1:] == (TEMP, 0):
+        return False
+    instructions[-5:] = [(POP, POINTER, 1), value, instructions[-1]]
+    return True
+
+
+def address_code(instructions: typing.List[Instruction],
+                 end: int) -> typing.Optional[typing.List[Instruction]]:
+    """Finds the code computing the address popped into pointer 1 at end: a
+    single push, or two pushes and an add, none of them reading pointer 1.
+
+    Args:
+        instructions (list): the instructions to look in.
+        end (int): the index of the pop pointer 1.
+
+    Returns:
+        list: the instructions computing the address, or None if it is
+        computed otherwise.
+    """
+    length = 3 if end >= 3 and instructions[end - 1][0] == ADD else 1
+    if end < length:
+        return None
+    code = instructions[end - length:end]
+    for opcode, segment, index in code[:2]:
+        if opcode != PUSH or segment == THAT or (segment, index) == \
+                (POINTER, 1):
+            return None
+    return code
+
+
+def reload_pointer(instructions: typing.List[Instruction]) -> bool:
+    """Loading pointer 1 with the address it already holds is a no-op: the
+    second 'push a, pop pointer 1' of a[0] + a[1] goes, and so does the
+    second 'push i, push a, add, pop pointer 1' of a[i] + a[i]. Nothing in
+    between may write the variables the address is computed from, nor
+    jump, be jumped to or call, so the caller never relies on pointer 1
+    across a call, which the inliner needs."""
+    if instructions[-1] != (POP, POINTER, 1):
+        return False
+    code = address_code(instructions, len(instructions) - 1)
+    if code is None:
+        return False
+    variables = {instruction[1:] for instruction in code
+                 if instruction[0] == PUSH and instruction[1] != CONSTANT}
+    # an array may point at an object or at the statics
+    aliased = any(segment == THIS or segment == STATIC
+                  for segment, _ in variables)
+    position = len(instructions) - 1 - len(code)
+    while position > 0:
+        position -= 1
+        opcode, segment, index = instructions[position]
+        if opcode == POP:
+            if (segment, index) == (POINTER, 1):
+                if address_code(instructions, position) != code:
+                    return False
+                del instructions[-1 - len(code):]
+                return True
+            if segment == POINTER or (segment, index) in variables or \
+                    segment == THAT and aliased:
+                return False
+        elif opcode >= LABEL or opcode == RETURN:
+            return False
+    return False
+
+
+def goto_next(instructions: typing.List[Instruction]) -> bool:
+    """A goto to a label that directly follows it falls through anyway."""
+    if instructions[-1][0] != LABEL:
+        return False
+    start = len(instructions) - 1
+    while start > 0 and instructions[start - 1][0] == LABEL:
+        start -= 1
+    if start == 0 or instructions[start - 1][0] != GOTO:
+        return False
+    target = instructions[start - 1][1]
+    if not any(label[1] == target for label in instructions[start:]):
+        return False
+    del instructions[start - 1]
+    return True
+
+
+# Rules are tried on the tail of the output every time an instruction is
+# appended, until none of them applies.
+RULES = [fold_unary, cancel_unary, constant_branch, push_pop, array_store,
+         reload_pointer, goto_next]
+
+
+class PeepholeOptimizer:
+    """Rewrites VM code with a window of pattern rules sliding over it, and
+    removes unreachable code and unreferenced labels. Runs on whole
+    functions, as handed over by VMWriter.
+    """
+
+    def __init__(self, level: int = 1) -> None:
+        """Creates an optimizer.
+
+        Args:
+            level (int): 0 leaves the code as is, 1 applies every rule.
+        """
+        self.level = level
+        self.commands_in = 0
+        self.commands_out = 0
+
+    @property
+    def removed(self) -> int:
+        """
+        Returns:
+            int: the number of commands removed so far.
+        """
+        return self.commands_in - self.commands_out
+
+    def optimize(self, code: VMCode) -> VMCode:
+        """
+        Args:
+            code (VMCode): complete functions to optimize.
+
+        Returns:
+            VMCode: the optimized code, sharing the names table of the input.
+        """
+        self.commands_in += len(code)
+        if self.level < 1:
+            self.commands_out += len(code)
+            return code
+        instructions = list(code)
+        while True:
+            length = len(instructions)
+            instructions = self.slide(instructions)
+            instructions = self.drop_unused_labels(instructions)
+            if len(instructions) == length:
+                break
+        optimized = VMCode()
+        optimized.names, optimized.name_ids = code.names, code.name_ids
+        for instruction in instructions:
+            optimized.append(*instruction)
+        self.commands_out += len(optimized)
+        return optimized
+
+    @staticmethod
+    def slide(instructions: typing.List[Instruction]) \
+            -> typing.List[Instruction]:
+        """Applies the rules over the instructions and drops the ones that
+        can't be reached because they follow a goto or a return.
+        """
+        output = []
+        for instruction in instructions:
+            if output and output[-1][0] in (GOTO, RETURN) and \
+                    instruction[0] not in (LABEL, FUNCTION):
+                continue
+            output.append(instruction)
+            while output and any(rule(output) for rule in RULES):
+                pass
+        return output
+
+    @staticmethod
+    def drop_unused_labels(instructions: typing.List[Instruction]) \
+            -> typing.List[Instruction]:
+        """Removes labels that no goto or if-goto refers to."""
+        targets = {argument for opcode, argument, _ in instructions
+                   if opcode == GOTO or opcode == IF_GOTO}
+        return [instruction for instruction in instructions
+                if instruction[0] != LABEL or instruction[1] in targets]
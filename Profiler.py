@@ -0,0 +1,150 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import cProfile
+import os
+import time
+import typing
+from CompilationEngine import CompilationEngine
+from JackTokenizer import JackTokenizer, StreamingTokenizer, \
+    MappedTokenizer
+from SymbolTable import SymbolTable
+
+PHASES = ["tokenize", "compile", "write"]
+
+
+class CountingSymbolTable(SymbolTable):
+    """A SymbolTable that counts its lookups. Only used when profiling, so
+    regular builds don't pay for the counter.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lookups = 0
+
+    def resolve(self, name):
+        self.lookups += 1
+        return super().resolve(name)
+
+
+def profile_file(input_file: typing.TextIO, output_file: typing.IO,
+                 dump_path: typing.Optional[str] = None,
+                 stream: bool = False, mapped: bool = False,
+                 ast: bool = False, **options) \
+        -> typing.Tuple[CompilationEngine, typing.Dict[str, typing.Any]]:
+    """Compiles a single file like compile_file, measuring every phase.
+
+    Args:
+        input_file (typing.TextIO): the file to compile.
+        output_file (typing.IO): writes all output to this file.
+        dump_path (str): if given, a cProfile dump of the compilation is
+        written to this path.
+        stream (bool): use a StreamingTokenizer. Tokens are then read while
+        compiling, so the tokenize phase only covers the first chunk.
+        mapped (bool): use a MappedTokenizer, input_file being a binary
+        file. Tokens are then decoded while compiling.
+        ast (bool): use an ASTCompiler, whose parse pass counts as part of
+        the compile phase.
+        options: options of the CompilationEngine.
+
+    Returns:
+        tuple: the engine that compiled the file, and a dict of the wall time
+        of the "tokenize", "compile" and "write" phases in seconds, the
+        number of "tokens", the VM "commands" generated and "emitted" after
+        optimization, and the symbol table "lookups".
+    """
+    profiler = cProfile.Profile() if dump_path else None
+    if profiler is not None:
+        profiler.enable()
+    start = time.perf_counter()
+    if mapped:
+        tokenizer = MappedTokenizer(input_file)
+    elif stream:
+        tokenizer = StreamingTokenizer(input_file)
+    else:
+        tokenizer = JackTokenizer(input_file)
+    tokenized = time.perf_counter()
+
+    try:
+        if ast:
+            from ASTCompiler import ASTCompiler
+            engine = ASTCompiler(tokenizer, output_file, **options)
+        else:
+            engine = CompilationEngine(tokenizer, output_file, **options)
+        engine.st = CountingSymbolTable()
+        write_time = 0.0
+        flush = engine.vm.flush
+
+        def timed_flush():
+            nonlocal write_time
+            flush_start = time.perf_counter()
+            flush()
+            write_time += time.perf_counter() - flush_start
+
+        engine.vm.flush = timed_flush
+        compile_start = time.perf_counter()
+        engine.compile_class()
+    except Exception:
+        tokenizer.close()
+        raise
+    compiled = time.perf_counter()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(dump_path)
+    return engine, {"tokenize": tokenized - start,
+                    "compile": compiled - compile_start - write_time,
+                    "write": write_time,
+                    "tokens": tokenizer.len,
+                    "commands": engine.optimizer.commands_in,
+                    "emitted": engine.optimizer.commands_out,
+                    "lookups": engine.st.lookups}
+
+
+def format_table(profiles: typing.Dict[str, typing.Dict[str, typing.Any]]) \
+        -> str:
+    """
+    Args:
+        profiles (dict): the profile of every file, by path.
+
+    Returns:
+        str: a table of the profiles, slowest file first, with a total row.
+    """
+    header = ["file", "total ms"] + [f"{phase} ms" for phase in PHASES] + \
+        ["tokens", "commands", "lookups"]
+    totals = {key: 0 for key in PHASES + ["tokens", "commands", "lookups"]}
+    rows = []
+    for path, profile in sorted(
+            profiles.items(),
+            key=lambda item: -sum(item[1][phase] for phase in PHASES)):
+        for key in totals:
+            totals[key] += profile[key]
+        rows.append(profile_row(os.path.basename(path), profile))
+    rows.append(profile_row("total", totals))
+    widths = [max(len(row[column]) for row in rows + [header])
+              for column in range(len(header))]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(
+            cell.ljust(width) if column == 0 else cell.rjust(width)
+            for column, (cell, width) in enumerate(zip(row, widths))))
+    return "\n".join(lines)
+
+
+def profile_row(name: str, profile: typing.Dict[str, typing.Any]) \
+        -> typing.List[str]:
+    """
+    Args:
+        name (str): the name of the row.
+        profile (dict): the measurements of the row.
+
+    Returns:
+        list: the cells of the row.
+    """
+    total = sum(profile[phase] for phase in PHASES)
+    return [name, f"{total * 1000:.2f}"] + \
+        [f"{profile[phase] * 1000:.2f}" for phase in PHASES] + \
+        [str(profile["tokens"]), str(profile["commands"]),
+         str(profile["lookups"])]
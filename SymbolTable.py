@@ -4,13 +4,40 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-import typing
+from __future__ import annotations
+from VMCode import SEGMENTS
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
 
 STATIC = "static"
 FIELD = "this"  # todo: the same elephant
 ARG = "argument"
 LOCAL = "local"
 
+UNRESOLVED = object()  # marks names missing from the resolution cache
+
+
+class Symbol:
+    """Everything code generation needs to know about an identifier."""
+
+    __slots__ = ("type", "kind", "segment", "index")
+
+    def __init__(self, type: str, kind: str, index: int) -> None:
+        """Creates a symbol.
+
+        Args:
+            type (str): the type of the identifier.
+            kind (str): the kind of the identifier, STATIC, FIELD, ARG or
+            LOCAL.
+            index (int): the running index of the identifier in its kind.
+        """
+        self.type = type
+        self.kind = kind
+        self.segment = SEGMENTS[kind]  # the VMCode segment code
+        self.index = index
+
 
 class SymbolTable:
     """A symbol table that associates names with information needed for Jack
@@ -26,8 +53,10 @@ class SymbolTable:
             ARG: 0,
             LOCAL: 0
         }
-        self.class_dict = {}  # keys : names , values : array of [type, kind, index]
+        self.class_dict = {}  # keys : names , values : Symbol
         self.subroutine_dict = {}
+        # names resolved in the current subroutine, None for unknown names
+        self.cache = {}
 
     def start_subroutine(self) -> None:
         """Starts a new subroutine scope (i.e., resets the subroutine's 
@@ -35,6 +64,7 @@ class SymbolTable:
         """
         self.kind_dict[ARG], self.kind_dict[LOCAL] = 0, 0
         self.subroutine_dict = {}
+        self.cache = {}
 
     def define(self, name: str, type: str, kind: str) -> None:
         """Defines a new identifier of a given name, type and kind and assigns 
@@ -47,11 +77,13 @@ class SymbolTable:
             kind (str): the kind of the new identifier, can be:
             "STATIC", "FIELD", "ARG", "VAR".
         """
-        self.kind_dict[kind] += 1
-        if type in [STATIC, FIELD]:
-            self.class_dict[name] = [type, kind, self.kind_dict[kind]]
+        symbol = Symbol(type, kind, self.kind_dict[kind])
+        if kind in [STATIC, FIELD]:
+            self.class_dict[name] = symbol
         else:
-            self.subroutine_dict[name] = [type, kind, self.kind_dict[kind]]
+            self.subroutine_dict[name] = symbol
+        self.kind_dict[kind] += 1
+        self.cache.pop(name, None)
 
     def var_count(self, kind: str) -> int:
         """
@@ -64,6 +96,24 @@ class SymbolTable:
         """
         return self.kind_dict[kind]
 
+    def resolve(self, name: str) -> typing.Optional[Symbol]:
+        """Looks a name up once, subroutine scope first so that arguments
+        and locals shadow fields and statics.
+
+        Args:
+            name (str): name of an identifier.
+
+        Returns:
+            Symbol: the named identifier, or None if it is unknown in the
+            current scope (e.g. a class name).
+        """
+        symbol = self.cache.get(name, UNRESOLVED)
+        if symbol is UNRESOLVED:
+            symbol = self.subroutine_dict.get(name) or \
+                self.class_dict.get(name)
+            self.cache[name] = symbol
+        return symbol
+
     def kind_of(self, name: str):
         """
         Args:
@@ -99,13 +149,13 @@ class SymbolTable:
         """
         Args:
             name(str):  name of an identifier.
-            value_index(int): location of desired data in the dictionary index
+            value_index(int): 0 for the type, 1 for the kind, 2 for the index
         returns:
-            data (str) as located in the dictionary
+            the requested data, or None if the identifier is unknown
         """
-        if self.class_dict.get(name):
-            return self.class_dict[name][value_index]
-        elif self.subroutine_dict.get(name):
-            return self.subroutine_dict[name][value_index]
-        else:
+        symbol = self.resolve(name)
+        if symbol is None:
             return None
+        if value_index == 0:
+            return symbol.type
+        return symbol.kind if value_index == 1 else symbol.index
@@ -0,0 +1,235 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from __future__ import annotations
+import struct
+import sys
+from array import array
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+
+# Opcodes, ordered by the operands they take: none, a segment and an index,
+# a name, a name and a count.
+ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT, SHIFTLEFT, SHIFTRIGHT, RETURN, \
+    PUSH, POP, LABEL, GOTO, IF_GOTO, CALL, FUNCTION = range(19)
+OPCODE_NAMES = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+                "shiftleft", "shiftright", "return", "push", "pop", "label",
+                "goto", "if-goto", "call", "function")
+OPCODES = {name: code for code, name in enumerate(OPCODE_NAMES)}
+
+CONSTANT, ARGUMENT, LOCAL, STATIC, THIS, THAT, POINTER, TEMP = range(8)
+SEGMENT_NAMES = ("constant", "argument", "local", "static", "this", "that",
+                 "pointer", "temp")
+SEGMENTS = {name: code for code, name in enumerate(SEGMENT_NAMES)}
+
+# A binary file is a sequence of chunks. Each chunk is the header below, the
+# names table as length-prefixed utf-8 strings, and the three instruction
+# columns, each stored with the narrowest array type code fitting its values.
+MAGIC = b"JVMB"
+HEADER = struct.Struct("<4sII3s")
+NAME_LENGTH = struct.Struct("<H")
+COLUMN_TYPES = ("B", "H", "I")
+
+
+def narrowest(column: array) -> str:
+    """
+    Args:
+        column (array): an array of non-negative integers.
+
+    Returns:
+        str: the smallest array type code that holds every value.
+    """
+    largest = max(column, default=0)
+    for type_code in COLUMN_TYPES:
+        if largest < 1 << (8 * array(type_code).itemsize):
+            return type_code
+    return COLUMN_TYPES[-1]
+
+
+class VMCode:
+    """A list of VM instructions. Every instruction is an opcode and two
+    operands kept in typed arrays: the segment and index of push/pop, or the
+    interned name and count of label/goto/if-goto/call/function.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty instruction list."""
+        self.opcodes = array("B")
+        self.args = array("I")
+        self.indexes = array("I")
+        self.names = []
+        self.name_ids = {}
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[int, int, int]]:
+        return zip(self.opcodes, self.args, self.indexes)
+
+    def intern(self, name: str) -> int:
+        """
+        Args:
+            name (str): a label or function name.
+
+        Returns:
+            int: the id of the name in the names table.
+        """
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = self.name_ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def append(self, opcode: int, arg: int = 0, index: int = 0) -> None:
+        """Adds an instruction to the end of the list.
+
+        Args:
+            opcode (int): the opcode of the instruction.
+            arg (int): the segment code or name id, if the opcode takes one.
+            index (int): the segment index or count, if the opcode takes one.
+        """
+        self.opcodes.append(opcode)
+        self.args.append(arg)
+        self.indexes.append(index)
+
+    def move_to_end(self, start: int, end: int) -> None:
+        """Moves the instructions in [start, end) after all the instructions
+        that follow them.
+
+        Args:
+            start (int): the index of the first instruction to move.
+            end (int): the index after the last instruction to move.
+        """
+        for column in (self.opcodes, self.args, self.indexes):
+            column[start:] = column[end:] + column[start:end]
+
+    def extend(self, other: "VMCode") -> None:
+        """Appends all instructions of another list, re-interning its names.
+
+        Args:
+            other (VMCode): the instructions to append.
+        """
+        for opcode, arg, index in other:
+            if opcode >= LABEL:
+                arg = self.intern(other.names[arg])
+            self.append(opcode, arg, index)
+
+    def to_text(self) -> str:
+        """
+        Returns:
+            str: the instructions in the textual .vm format.
+        """
+        names = self.names
+        lines = []
+        for opcode, arg, index in zip(self.opcodes, self.args, self.indexes):
+            if opcode <= RETURN:
+                lines.append(OPCODE_NAMES[opcode])
+            elif opcode <= POP:
+                lines.append(f"{OPCODE_NAMES[opcode]} {SEGMENT_NAMES[arg]} "
+                             f"{index}")
+            elif opcode <= IF_GOTO:
+                lines.append(f"{OPCODE_NAMES[opcode]} {names[arg]}")
+            else:
+                lines.append(f"{OPCODE_NAMES[opcode]} {names[arg]} {index}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_bytes(self) -> bytes:
+        """
+        Returns:
+            bytes: the instructions as a single chunk of the binary format.
+        """
+        columns = [array(narrowest(column), column) for column in
+                   (self.opcodes, self.args, self.indexes)]
+        parts = [HEADER.pack(MAGIC, len(self.names), len(self.opcodes),
+                             "".join(column.typecode for column in columns)
+                             .encode())]
+        for name in self.names:
+            encoded = name.encode()
+            parts.append(NAME_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+        for column in columns:
+            if sys.byteorder == "big":
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_text(cls, text: str) -> "VMCode":
+        """Parses instructions in the textual .vm format, as written by
+        to_text or by other compilers, with comments and blank lines.
+
+        Args:
+            text (str): the content of a .vm file.
+
+        Returns:
+            VMCode: the parsed instructions.
+        """
+        code = cls()
+        for line_number, line in enumerate(text.splitlines(), 1):
+            words = line.split("//", 1)[0].split()
+            if not words:
+                continue
+            opcode = OPCODES.get(words[0])
+            try:
+                if opcode is None:
+                    raise KeyError(words[0])
+                if opcode <= RETURN:
+                    code.append(opcode)
+                elif opcode <= POP:
+                    code.append(opcode, SEGMENTS[words[1]], int(words[2]))
+                elif opcode <= IF_GOTO:
+                    code.append(opcode, code.intern(words[1]))
+                else:
+                    code.append(opcode, code.intern(words[1]), int(words[2]))
+            except (KeyError, IndexError, ValueError):
+                raise ValueError(f"Invalid VM command {line.strip()!r} in "
+                                 f"line {line_number}") from None
+        return code
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "VMCode":
+        """Loads instructions written by to_bytes. Consecutive chunks, as
+        written by a buffered VMWriter, are joined into one list.
+
+        Args:
+            data (bytes): the content of a binary VM file.
+
+        Returns:
+            VMCode: the loaded instructions.
+        """
+        code = None
+        offset = 0
+        while offset < len(data):
+            magic, n_names, n_instructions, type_codes = \
+                HEADER.unpack_from(data, offset)
+            if magic != MAGIC:
+                raise ValueError(f"Not a binary VM chunk at offset {offset}")
+            offset += HEADER.size
+            chunk = cls()
+            for _ in range(n_names):
+                length, = NAME_LENGTH.unpack_from(data, offset)
+                offset += NAME_LENGTH.size
+                chunk.intern(data[offset:offset + length].decode())
+                offset += length
+            columns = []
+            for type_code in type_codes.decode():
+                column = array(type_code)
+                end = offset + n_instructions * column.itemsize
+                column.frombytes(data[offset:end])
+                if sys.byteorder == "big":
+                    column.byteswap()
+                columns.append(column)
+                offset = end
+            chunk.opcodes = array("B", columns[0])
+            chunk.args = array("I", columns[1])
+            chunk.indexes = array("I", columns[2])
+            if code is None:
+                code = chunk
+            else:
+                code.extend(chunk)
+        return code if code is not None else cls()
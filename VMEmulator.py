@@ -0,0 +1,710 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import collections
+import json
+import math
+import os
+import re
+import sys
+import typing
+from VMCode import VMCode, ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT, \
+    SHIFTLEFT, SHIFTRIGHT, RETURN, PUSH, POP, LABEL, GOTO, CALL, \
+    FUNCTION, CONSTANT, ARGUMENT, LOCAL, STATIC, THIS, THAT, POINTER, TEMP
+
+# The memory map of the Hack platform, as used by the standard VM translator
+RAM_SIZE = 32768
+SP, LCL, ARG, THIS_POINTER, THAT_POINTER = range(5)
+TEMP_BASE, STATIC_BASE, STACK_BASE, HEAP_BASE, HEAP_END = \
+    5, 16, 256, 2048, 16384
+FRAME_SIZE = 5
+
+# Decoded opcodes: those of VMCode up to return, then push and pop split by
+# segment, static, temp and pointer being turned into RAM addresses, and
+# flow commands whose targets are resolved to program counters.
+PUSH_CONSTANT, PUSH_LOCAL, PUSH_ARGUMENT, PUSH_THIS, PUSH_THAT, PUSH_RAM, \
+    POP_LOCAL, POP_ARGUMENT, POP_THIS, POP_THAT, POP_RAM, NOP, JUMP, \
+    JUMP_IF, CALL_VM, CALL_OS, ENTER, HALT = range(RETURN + 1, RETURN + 19)
+PUSH_OPCODES = {LOCAL: PUSH_LOCAL, ARGUMENT: PUSH_ARGUMENT, THIS: PUSH_THIS,
+                THAT: PUSH_THAT}
+POP_OPCODES = {LOCAL: POP_LOCAL, ARGUMENT: POP_ARGUMENT, THIS: POP_THIS,
+               THAT: POP_THAT}
+
+# A decoded instruction: its decoded opcode and two operands
+Instruction = typing.Tuple[int, int, int]
+
+# OS functions without any effect on a program that has no screen
+NO_OPS = ("Screen.clearScreen", "Screen.setColor", "Screen.drawPixel",
+          "Screen.drawLine", "Screen.drawRectangle", "Screen.drawCircle",
+          "Output.moveCursor", "Sys.wait")
+OS_CLASSES = ("Math", "Memory", "Array", "String", "Output", "Screen",
+              "Keyboard", "Sys")
+NEWLINE, BACKSPACE, DOUBLE_QUOTE = 128, 129, 34
+
+
+def wrap(value: int) -> int:
+    """
+    Args:
+        value (int): an integer.
+
+    Returns:
+        int: the integer as a signed 16-bit word.
+    """
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class OperatingSystem:
+    """Stand-ins for the Jack OS classes, working on the RAM of an emulator.
+    Objects are laid out in the heap like the compiled classes would, and
+    failures halt the program with the error codes of the real OS. Output
+    is collected as text and Keyboard reads from a queue of inputs; the
+    screen is not emulated.
+    """
+
+    def __init__(self, emulator: "VMEmulator",
+                 inputs: typing.Iterable[str] = ()) -> None:
+        """Creates the OS of an emulator.
+
+        Args:
+            emulator (VMEmulator): the emulator whose RAM is used.
+            inputs (list): the lines typed on the keyboard, in order.
+        """
+        self.emulator = emulator
+        self.ram = emulator.ram
+        self.inputs = collections.deque(inputs)
+        self.output = []
+        self.heap_top = HEAP_BASE
+        # block size -> freed blocks of that size
+        self.free_blocks = {}
+        # function name -> the method standing in for it
+        self.functions = {name: self.ignore for name in NO_OPS}
+        for attribute in dir(self):
+            prefix, _, function = attribute.partition("_")
+            class_name = prefix.capitalize()
+            if class_name in OS_CLASSES and function:
+                self.functions[class_name + "." + re.sub(
+                    r"_(\w)", lambda match: match.group(1).upper(),
+                    function)] = getattr(self, attribute)
+
+    def ignore(self, *_) -> int:
+        return 0
+
+    def error(self, code: int) -> int:
+        """Halts the program like Sys.error.
+
+        Args:
+            code (int): the error code.
+
+        Returns:
+            int: 0, the program stopping before the value is used.
+        """
+        self.output.append(f"ERR{code}")
+        self.emulator.halted = True
+        return 0
+
+    def write(self, text: str) -> None:
+        self.output.append(text)
+
+    def read(self, message: int) -> str:
+        """Prints a prompt and reads the next input line, echoing it.
+
+        Args:
+            message (int): the prompt, a String.
+
+        Returns:
+            str: the input line.
+        """
+        self.output_print_string(message)
+        if not self.inputs:
+            raise EOFError("The program reads more input than was given")
+        line = str(self.inputs.popleft())
+        self.write(line + "\n")
+        return line
+
+    def text(self, string: int) -> str:
+        """
+        Args:
+            string (int): a String.
+
+        Returns:
+            str: the characters of the String.
+        """
+        ram = self.ram
+        return "".join(chr(ram[string + 2 + i])
+                       for i in range(ram[string + 1]))
+
+    def sys_halt(self) -> int:
+        self.emulator.halted = True
+        return 0
+
+    def sys_error(self, code: int) -> int:
+        return self.error(code)
+
+    def math_multiply(self, x: int, y: int) -> int:
+        return wrap(x * y)
+
+    def math_divide(self, x: int, y: int) -> int:
+        if y == 0:
+            return self.error(3)
+        quotient = abs(x) // abs(y)
+        return wrap(quotient if (x < 0) == (y < 0) else -quotient)
+
+    def math_min(self, x: int, y: int) -> int:
+        return min(x, y)
+
+    def math_max(self, x: int, y: int) -> int:
+        return max(x, y)
+
+    def math_abs(self, x: int) -> int:
+        return wrap(abs(x))
+
+    def math_sqrt(self, x: int) -> int:
+        if x < 0:
+            return self.error(4)
+        return math.isqrt(x)
+
+    def memory_peek(self, address: int) -> int:
+        return self.ram[address]
+
+    def memory_poke(self, address: int, value: int) -> int:
+        self.ram[address] = value
+        return 0
+
+    def memory_alloc(self, size: int) -> int:
+        """Allocates a block, reusing a freed block of the same size first.
+        The size of a block is kept in the word before it.
+
+        Args:
+            size (int): the number of words of the block.
+
+        Returns:
+            int: the address of the block.
+        """
+        if size <= 0:
+            return self.error(5)
+        blocks = self.free_blocks.get(size)
+        if blocks:
+            return blocks.pop()
+        if self.heap_top + size + 1 > HEAP_END:
+            return self.error(6)
+        address = self.heap_top + 1
+        self.ram[self.heap_top] = size
+        self.heap_top = address + size
+        return address
+
+    def memory_de_alloc(self, address: int) -> int:
+        self.free_blocks.setdefault(self.ram[address - 1], []).append(address)
+        return 0
+
+    def array_new(self, size: int) -> int:
+        if size <= 0:
+            return self.error(2)
+        return self.memory_alloc(size)
+
+    def array_dispose(self, array: int) -> int:
+        return self.memory_de_alloc(array)
+
+    def string_new(self, max_length: int) -> int:
+        """
+        Args:
+            max_length (int): the capacity of the string.
+
+        Returns:
+            int: a new empty String, holding its capacity, its length and
+            its characters.
+        """
+        if max_length < 0:
+            return self.error(14)
+        string = self.memory_alloc(max_length + 2)
+        self.ram[string] = max_length
+        self.ram[string + 1] = 0
+        return string
+
+    def string_dispose(self, string: int) -> int:
+        return self.memory_de_alloc(string)
+
+    def string_length(self, string: int) -> int:
+        return self.ram[string + 1]
+
+    def string_char_at(self, string: int, index: int) -> int:
+        if not 0 <= index < self.ram[string + 1]:
+            return self.error(15)
+        return self.ram[string + 2 + index]
+
+    def string_set_char_at(self, string: int, index: int,
+                           character: int) -> int:
+        if not 0 <= index < self.ram[string + 1]:
+            return self.error(16)
+        self.ram[string + 2 + index] = character
+        return 0
+
+    def string_append_char(self, string: int, character: int) -> int:
+        ram = self.ram
+        length = ram[string + 1]
+        if length >= ram[string]:
+            return self.error(17)
+        ram[string + 2 + length] = character
+        ram[string + 1] = length + 1
+        return string
+
+    def string_erase_last_char(self, string: int) -> int:
+        if self.ram[string + 1] == 0:
+            return self.error(18)
+        self.ram[string + 1] -= 1
+        return 0
+
+    def string_int_value(self, string: int) -> int:
+        match = re.match(r"-?\d*", self.text(string)).group()
+        return wrap(int(match)) if match.lstrip("-") else 0
+
+    def string_set_int(self, string: int, value: int) -> int:
+        digits = str(value)
+        if len(digits) > self.ram[string]:
+            return self.error(19)
+        self.ram[string + 1] = 0
+        for digit in digits:
+            self.string_append_char(string, ord(digit))
+        return 0
+
+    def string_new_line(self) -> int:
+        return NEWLINE
+
+    def string_back_space(self) -> int:
+        return BACKSPACE
+
+    def string_double_quote(self) -> int:
+        return DOUBLE_QUOTE
+
+    def output_print_char(self, character: int) -> int:
+        if character == NEWLINE:
+            self.write("\n")
+        elif character == BACKSPACE:
+            self.output_back_space()
+        else:
+            self.write(chr(character))
+        return 0
+
+    def output_print_string(self, string: int) -> int:
+        self.write(self.text(string))
+        return 0
+
+    def output_print_int(self, value: int) -> int:
+        self.write(str(value))
+        return 0
+
+    def output_println(self) -> int:
+        self.write("\n")
+        return 0
+
+    def output_back_space(self) -> int:
+        if self.output:
+            self.output[-1] = self.output[-1][:-1]
+        return 0
+
+    def keyboard_key_pressed(self) -> int:
+        return 0
+
+    def keyboard_read_char(self) -> int:
+        if not self.inputs:
+            raise EOFError("The program reads more input than was given")
+        character = str(self.inputs.popleft())[:1]
+        self.write(character)
+        return ord(character) if character else NEWLINE
+
+    def keyboard_read_line(self, message: int) -> int:
+        line = self.read(message)
+        string = self.string_new(len(line))
+        for character in line:
+            self.string_append_char(string, ord(character))
+        return string
+
+    def keyboard_read_int(self, message: int) -> int:
+        match = re.match(r"-?\d*", self.read(message).strip()).group()
+        return wrap(int(match)) if match.lstrip("-") else 0
+
+
+class VMEmulator:
+    """Runs the VM code of a program, with the memory layout and calling
+    convention of the standard VM translator, on a RAM of Python integers.
+    The code is decoded once into an array of instructions whose operands
+    are resolved addresses and program counters, and the OS is provided by
+    OperatingSystem. Every executed VM command, labels included, is counted,
+    as well as the calls of every function and the peak stack depth.
+    """
+
+    def __init__(self, codes: typing.Dict[str, VMCode],
+                 inputs: typing.Iterable[str] = (),
+                 ram: typing.Optional[typing.Dict[int, int]] = None) -> None:
+        """Loads a program.
+
+        Args:
+            codes (dict): the code of every class of the program, by class
+            name, in order.
+            inputs (list): the lines typed on the keyboard, in order.
+            ram (dict): initial values of RAM words, by address.
+        """
+        self.ram = [0] * RAM_SIZE
+        for address, value in (ram or {}).items():
+            self.ram[address] = wrap(value)
+        self.ram[SP] = STACK_BASE
+        self.os = OperatingSystem(self, inputs)
+        # function names by id, those of the program first
+        self.functions = []
+        # the OS function standing in for every function id, if any
+        self.handlers = []
+        self.program = self.decode(codes)
+        self.calls = [0] * len(self.functions)
+        self.pc = 0
+        self.steps = 0
+        self.peak = STACK_BASE
+        self.halted = False
+
+    def decode(self, codes: typing.Dict[str, VMCode]) \
+            -> typing.List[Instruction]:
+        """
+        Args:
+            codes (dict): the code of every class of the program, by class
+            name.
+
+        Returns:
+            list: the decoded program, starting with a bootstrap calling
+            Sys.init, or Main.main when the program has no Sys.init, and
+            halting when it returns.
+        """
+        # first pass: where every function and label is, and the statics
+        function_ids = {}
+        function_pcs = {}
+        label_pcs = {}
+        static_bases = {}
+        static_base = STATIC_BASE
+        pc = 2
+        for class_name, code in codes.items():
+            static_bases[class_name] = static_base
+            static_base += max((index + 1 for opcode, segment, index in code
+                                if PUSH <= opcode <= POP and
+                                segment == STATIC), default=0)
+            if static_base > STACK_BASE:
+                raise ValueError("Too many static variables")
+            function = None
+            for opcode, arg, _ in code:
+                if opcode == FUNCTION:
+                    function = code.names[arg]
+                    function_ids[function] = len(self.functions)
+                    function_pcs[function] = pc
+                    self.functions.append(function)
+                    self.handlers.append(None)
+                elif opcode == LABEL:
+                    label_pcs[function, code.names[arg]] = pc
+                pc += 1
+
+        def function_id(name: str) -> int:
+            if name not in function_ids:
+                if name not in self.os.functions:
+                    raise ValueError(f"Undefined function {name}")
+                function_ids[name] = len(self.functions)
+                self.functions.append(name)
+                self.handlers.append(self.os.functions[name])
+            return function_ids[name]
+
+        entry = "Sys.init" if "Sys.init" in function_pcs else "Main.main"
+        if entry not in function_pcs:
+            raise ValueError("The program has neither Sys.init nor Main.main")
+        program = [(CALL_VM, function_pcs[entry], 0), (HALT, 0, 0)]
+        # second pass: the instructions with resolved operands
+        for class_name, code in codes.items():
+            names = code.names
+            function = None
+            for opcode, arg, index in code:
+                if opcode <= RETURN:
+                    program.append((opcode, 0, 0))
+                elif opcode <= POP:
+                    if arg == CONSTANT:
+                        if opcode == POP:
+                            raise ValueError(f"pop constant in {function}")
+                        program.append((PUSH_CONSTANT, index, 0))
+                        continue
+                    if arg == STATIC:
+                        address = static_bases[class_name] + index
+                    elif arg == TEMP:
+                        address = TEMP_BASE + index
+                    elif arg == POINTER:
+                        address = THIS_POINTER + index
+                    else:
+                        program.append(((PUSH_OPCODES if opcode == PUSH
+                                         else POP_OPCODES)[arg], index, 0))
+                        continue
+                    program.append((PUSH_RAM if opcode == PUSH else POP_RAM,
+                                    address, 0))
+                elif opcode == FUNCTION:
+                    function = names[arg]
+                    program.append((ENTER, function_ids[function], index))
+                elif opcode == LABEL:
+                    program.append((NOP, 0, 0))
+                elif opcode == CALL:
+                    name = names[arg]
+                    if name in function_pcs:
+                        program.append((CALL_VM, function_pcs[name], index))
+                    else:
+                        program.append((CALL_OS, function_id(name), index))
+                else:
+                    target = label_pcs.get((function, names[arg]))
+                    if target is None:
+                        raise ValueError(f"Undefined label {names[arg]} in "
+                                         f"{function}")
+                    program.append((JUMP if opcode == GOTO else JUMP_IF,
+                                    target, 0))
+        return program
+
+    def run(self, cycles: typing.Optional[int] = None) -> bool:
+        """Runs the program until it halts, or for a number of commands.
+        The emulator can be run again to continue.
+
+        Args:
+            cycles (int): the maximal number of VM commands to execute.
+
+        Returns:
+            bool: True if the program halted.
+        """
+        if self.halted:
+            return True
+        program, ram, calls, handlers = \
+            self.program, self.ram, self.calls, self.handlers
+        sp, lcl, arg = ram[SP], ram[LCL], ram[ARG]
+        pc, steps, peak = self.pc, self.steps, self.peak
+        limit = steps + cycles if cycles is not None else -1
+        try:
+            while steps != limit:
+                opcode, a, b = program[pc]
+                pc += 1
+                steps += 1
+                if opcode == PUSH_CONSTANT:
+                    ram[sp] = a
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == PUSH_LOCAL:
+                    ram[sp] = ram[lcl + a]
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == PUSH_ARGUMENT:
+                    ram[sp] = ram[arg + a]
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == POP_LOCAL:
+                    sp -= 1
+                    ram[lcl + a] = ram[sp]
+                elif opcode == PUSH_RAM:
+                    ram[sp] = ram[a]
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == POP_RAM:
+                    sp -= 1
+                    ram[a] = ram[sp]
+                elif opcode == ADD:
+                    sp -= 1
+                    value = ram[sp - 1] + ram[sp]
+                    if value > 32767:
+                        value -= 65536
+                    elif value < -32768:
+                        value += 65536
+                    ram[sp - 1] = value
+                elif opcode == JUMP_IF:
+                    sp -= 1
+                    if ram[sp]:
+                        pc = a
+                elif opcode == JUMP:
+                    pc = a
+                elif opcode == NOP:
+                    pass
+                elif opcode == PUSH_THIS:
+                    ram[sp] = ram[ram[THIS_POINTER] + a]
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == PUSH_THAT:
+                    ram[sp] = ram[ram[THAT_POINTER] + a]
+                    sp += 1
+                    if sp > peak:
+                        peak = sp
+                elif opcode == POP_THIS:
+                    sp -= 1
+                    ram[ram[THIS_POINTER] + a] = ram[sp]
+                elif opcode == POP_THAT:
+                    sp -= 1
+                    ram[ram[THAT_POINTER] + a] = ram[sp]
+                elif opcode == POP_ARGUMENT:
+                    sp -= 1
+                    ram[arg + a] = ram[sp]
+                elif opcode == SUB:
+                    sp -= 1
+                    value = ram[sp - 1] - ram[sp]
+                    if value > 32767:
+                        value -= 65536
+                    elif value < -32768:
+                        value += 65536
+                    ram[sp - 1] = value
+                elif opcode == NOT:
+                    ram[sp - 1] = ~ram[sp - 1]
+                elif opcode == LT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+                elif opcode == GT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+                elif opcode == EQ:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+                elif opcode == AND:
+                    sp -= 1
+                    ram[sp - 1] &= ram[sp]
+                elif opcode == OR:
+                    sp -= 1
+                    ram[sp - 1] |= ram[sp]
+                elif opcode == NEG:
+                    ram[sp - 1] = wrap(-ram[sp - 1])
+                elif opcode == SHIFTLEFT:
+                    ram[sp - 1] = wrap(ram[sp - 1] << 1)
+                elif opcode == SHIFTRIGHT:
+                    ram[sp - 1] >>= 1
+                elif opcode == CALL_OS:
+                    calls[a] += 1
+                    value = handlers[a](*ram[sp - b:sp])
+                    sp -= b
+                    ram[sp] = value
+                    sp += 1
+                    if self.halted:
+                        break
+                elif opcode == CALL_VM:
+                    ram[sp] = pc
+                    ram[sp + 1] = lcl
+                    ram[sp + 2] = arg
+                    ram[sp + 3] = ram[THIS_POINTER]
+                    ram[sp + 4] = ram[THAT_POINTER]
+                    arg = sp - b
+                    sp += FRAME_SIZE
+                    lcl = sp
+                    pc = a
+                elif opcode == ENTER:
+                    calls[a] += 1
+                    if b:
+                        ram[sp:sp + b] = [0] * b
+                        sp += b
+                    if sp > peak:
+                        peak = sp
+                elif opcode == RETURN:
+                    frame = lcl
+                    pc = ram[frame - 5]
+                    ram[arg] = ram[sp - 1]
+                    sp = arg + 1
+                    ram[THAT_POINTER] = ram[frame - 1]
+                    ram[THIS_POINTER] = ram[frame - 2]
+                    arg = ram[frame - 3]
+                    lcl = ram[frame - 4]
+                elif opcode == HALT:
+                    self.halted = True
+                    break
+        finally:
+            ram[SP], ram[LCL], ram[ARG] = sp, lcl, arg
+            self.pc, self.steps, self.peak = pc, steps, peak
+        return self.halted
+
+    def output(self) -> str:
+        """
+        Returns:
+            str: the text printed by the program so far.
+        """
+        return "".join(self.os.output)
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """
+        Returns:
+            dict: the number of VM commands executed, whether the program
+            halted, the peak depth of the stack in words, and the number of
+            calls of every function called, by name.
+        """
+        return {"instructions": self.steps,
+                "halted": self.halted,
+                "peak_stack": self.peak - STACK_BASE,
+                "calls": {name: count for name, count
+                          in zip(self.functions, self.calls) if count}}
+
+
+def load_codes(path: str, binary: bool = False) \
+        -> typing.Dict[str, VMCode]:
+    """
+    Args:
+        path (str): a directory of compiled classes, or a single one.
+        binary (bool): load .vmb files instead of .vm files.
+
+    Returns:
+        dict: the code of every class, by class name, sorted by name.
+    """
+    extension = ".vmb" if binary else ".vm"
+    if os.path.isdir(path):
+        paths = [os.path.join(path, filename)
+                 for filename in sorted(os.listdir(path))
+                 if os.path.splitext(filename)[1].lower() == extension]
+    else:
+        paths = [path]
+    codes = {}
+    for code_path in paths:
+        class_name = os.path.splitext(os.path.basename(code_path))[0]
+        if binary:
+            with open(code_path, 'rb') as code_file:
+                codes[class_name] = VMCode.from_bytes(code_file.read())
+        else:
+            with open(code_path, 'r') as code_file:
+                codes[class_name] = VMCode.from_text(code_file.read())
+    return codes
+
+
+def ram_value(text: str) -> typing.Tuple[int, int]:
+    """Parses an ADDRESS=VALUE command line argument."""
+    address, _, value = text.partition("=")
+    return int(address), int(value)
+
+
+if "__main__" == __name__:
+    parser = argparse.ArgumentParser(
+        prog="VMEmulator",
+        description="Runs a compiled Jack program with stand-ins for the OS "
+                    "and reports how many VM commands it executed.")
+    parser.add_argument("path", help="a directory of .vm files, or one file")
+    parser.add_argument("--binary", action="store_true",
+                        help="load .vmb files instead of .vm files")
+    parser.add_argument("--cycles", type=int,
+                        help="stop after this many VM commands, for "
+                             "programs that never halt")
+    parser.add_argument("--input", action="append", default=[],
+                        metavar="LINE",
+                        help="a line typed on the keyboard, in order")
+    parser.add_argument("--ram", action="append", default=[],
+                        type=ram_value, metavar="ADDRESS=VALUE",
+                        help="set a RAM word before running")
+    parser.add_argument("--json", action="store_true",
+                        help="print the output and counters as JSON")
+    arguments = parser.parse_args()
+    emulator = VMEmulator(load_codes(arguments.path, arguments.binary),
+                          arguments.input, dict(arguments.ram))
+    emulator.run(arguments.cycles)
+    stats = emulator.stats()
+    if arguments.json:
+        json.dump(dict(stats, output=emulator.output()), sys.stdout,
+                  indent=2)
+        print()
+    else:
+        print(emulator.output())
+        print(f"{stats['instructions']} VM commands, peak stack "
+              f"{stats['peak_stack']} words, "
+              f"{'halted' if stats['halted'] else 'still running'}",
+              file=sys.stderr)
+        for name, count in sorted(stats["calls"].items(),
+                                  key=lambda item: -item[1]):
+            print(f"{count:10d}  {name}", file=sys.stderr)
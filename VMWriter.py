@@ -4,17 +4,49 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-import typing
+from __future__ import annotations
+from PeepholeOptimizer import PeepholeOptimizer
+from VMCode import VMCode, OPCODES, SEGMENTS, PUSH, POP, LABEL, GOTO, \
+    IF_GOTO, CALL, FUNCTION, RETURN
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing
+
+# Instructions are kept as VMCode and written out once at least this many are
+# pending when a new function starts, so slow streams see few large writes.
+BUFFER_SIZE = 4096
 
 
 class VMWriter:
     """
     Writes VM commands into a file. Encapsulates the VM command syntax.
+    Commands are recorded as VMCode instructions and serialized, as text or
+    in the binary VMCode format, when the buffer is flushed.
     """
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
-        """Creates a new file and prepares it for writing VM commands."""
+    def __init__(self, output_stream: typing.IO,
+                 buffer_size: int = BUFFER_SIZE,
+                 binary: bool = False,
+                 optimizer: typing.Optional[PeepholeOptimizer] = None) \
+            -> None:
+        """Creates a new file and prepares it for writing VM commands.
+
+        Args:
+            output_stream (typing.IO): the stream to write to, a binary
+            stream if binary is set.
+            buffer_size (int): the number of instructions collected before
+            they are written to the stream, 0 writes every command immediately.
+            binary (bool): write the binary VMCode format instead of text.
+            optimizer (PeepholeOptimizer): optimizes the buffered code before
+            it is written. With an optimizer the buffer is only flushed
+            between functions, so the optimizer always sees whole functions.
+        """
         self.of = output_stream
+        self.buffer_size = buffer_size
+        self.binary = binary
+        self.optimizer = optimizer
+        self.code = VMCode()
         self.segments_dict = {"CONST": "constant",
                               "ARG": "argument",
                               "LOCAL": "local",
@@ -30,20 +62,24 @@ class VMWriter:
 
         Args:
             segment (str): the segment to push to, can be "CONST", "ARG", 
-            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP"
+            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP" or the VM
+            name of the segment itself.
             index (int): the index to push to.
         """
-        self.of.write(f"push {self.segments_dict[segment]} {index}")
+        segment = self.segments_dict.get(segment, segment)
+        self.write(PUSH, SEGMENTS[segment], index)
 
     def write_pop(self, segment: str, index: int) -> None:
         """Writes a VM pop command.
 
         Args:
             segment (str): the segment to pop from, can be "CONST", "ARG", 
-            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP".
+            "LOCAL", "STATIC", "THIS", "THAT", "POINTER", "TEMP" or the VM
+            name of the segment itself.
             index (int): the index to pop from.
         """
-        self.of.write(f"pop {self.segments_dict[segment]} {index}")
+        segment = self.segments_dict.get(segment, segment)
+        self.write(POP, SEGMENTS[segment], index)
 
     def write_arithmetic(self, command: str) -> None:
         """Writes a VM arithmetic command.
@@ -52,7 +88,7 @@ class VMWriter:
             command (str): the command to write, can be "ADD", "SUB", "NEG", 
             "EQ", "GT", "LT", "AND", "OR", "NOT".
         """
-        self.of.write(command.lower())
+        self.write(OPCODES[command.lower()])
 
     def write_label(self, label: str) -> None:
         """Writes a VM label command.
@@ -60,7 +96,7 @@ class VMWriter:
         Args:
             label (str): the label to write.
         """
-        self.of.write(f"label {label}")
+        self.write(LABEL, self.code.intern(label))
 
     def write_goto(self, label: str) -> None:
         """Writes a VM goto command.
@@ -68,7 +104,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.of.write(f"goto {label}")
+        self.write(GOTO, self.code.intern(label))
 
     def write_if(self, label: str) -> None:
         """Writes a VM if-goto command.
@@ -76,7 +112,7 @@ class VMWriter:
         Args:
             label (str): the label to go to.
         """
-        self.of.write(f"if-goto {label}")
+        self.write(IF_GOTO, self.code.intern(label))
 
     def write_call(self, name: str, n_args: int) -> None:
         """Writes a VM call command.
@@ -85,7 +121,7 @@ class VMWriter:
             name (str): the name of the function to call.
             n_args (int): the number of arguments the function receives.
         """
-        self.of.write(f"call {name} {n_args}")
+        self.write(CALL, self.code.intern(name), n_args)
 
     def write_function(self, name: str, n_locals: int) -> None:
         """Writes a VM function command.
@@ -94,13 +130,59 @@ class VMWriter:
             name (str): the name of the function.
             n_locals (int): the number of local variables the function uses.
         """
-        self.of.write(f"function {name} {n_locals}")
+        if len(self.code) >= self.buffer_size:
+            self.flush()
+        self.write(FUNCTION, self.code.intern(name), n_locals)
 
     def write_return(self) -> None:
         """Writes a VM return command."""
-        self.of.write("return")
+        self.write(RETURN)
+
+    def position(self) -> int:
+        """
+        Returns:
+            int: the position the next command will be written at, to be used
+            with move_to_end before the buffer is next flushed.
+        """
+        return len(self.code)
+
+    def move_to_end(self, start: int, end: int) -> None:
+        """Moves the commands written between two positions after the ones
+        written since. Commands are only flushed between functions, so this
+        is safe within a subroutine.
+
+        Args:
+            start (int): the position of the first command to move.
+            end (int): the position after the last command to move.
+        """
+        self.code.move_to_end(start, end)
+
+    def write(self, opcode: int, arg: int = 0, index: int = 0) -> None:
+        """Records an instruction in the buffer.
+
+        Args:
+            opcode (int): the VMCode opcode of the instruction.
+            arg (int): the segment code or name id, if the opcode takes one.
+            index (int): the segment index or count, if the opcode takes one.
+        """
+        self.code.append(opcode, arg, index)
+        if not self.buffer_size and self.optimizer is None:
+            self.flush()
+
+    def flush(self) -> None:
+        """Serializes all buffered instructions to the output stream at once.
+        """
+        if len(self.code):
+            code = self.code
+            if self.optimizer is not None:
+                code = self.optimizer.optimize(code)
+            if self.binary:
+                self.of.write(code.to_bytes())
+            else:
+                self.of.write(code.to_text())
+            self.code = VMCode()
 
     def close(self) -> None:
-        """Closes the output file."""
+        """Flushes the buffered commands and closes the output file."""
+        self.flush()
         self.of.close()
-
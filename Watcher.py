@@ -0,0 +1,86 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in  
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import time
+import typing
+
+DEFAULT_INTERVAL = 0.1
+
+# (modification time in nanoseconds, size) of a file
+Stamp = typing.Tuple[int, int]
+
+
+class Watcher:
+    """Polls the .jack files of a directory, or a single .jack file, for
+    changes. Only os.stat is used, so a poll costs one stat per file and
+    nothing has to be installed.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_INTERVAL) -> None:
+        """Creates a watcher and takes the first snapshot of the files.
+
+        Args:
+            path (str): the directory or file to watch.
+            interval (float): the number of seconds between polls.
+        """
+        self.path = path
+        self.interval = interval
+        self.stamps = self.scan()
+
+    def scan(self) -> typing.Dict[str, Stamp]:
+        """
+        Returns:
+            dict: the stamp of every watched .jack file, by path, in the
+            order the files are compiled in.
+        """
+        if os.path.isdir(self.path):
+            paths = sorted(entry.path for entry in os.scandir(self.path)
+                           if os.path.splitext(entry.name)[1].lower() ==
+                           ".jack")
+        else:
+            paths = [self.path]
+        stamps = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            stamps[path] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+
+    def sources(self) -> typing.List[str]:
+        """
+        Returns:
+            list: the paths of the watched .jack files, as last polled.
+        """
+        return list(self.stamps)
+
+    def poll(self) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        """Takes a new snapshot of the files.
+
+        Returns:
+            tuple: the files added or modified since the last snapshot, and
+            the files removed since.
+        """
+        stamps = self.scan()
+        changed = [path for path, stamp in stamps.items()
+                   if self.stamps.get(path) != stamp]
+        removed = [path for path in self.stamps if path not in stamps]
+        self.stamps = stamps
+        return changed, removed
+
+    def wait(self) -> typing.Tuple[typing.List[str], typing.List[str]]:
+        """Polls until a file changes.
+
+        Returns:
+            tuple: the files added or modified, and the files removed.
+        """
+        while True:
+            changed, removed = self.poll()
+            if changed or removed:
+                return changed, removed
+            time.sleep(self.interval)